@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class BuscaConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'busca'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,185 @@
+"""
+Search index over famílias, responsáveis and membros.
+
+Text is normalized in Python (lowercase, accents removed, punctuation
+split off, documents also indexed digits-only) so both backends index
+and query the same words:
+
+- SQLite: an external-content FTS5 table, kept in sync with
+  DocumentoBusca by triggers, ranked with bm25 and with 2 and 3
+  character prefix indexes.
+- PostgreSQL: a tsvector GIN index for ranked prefix matching plus a
+  pg_trgm GIN index so a misspelled name still finds its row.
+"""
+import re
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.texto import normalizar
+from .models import DocumentoBusca
+
+TAMANHO_MINIMO = 2
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 50
+LOTE = 2000
+
+
+def _texto(*valores, documentos=()):
+    # Documents are also indexed as one run of digits, so '12345678900' finds '123.456.789-00'
+    partes = [normalizar(valor) for valor in valores]
+    partes += [re.sub(r'\D', '', valor) for valor in documentos if valor]
+    return ' '.join(parte for parte in partes if parte)
+
+
+def _nome_familia(familia):
+    return (familia.nome or f'Família #{familia.pk}') if familia else ''
+
+
+def documento_familia(familia):
+    return {
+        'familia_id': familia.pk,
+        'titulo': _nome_familia(familia),
+        'detalhe': ', '.join(parte for parte in (familia.bairro, familia.cidade) if parte),
+        'texto': _texto(familia.nome),
+        'ativo': familia.ativo,
+    }
+
+
+def documento_responsavel(responsavel):
+    return {
+        'familia_id': responsavel.familia_id,
+        'titulo': responsavel.nome_completo,
+        'detalhe': _nome_familia(responsavel.familia),
+        'texto': _texto(responsavel.nome_completo, responsavel.cpf, documentos=(responsavel.cpf, responsavel.telefone)),
+        'ativo': responsavel.ativo,
+    }
+
+
+def documento_membro_familia(membro):
+    return {
+        'familia_id': membro.familia_id,
+        'titulo': membro.nome_completo,
+        'detalhe': _nome_familia(membro.familia),
+        'texto': _texto(membro.nome_completo, membro.rg, documentos=(membro.nis, membro.rg)),
+        'ativo': membro.ativo,
+    }
+
+
+def documento_membro(membro):
+    return {
+        'familia_id': membro.familia_id,
+        'titulo': membro.nome,
+        'detalhe': _nome_familia(membro.familia),
+        'texto': _texto(membro.nome, membro.rg, documentos=(membro.nis, membro.rg, membro.cpf)),
+        'ativo': membro.ativo,
+    }
+
+
+def fontes():
+    """{tipo: (modelo, função que monta o documento)} for every indexed model."""
+    from familias.models import Familia, Membro as MembroFamilia, Responsavel
+    from membros.models import Membro
+    return {
+        DocumentoBusca.FAMILIA: (Familia, documento_familia),
+        DocumentoBusca.RESPONSAVEL: (Responsavel, documento_responsavel),
+        DocumentoBusca.MEMBRO_FAMILIA: (MembroFamilia, documento_membro_familia),
+        DocumentoBusca.MEMBRO: (Membro, documento_membro),
+    }
+
+
+def indexar(tipo, objeto):
+    _, documento = fontes()[tipo]
+    campos = documento(objeto)
+    DocumentoBusca.objects.update_or_create(tipo=tipo, objeto_id=objeto.pk, defaults=campos)
+    if tipo == DocumentoBusca.FAMILIA:
+        # The family name is the detail line of everyone in it
+        DocumentoBusca.objects.filter(familia_id=objeto.pk).exclude(tipo=tipo).exclude(
+            detalhe=campos['titulo']
+        ).update(detalhe=campos['titulo'], atualizado_em=timezone.now())
+
+
+def indexar_em_lote(tipo, objetos):
+    """Indexes objects written with bulk_create or bulk_update, which send no post_save."""
+    _, documento = fontes()[tipo]
+    DocumentoBusca.objects.bulk_create(
+        (DocumentoBusca(tipo=tipo, objeto_id=objeto.pk, **documento(objeto)) for objeto in objetos),
+        batch_size=LOTE,
+        update_conflicts=True,
+        unique_fields=['tipo', 'objeto_id'],
+        update_fields=['familia_id', 'titulo', 'detalhe', 'texto', 'ativo', 'atualizado_em'],
+    )
+
+
+def remover(tipo, objeto_id):
+    DocumentoBusca.objects.filter(tipo=tipo, objeto_id=objeto_id).delete()
+
+
+def remover_em_lote(tipo, objeto_ids):
+    """Removes the documents of objects deleted in bulk, which send no post_delete."""
+    DocumentoBusca.objects.filter(tipo=tipo, objeto_id__in=objeto_ids).delete()
+
+
+def reindexar(log=None):
+    """Rebuilds the whole index, for data written with bulk operations that skip the signals."""
+    total = 0
+    with transaction.atomic():
+        DocumentoBusca.objects.all().delete()
+        for tipo, (modelo, documento) in fontes().items():
+            consulta = modelo.objects.all()
+            if tipo != DocumentoBusca.FAMILIA:
+                consulta = consulta.select_related('familia')
+            lote = []
+            for objeto in consulta.iterator(chunk_size=LOTE):
+                lote.append(DocumentoBusca(tipo=tipo, objeto_id=objeto.pk, **documento(objeto)))
+                if len(lote) >= LOTE:
+                    total += len(DocumentoBusca.objects.bulk_create(lote))
+                    lote = []
+            total += len(DocumentoBusca.objects.bulk_create(lote))
+            if log:
+                log(f'{tipo}: indexado')
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO busca_documento_fts(busca_documento_fts) VALUES ('optimize')")
+    return total
+
+
+def _filtros(tipos, inativos, placeholder_tipos):
+    sql, params = '', []
+    if tipos:
+        sql += f" AND d.tipo IN ({', '.join([placeholder_tipos] * len(tipos))})"
+        params += list(tipos)
+    if not inativos:
+        sql += ' AND d.ativo'
+    return sql, params
+
+
+def buscar(q, tipos=None, inativos=False, limite=LIMITE_PADRAO):
+    """The best ranked DocumentoBusca rows for ``q``; every word matches as a prefix."""
+    palavras = normalizar(q).split()
+    if not palavras:
+        return []
+    filtros, params_filtros = _filtros(tipos, inativos, '%s')
+    colunas = 'd.id, d.tipo, d.objeto_id, d.familia_id, d.titulo, d.detalhe, d.ativo'
+
+    if connection.vendor == 'postgresql':
+        consulta = ' & '.join(f'{palavra}:*' for palavra in palavras)
+        frase = ' '.join(palavras)
+        sql = (
+            f'SELECT {colunas}, '
+            "ts_rank(to_tsvector('simple', d.texto), q) + word_similarity(%s, d.texto) AS relevancia "
+            "FROM busca_documentobusca d, to_tsquery('simple', %s) q "
+            "WHERE (to_tsvector('simple', d.texto) @@ q OR %s <%% d.texto)"
+            f'{filtros} ORDER BY relevancia DESC, d.titulo LIMIT %s'
+        )
+        params = [frase, consulta, frase, *params_filtros, limite]
+    else:
+        # Words are [0-9a-z]+ after normalizar, so quoting them is safe
+        consulta = ' '.join(f'"{palavra}"*' for palavra in palavras)
+        sql = (
+            f'SELECT {colunas}, bm25(busca_documento_fts) AS relevancia '
+            'FROM busca_documento_fts JOIN busca_documentobusca d ON d.id = busca_documento_fts.rowid '
+            f'WHERE busca_documento_fts MATCH %s{filtros} ORDER BY relevancia, d.titulo LIMIT %s'
+        )
+        params = [consulta, *params_filtros, limite]
+    return list(DocumentoBusca.objects.raw(sql, params))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from busca.indice import reindexar
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de busca de famílias, responsáveis e membros'
+
+    def handle(self, *args, **options):
+        verbosidade = options['verbosity']
+        total = reindexar(log=(lambda mensagem: self.stdout.write(f'  {mensagem}')) if verbosidade > 1 else None)
+        if verbosidade:
+            self.stdout.write(self.style.SUCCESS(f'{total} documentos indexados.'))
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:25
+
+from django.db import migrations, models
+
+# SQLite: external-content FTS5 table over busca_documentobusca.texto, synced by triggers
+SQLITE_CRIAR = [
+    """CREATE VIRTUAL TABLE busca_documento_fts USING fts5(
+        texto, content='busca_documentobusca', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2", prefix='2 3'
+    )""",
+    """CREATE TRIGGER busca_documento_fts_ai AFTER INSERT ON busca_documentobusca BEGIN
+        INSERT INTO busca_documento_fts(rowid, texto) VALUES (new.id, new.texto);
+    END""",
+    """CREATE TRIGGER busca_documento_fts_ad AFTER DELETE ON busca_documentobusca BEGIN
+        INSERT INTO busca_documento_fts(busca_documento_fts, rowid, texto) VALUES ('delete', old.id, old.texto);
+    END""",
+    """CREATE TRIGGER busca_documento_fts_au AFTER UPDATE OF texto ON busca_documentobusca BEGIN
+        INSERT INTO busca_documento_fts(busca_documento_fts, rowid, texto) VALUES ('delete', old.id, old.texto);
+        INSERT INTO busca_documento_fts(rowid, texto) VALUES (new.id, new.texto);
+    END""",
+]
+SQLITE_REMOVER = [
+    'DROP TRIGGER IF EXISTS busca_documento_fts_au',
+    'DROP TRIGGER IF EXISTS busca_documento_fts_ad',
+    'DROP TRIGGER IF EXISTS busca_documento_fts_ai',
+    'DROP TABLE IF EXISTS busca_documento_fts',
+]
+
+# PostgreSQL: tsvector index for ranked prefix matching, trigram index for misspellings
+POSTGRES_CRIAR = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    "CREATE INDEX busca_documento_tsv_idx ON busca_documentobusca USING gin (to_tsvector('simple', texto))",
+    'CREATE INDEX busca_documento_trgm_idx ON busca_documentobusca USING gin (texto gin_trgm_ops)',
+]
+POSTGRES_REMOVER = [
+    'DROP INDEX IF EXISTS busca_documento_trgm_idx',
+    'DROP INDEX IF EXISTS busca_documento_tsv_idx',
+]
+
+
+def _executar(schema_editor, comandos):
+    comandos = comandos.get(schema_editor.connection.vendor, [])
+    for sql in comandos:
+        schema_editor.execute(sql)
+
+
+def criar_indice_texto(apps, schema_editor):
+    _executar(schema_editor, {'sqlite': SQLITE_CRIAR, 'postgresql': POSTGRES_CRIAR})
+
+
+def remover_indice_texto(apps, schema_editor):
+    _executar(schema_editor, {'sqlite': SQLITE_REMOVER, 'postgresql': POSTGRES_REMOVER})
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoBusca',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('familia', 'Família'), ('responsavel', 'Responsável'), ('membro', 'Membro'), ('membro_familia', 'Membro da família')], max_length=20, verbose_name='Tipo')),
+                ('objeto_id', models.BigIntegerField(verbose_name='ID do objeto')),
+                ('familia_id', models.BigIntegerField(blank=True, null=True, verbose_name='ID da família')),
+                ('titulo', models.CharField(max_length=200, verbose_name='Título')),
+                ('detalhe', models.CharField(blank=True, max_length=200, verbose_name='Detalhe')),
+                ('texto', models.TextField(verbose_name='Texto normalizado')),
+                ('ativo', models.BooleanField(default=True, verbose_name='Ativo')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Documento de busca',
+                'verbose_name_plural': 'Documentos de busca',
+                'indexes': [models.Index(fields=['familia_id'], name='busca_documento_familia_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tipo', 'objeto_id'), name='busca_documento_unico')],
+            },
+        ),
+        migrations.RunPython(criar_indice_texto, remover_indice_texto),
+    ]
@@ -0,0 +1,44 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class DocumentoBusca(models.Model):
+    """
+    One searchable row per família, responsável or membro, kept current by busca.signals.
+
+    ``texto`` holds the normalized (lowercase, unaccented) words the
+    backend index is built on: FTS5 on SQLite, trigram and tsvector GIN
+    indexes on PostgreSQL (see the app's first migration).
+    """
+    FAMILIA = 'familia'
+    RESPONSAVEL = 'responsavel'
+    MEMBRO = 'membro'
+    MEMBRO_FAMILIA = 'membro_familia'
+    TIPO_CHOICES = [
+        (FAMILIA, _('Família')),
+        (RESPONSAVEL, _('Responsável')),
+        (MEMBRO, _('Membro')),
+        (MEMBRO_FAMILIA, _('Membro da família')),
+    ]
+
+    tipo = models.CharField(_('Tipo'), max_length=20, choices=TIPO_CHOICES)
+    objeto_id = models.BigIntegerField(_('ID do objeto'))
+    familia_id = models.BigIntegerField(_('ID da família'), null=True, blank=True)
+    titulo = models.CharField(_('Título'), max_length=200)
+    detalhe = models.CharField(_('Detalhe'), max_length=200, blank=True)
+    texto = models.TextField(_('Texto normalizado'))
+    ativo = models.BooleanField(_('Ativo'), default=True)
+    atualizado_em = models.DateTimeField(_('Atualizado em'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Documento de busca')
+        verbose_name_plural = _('Documentos de busca')
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'objeto_id'], name='busca_documento_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['familia_id'], name='busca_documento_familia_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_tipo_display()}: {self.titulo}'
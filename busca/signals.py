@@ -0,0 +1,28 @@
+from django.db.models.signals import post_save, post_delete
+from familias.models import Familia, Membro as MembroFamilia, Responsavel
+from membros.models import Membro
+from .indice import indexar, remover
+from .models import DocumentoBusca
+
+# Tipo de documento de busca de cada modelo indexado
+TIPOS = {
+    Familia: DocumentoBusca.FAMILIA,
+    Responsavel: DocumentoBusca.RESPONSAVEL,
+    MembroFamilia: DocumentoBusca.MEMBRO_FAMILIA,
+    Membro: DocumentoBusca.MEMBRO,
+}
+
+
+def atualizar_indice(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    indexar(TIPOS[sender], instance)
+
+
+def remover_do_indice(sender, instance, **kwargs):
+    remover(TIPOS[sender], instance.pk)
+
+
+for modelo in TIPOS:
+    post_save.connect(atualizar_indice, sender=modelo, dispatch_uid=f'busca_{modelo._meta.label}_save')
+    post_delete.connect(remover_do_indice, sender=modelo, dispatch_uid=f'busca_{modelo._meta.label}_delete')
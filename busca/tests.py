@@ -0,0 +1,69 @@
+import io
+from datetime import date
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+from familias.models import Familia, Responsavel
+from membros.models import Membro
+from usuarios.models import Usuario
+from .models import DocumentoBusca
+
+
+class BuscaTest(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(Usuario.objects.create_user('busca@teste.com', 'senha'))
+        self.familia = Familia.objects.create(nome='Família Conceição', bairro='Vila Nova')
+        self.responsavel = Responsavel.objects.create(
+            familia=self.familia, nome_completo='José da Conceição', cpf='123.456.789-00', telefone='(11) 99999-0000'
+        )
+        self.membro = Membro.objects.create(
+            nome='Ana Lúcia Conceição', data_nascimento=date(2015, 1, 1), sexo='F',
+            familia=self.familia, grau_parentesco='FILHO', nis='12345678901'
+        )
+
+    def buscar(self, q, **params):
+        response = self.client.get('/api/busca/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return [(resultado['tipo'], resultado['id']) for resultado in response.data['resultados']]
+
+    def test_ignora_acentos_e_busca_por_prefixo(self):
+        self.assertIn(('responsavel', self.responsavel.id), self.buscar('jose conc'))
+        self.assertIn(('membro', self.membro.id), self.buscar('LUCIA'))
+        self.assertEqual(self.buscar('conceicao', tipo='familia'), [('familia', self.familia.id)])
+
+    def test_busca_documentos_sem_pontuacao(self):
+        self.assertEqual(self.buscar('12345678900'), [('responsavel', self.responsavel.id)])
+        self.assertEqual(self.buscar('123.456'), [('responsavel', self.responsavel.id)])
+        self.assertEqual(self.buscar('1234567890', tipo='membro'), [('membro', self.membro.id)])
+
+    def test_indice_acompanha_alteracoes(self):
+        self.membro.nome = 'Beatriz Souza'
+        self.membro.save()
+        self.assertEqual(self.buscar('lucia'), [])
+        self.assertEqual(self.buscar('beatriz'), [('membro', self.membro.id)])
+
+        self.membro.ativo = False
+        self.membro.save()
+        self.assertEqual(self.buscar('beatriz'), [])
+        self.assertEqual(self.buscar('beatriz', inativos='true'), [('membro', self.membro.id)])
+
+        antes = DocumentoBusca.objects.get(tipo=DocumentoBusca.RESPONSAVEL, objeto_id=self.responsavel.id)
+        self.familia.nome = 'Família Souza'
+        self.familia.save()
+        response = self.client.get('/api/busca/', {'q': 'jose'})
+        self.assertEqual(response.data['resultados'][0]['detalhe'], 'Família Souza')
+        # Incremental backups pick changed rows by atualizado_em
+        depois = DocumentoBusca.objects.get(pk=antes.pk)
+        self.assertGreater(depois.atualizado_em, antes.atualizado_em)
+
+        self.familia.delete()
+        self.assertEqual(self.buscar('jose'), [])
+
+    def test_reindexar(self):
+        DocumentoBusca.objects.all().delete()
+        self.assertEqual(self.buscar('jose'), [])
+        call_command('reindexar_busca', stdout=io.StringIO())
+        self.assertEqual(self.buscar('jose'), [('responsavel', self.responsavel.id)])
+
+    def test_termo_curto(self):
+        response = self.client.get('/api/busca/', {'q': 'a'})
+        self.assertEqual(response.status_code, 400)
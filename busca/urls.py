@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import BuscaViewSet
+
+urlpatterns = [
+    path('', BuscaViewSet.as_view({'get': 'list'}), name='busca-list'),
+]
@@ -0,0 +1,58 @@
+from rest_framework import viewsets, permissions
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from .indice import LIMITE_MAXIMO, LIMITE_PADRAO, TAMANHO_MINIMO, buscar, normalizar
+from .models import DocumentoBusca
+
+
+class BuscaViewSet(viewsets.ViewSet):
+    """
+    Accent-insensitive search over famílias, responsáveis and membros.
+
+    ``?q=`` matches names, CPF, telefone, NIS and RG; every word matches
+    as a prefix ("jo conc" finds "José da Conceição"). Optional
+    ``tipo`` (comma separated), ``inativos=true`` and ``limite``.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request):
+        q = request.query_params.get('q', '').strip()
+        if len(normalizar(q).replace(' ', '')) < TAMANHO_MINIMO:
+            raise ValidationError({
+                'error': f'Informe ao menos {TAMANHO_MINIMO} letras ou números em q.',
+                'status_code': 400,
+            })
+
+        tipos = [tipo for tipo in request.query_params.get('tipo', '').split(',') if tipo]
+        validos = dict(DocumentoBusca.TIPO_CHOICES)
+        invalidos = [tipo for tipo in tipos if tipo not in validos]
+        if invalidos:
+            raise ValidationError({
+                'error': f'Tipo inválido: {", ".join(invalidos)}. Use {", ".join(validos)}.',
+                'status_code': 400,
+            })
+
+        try:
+            limite = int(request.query_params.get('limite', LIMITE_PADRAO))
+        except ValueError:
+            raise ValidationError({'error': 'limite deve ser um número inteiro.', 'status_code': 400})
+        limite = min(max(limite, 1), LIMITE_MAXIMO)
+
+        inativos = request.query_params.get('inativos', '').lower() in ('1', 'true', 'sim')
+        resultados = [
+            {
+                'tipo': documento.tipo,
+                'id': documento.objeto_id,
+                'titulo': documento.titulo,
+                'detalhe': documento.detalhe,
+                'familia_id': documento.familia_id,
+                'ativo': documento.ativo,
+            }
+            for documento in buscar(q, tipos=tipos, inativos=inativos, limite=limite)
+        ]
+        return Response({
+            'q': q,
+            'total': len(resultados),
+            'resultados': resultados,
+            'status_code': 200,
+        })
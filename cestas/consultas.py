@@ -0,0 +1,45 @@
+"""Hot entrega de cesta querysets audited by ``manage.py auditar_indices``."""
+from datetime import date
+
+from django.db.models import Count
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from core.auditoria import consulta_quente
+from core.pagination import KeysetPagination
+from .models import EntregaDeCesta
+
+
+@consulta_quente('cestas.lista')
+def lista():
+    return EntregaDeCesta.objects.select_related('familia').order_by(
+        '-data_entrega', '-id'
+    )[:KeysetPagination.page_size + 1]
+
+
+@consulta_quente('cestas.estatisticas_mes')
+def estatisticas_mes():
+    hoje = date.today()
+    return EntregaDeCesta.objects.filter(
+        data_entrega__year=hoje.year,
+        data_entrega__month=hoje.month
+    ).values('familia').distinct()
+
+
+@consulta_quente('cestas.relatorio_mensal')
+def relatorio_mensal():
+    hoje = date.today()
+    return EntregaDeCesta.objects.filter(
+        data_entrega__range=[date(hoje.year, 1, 1), hoje]
+    ).annotate(
+        mes=ExtractMonth('data_entrega'),
+        ano=ExtractYear('data_entrega')
+    ).values('mes', 'ano').annotate(
+        total_entregas=Count('id'),
+        total_familias=Count('familia', distinct=True)
+    ).order_by('ano', 'mes')
+
+
+@consulta_quente('cestas.historico_familia')
+def historico_familia():
+    return EntregaDeCesta.objects.filter(familia_id=1).order_by('-data_entrega')
+
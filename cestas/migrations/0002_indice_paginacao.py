@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cestas', '0001_initial'),
+        ('familias', '0002_remove_membro_cpf_remove_membro_parentesco'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entregadecesta',
+            index=models.Index(fields=['data_entrega', 'id'], name='entrega_data_id_idx'),
+        ),
+    ]
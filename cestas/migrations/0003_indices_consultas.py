@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cestas', '0002_indice_paginacao'),
+        ('familias', '0003_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entregadecesta',
+            index=models.Index(fields=['data_entrega', 'familia'], name='entrega_data_familia_idx'),
+        ),
+    ]
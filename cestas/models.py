@@ -27,6 +27,12 @@ class EntregaDeCesta(models.Model):
                 name='unique_familia_data_entrega'
             )
         ]
+        indexes = [
+            # Backs the keyset pagination of the list endpoint
+            models.Index(fields=['data_entrega', 'id'], name='entrega_data_id_idx'),
+            # Covers the monthly totals and distinct-family counts
+            models.Index(fields=['data_entrega', 'familia'], name='entrega_data_familia_idx'),
+        ]
 
     def __str__(self):
         return f"{self.familia.nome} - {self.data_entrega.strftime('%d/%m/%Y')}"
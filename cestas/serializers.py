@@ -1,10 +1,14 @@
 from rest_framework import serializers
 from .models import EntregaDeCesta
 from familias.serializers import FamiliaSerializer
+from core.serializers import CamposDinamicosMixin
 
-class EntregaDeCestaSerializer(serializers.ModelSerializer):
+class EntregaDeCestaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     familia = FamiliaSerializer(read_only=True)
     familia_id = serializers.IntegerField(write_only=True)
+    created_at = serializers.DateTimeField(source='data_criacao', read_only=True)
+    updated_at = serializers.DateTimeField(source='data_atualizacao', read_only=True)
+    expansiveis = {'familia': 'familia_id'}
 
     class Meta:
         model = EntregaDeCesta
@@ -19,3 +23,10 @@ class EntregaDeCestaSerializer(serializers.ModelSerializer):
             'familia_id'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+
+
+class EntregaDeCestaLoteSerializer(serializers.Serializer):
+    """Flat input row for bulk delivery imports; relations are checked in bulk by the view."""
+    familia_id = serializers.IntegerField()
+    data_entrega = serializers.DateField()
+    observacoes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
@@ -1,3 +1,122 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest import mock
+from django.db import IntegrityError
+from core.models import VersaoDados
+from core.testing import QueryCountTestCase
+from familias.models import Familia, Responsavel
+from membros.models import Membro
+from .models import EntregaDeCesta
 
-# Create your tests here.
+
+class EntregaDeCestaQueryCountTest(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.familia = self.criar_familia(2)
+        self.dias = 0
+
+    def criar_familia(self, membros):
+        familia = Familia.objects.create(nome='Família Teste')
+        Responsavel.objects.create(familia=familia, nome_completo='Responsável', telefone='11999999999')
+        for i in range(membros):
+            Membro.objects.create(
+                nome=f'Membro {i}', data_nascimento=date(2015, 1, 1), sexo='M',
+                familia=familia, grau_parentesco='FILHO'
+            )
+        return familia
+
+    def criar_entregas(self, quantidade):
+        for _ in range(quantidade):
+            self.dias += 1
+            EntregaDeCesta.objects.create(
+                familia=self.criar_familia(quantidade),
+                data_entrega=date(2026, 1, 1) + timedelta(days=self.dias)
+            )
+
+    def criar_historico(self, quantidade):
+        for _ in range(quantidade):
+            self.dias += 1
+            EntregaDeCesta.objects.create(
+                familia=self.familia,
+                data_entrega=date(2026, 1, 1) + timedelta(days=self.dias)
+            )
+
+    def test_list(self):
+        self.assertConstantQueries('/api/cestas/cestas/', self.criar_entregas)
+
+    def test_historico(self):
+        self.assertConstantQueries(
+            f'/api/cestas/cestas/historico/?familia_id={self.familia.id}',
+            self.criar_historico
+        )
+
+    def test_familia(self):
+        self.assertConstantQueries(
+            f'/api/cestas/cestas/familia/?familia_id={self.familia.id}',
+            self.criar_historico
+        )
+
+    def test_campos_esparsos(self):
+        self.criar_entregas(2)
+        url = '/api/cestas/cestas/'
+        completo = self.contar_consultas(url)
+        esparso = self.contar_consultas(url + '?fields=id,data_entrega')
+        self.assertLess(esparso, completo)
+        resultado = self.client.get(url, {'fields': 'id,data_entrega'}).data['results'][0]
+        self.assertEqual(set(resultado), {'id', 'data_entrega'})
+
+    def test_expand(self):
+        url = '/api/cestas/cestas/?fields=id,familia.nome,familia.membros&expand=familia'
+        self.assertConstantQueries(url, self.criar_entregas)
+        resultado = self.client.get(url).data['results'][0]
+        # membros was asked for but not expanded, so it stays out along with its prefetch
+        self.assertEqual(resultado['familia'], {'nome': 'Família Teste'})
+
+        resultado = self.client.get('/api/cestas/cestas/', {'expand': ''}).data['results'][0]
+        entrega = EntregaDeCesta.objects.get(pk=resultado['id'])
+        self.assertEqual(resultado['familia'], entrega.familia_id)
+
+
+class LoteEntregasTest(QueryCountTestCase):
+    url = '/api/cestas/cestas/batch_create/'
+
+    def lote(self, quantidade, dia=date(2026, 3, 2)):
+        return [
+            {'familia_id': Familia.objects.create(nome=f'Família {i}').id, 'data_entrega': str(dia)}
+            for i in range(quantidade)
+        ]
+
+    def test_item_invalido_rejeita_o_lote(self):
+        lote = self.lote(3)
+        invalidos = [
+            {'familia_id': 999999, 'data_entrega': '2026-03-02'},
+            dict(lote[0]),
+            {'familia_id': lote[1]['familia_id'], 'data_entrega': 'ontem'},
+        ]
+        response = self.client.post(self.url, lote + invalidos, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([int(erro['indice']) for erro in response.data['erros']], [3, 4, 5])
+        self.assertFalse(EntregaDeCesta.objects.exists())
+
+        # parcial=true keeps the valid rows and reports the rest
+        response = self.client.post(self.url + '?parcial=true', lote + invalidos, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['ids']), 3)
+        self.assertEqual(EntregaDeCesta.objects.count(), 3)
+
+    def test_falha_na_gravacao_desfaz_o_lote(self):
+        lote = self.lote(5)
+        # Fails after bulk_create has inserted the rows, inside the batch's transaction
+        with mock.patch('cestas.views.VersaoDados.incrementar', side_effect=IntegrityError):
+            response = self.client.post(self.url, lote, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(EntregaDeCesta.objects.exists())
+
+    def test_consultas_constantes(self):
+        # The first bump of a version creates its row; keep that out of the counts
+        VersaoDados.incrementar('cestas')
+        contagens = {}
+        for quantidade in (1, 5, 50):
+            lote = self.lote(quantidade, date(2026, 3, quantidade % 28 + 1))
+            contagens[quantidade] = self.contar_consultas(self.url, 'post', lote)
+        self.assertEqual(len(set(contagens.values())), 1, contagens)
+        self.assertEqual(EntregaDeCesta.objects.count(), 56)
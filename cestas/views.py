@@ -5,20 +5,44 @@ from rest_framework.response import Response
 from rest_framework import mixins
 from rest_framework import generics
 from rest_framework.exceptions import ValidationError, PermissionDenied
-from django.db.models import Count, Avg, Q
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Avg, Prefetch, Q
 from datetime import datetime
 from .models import EntregaDeCesta
-from .serializers import EntregaDeCestaSerializer
+from .serializers import EntregaDeCestaSerializer, EntregaDeCestaLoteSerializer
+from core.mixins import EagerLoadingMixin, ExportacaoMixin
+from core.pagination import KeysetPagination
+from core.models import VersaoDados
 from core.permissions import IsStaffOrReadOnly
 from familias.models import Familia
 
-class EntregaDeCestaViewSet(viewsets.ModelViewSet):
+class EntregaDeCestaViewSet(ExportacaoMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = EntregaDeCesta.objects.all()
     serializer_class = EntregaDeCestaSerializer
     permission_classes = [permissions.IsAuthenticated, IsStaffOrReadOnly]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-data_entrega', '-id')
+    eager_loading = {
+        # Prefetched rather than joined so the family's delivery totals can be annotated
+        'familia': (Prefetch('familia', queryset=Familia.objects.com_entregas()),),
+        'familia.membros': ('familia__membros_membros',),
+        'familia.responsaveis': ('familia__responsaveis',),
+    }
+    eager_loading_actions = {
+        'destroy': (),
+        'stats': (),
+    }
+    exportacao_nome = 'entregas-de-cesta'
+    exportacao_campos = (
+        ('ID', 'id'),
+        ('Data da entrega', 'data_entrega'),
+        ('Família ID', 'familia_id'),
+        ('Família', 'familia__nome'),
+        ('Observações', 'observacoes'),
+    )
 
     def get_queryset(self):
-        queryset = self.queryset
+        queryset = super().get_queryset()
         familia_id = self.request.query_params.get('familia_id')
         data_inicio = self.request.query_params.get('data_inicio')
         data_fim = self.request.query_params.get('data_fim')
@@ -33,10 +57,11 @@ class EntregaDeCestaViewSet(viewsets.ModelViewSet):
         return queryset
 
     @action(detail=False, methods=['get'])
-    def familia(self, request, familia_id=None):
+    def familia(self, request):
         """
         Get basket deliveries by family with statistics
         """
+        familia_id = request.query_params.get('familia_id')
         if not familia_id:
             raise ValidationError({
                 'error': 'familia_id is required',
@@ -51,7 +76,7 @@ class EntregaDeCestaViewSet(viewsets.ModelViewSet):
         media_por_mes = total_entregas / (total_meses or 1)
         
         return Response({
-            'entregas': EntregaCestaSerializer(queryset, many=True).data,
+            'entregas': self.get_serializer(queryset, many=True).data,
             'statistics': {
                 'total_entregas': total_entregas,
                 'total_meses': total_meses,
@@ -73,7 +98,7 @@ class EntregaDeCestaViewSet(viewsets.ModelViewSet):
         current_year = datetime.now().year
         
         # Get deliveries by month
-        deliveries = EntregaCesta.objects.filter(
+        deliveries = EntregaDeCesta.objects.filter(
             data_entrega__year=current_year,
             data_entrega__month=current_month
         )
@@ -111,12 +136,12 @@ class EntregaDeCestaViewSet(viewsets.ModelViewSet):
                 'status_code': 400
             })
             
-        historico = EntregaCesta.objects.filter(
+        historico = self.get_queryset().filter(
             familia_id=familia_id
         ).order_by('-data_entrega')
         
         return Response({
-            'historico': EntregaCestaSerializer(historico, many=True).data,
+            'historico': self.get_serializer(historico, many=True).data,
             'total_entregas': historico.count(),
             'ultima_entrega': historico.first().data_entrega if historico.exists() else None
         })
@@ -125,6 +150,9 @@ class EntregaDeCestaViewSet(viewsets.ModelViewSet):
     def batch_create(self, request):
         """
         Create multiple basket deliveries at once
+
+        Every row is validated before anything is written. Unless parcial=true is
+        given, a single invalid row rejects the whole batch.
         """
         if not request.user.is_staff:
             raise PermissionDenied({
@@ -138,21 +166,66 @@ class EntregaDeCestaViewSet(viewsets.ModelViewSet):
                 'error': 'Data must be a list of deliveries',
                 'status_code': 400
             })
-            
-        created_deliveries = []
-        for delivery_data in data:
-            serializer = EntregaCestaSerializer(data=delivery_data)
+        parcial = request.query_params.get('parcial') in ('1', 'true', 'True')
+
+        # Validate the shape of every row without touching the database
+        erros = {}
+        linhas = {}
+        for indice, delivery_data in enumerate(data):
+            serializer = EntregaDeCestaLoteSerializer(data=delivery_data)
             if serializer.is_valid():
-                delivery = serializer.save()
-                created_deliveries.append(serializer.data)
+                linhas[indice] = serializer.validated_data
             else:
-                raise ValidationError({
-                    'error': serializer.errors,
-                    'status_code': 400
-                })
-                
+                erros[indice] = serializer.errors
+
+        # Check families and unique_familia_data_entrega collisions in one query each
+        familia_ids = {linha['familia_id'] for linha in linhas.values()}
+        familias_existentes = set(
+            Familia.objects.filter(id__in=familia_ids).values_list('id', flat=True)
+        )
+        ja_entregues = set(EntregaDeCesta.objects.filter(
+            familia_id__in=familia_ids,
+            data_entrega__in={linha['data_entrega'] for linha in linhas.values()}
+        ).values_list('familia_id', 'data_entrega'))
+
+        vistas = set()
+        for indice, linha in list(linhas.items()):
+            chave = (linha['familia_id'], linha['data_entrega'])
+            if linha['familia_id'] not in familias_existentes:
+                erros[indice] = {'familia_id': ['Família não encontrada.']}
+            elif chave in ja_entregues:
+                erros[indice] = {'non_field_errors': ['Já existe uma entrega para esta família nesta data.']}
+            elif chave in vistas:
+                erros[indice] = {'non_field_errors': ['Entrega duplicada no lote.']}
+            vistas.add(chave)
+            if indice in erros:
+                del linhas[indice]
+
+        erros = [{'indice': indice, 'erros': erros[indice]} for indice in sorted(erros)]
+        if erros and not parcial:
+            raise ValidationError({
+                'error': 'Invalid deliveries, nothing was created',
+                'erros': erros,
+                'status_code': 400
+            })
+
+        try:
+            with transaction.atomic():
+                criadas = EntregaDeCesta.objects.bulk_create(
+                    [EntregaDeCesta(**linha) for linha in linhas.values()],
+                    batch_size=500
+                )
+                # bulk_create skips the model signals that invalidate cached reports
+                VersaoDados.incrementar('cestas')
+        except IntegrityError:
+            raise ValidationError({
+                'error': 'Deliveries were registered concurrently, nothing was created',
+                'status_code': 400
+            })
+
         return Response({
             'message': 'Deliveries created successfully',
-            'data': created_deliveries,
+            'ids': [entrega.id for entrega in criadas],
+            'erros': erros,
             'status_code': 201
-        })
+        }, status=status.HTTP_201_CREATED)
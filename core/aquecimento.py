@@ -0,0 +1,43 @@
+"""
+Pre-computes the hottest cache entries so the first requests after a deploy
+or worker start do not pay for cold aggregates.
+"""
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+
+def aquecer_relatorios():
+    """Runs the dashboard report actions through the view so their cache keys match real requests."""
+    from relatorios.views import RelatorioViewSet
+    from usuarios.models import Usuario
+
+    fabrica = APIRequestFactory()
+    usuario = Usuario(email='aquecimento@localhost', is_staff=True)
+    resultados = {}
+    for acao in ('frequencia', 'cestas', 'programas', 'resumo'):
+        request = fabrica.get(f'/api/relatorios/relatorios/{acao}/')
+        force_authenticate(request, user=usuario)
+        try:
+            response = RelatorioViewSet.as_view({'get': acao})(request)
+            resultados[f'relatorios.{acao}'] = response.status_code
+        except Exception as exc:
+            resultados[f'relatorios.{acao}'] = f'erro: {exc}'
+    return resultados
+
+
+def aquecer_turmas():
+    from turmas.models import Turma
+    return {'turmas.ativas': len(Turma.objects.ativas())}
+
+
+AQUECEDORES = (aquecer_turmas, aquecer_relatorios)
+
+
+def aquecer():
+    """Warms every entry and returns {entry: result or error message}."""
+    resultados = {}
+    for aquecedor in AQUECEDORES:
+        try:
+            resultados.update(aquecedor())
+        except Exception as exc:
+            resultados[aquecedor.__name__] = f'erro: {exc}'
+    return resultados
@@ -0,0 +1,63 @@
+"""
+Registry of hot querysets and EXPLAIN-based index audit.
+
+Apps register the querysets behind their busiest endpoints in a
+``consultas.py`` module with ``@consulta_quente('nome')``; each function
+returns the queryset exactly as the view or manager builds it. The
+``auditar_indices`` command explains every registered queryset and reports
+the ones the database answers with a sequential scan.
+"""
+import re
+
+from django.db import connection, transaction
+from django.utils.module_loading import autodiscover_modules
+
+CONSULTAS = {}
+
+# SQLite: "SCAN tabela" without "USING ... INDEX" reads the whole table
+VARREDURA_SQLITE = re.compile(r'\bSCAN (?P<tabela>\S+)(?! USING)(?:\s|$)')
+VARREDURA_POSTGRES = re.compile(r'Seq Scan on (?P<tabela>\S+)')
+
+
+def consulta_quente(nome):
+    """Registers a function returning a hot queryset under ``nome``."""
+    def decorador(funcao):
+        CONSULTAS[nome] = funcao
+        return funcao
+    return decorador
+
+
+def descobrir():
+    autodiscover_modules('consultas')
+    return CONSULTAS
+
+
+def explicar(queryset):
+    """
+    Returns the query plan of ``queryset`` as text.
+
+    On PostgreSQL sequential scans are disabled while explaining, so a
+    small development table does not hide a missing index: a ``Seq Scan``
+    that survives means no index can serve the query.
+    """
+    if connection.vendor == 'postgresql':
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+    return queryset.explain()
+
+
+def varreduras_sequenciais(plano):
+    """Names of the tables read with a sequential scan in ``plano``."""
+    padrao = VARREDURA_POSTGRES if connection.vendor == 'postgresql' else VARREDURA_SQLITE
+    return sorted({correspondencia.group('tabela') for correspondencia in padrao.finditer(plano)})
+
+
+def auditar(nomes=None):
+    """Yields (nome, plano, tabelas varridas) for each registered hot queryset."""
+    for nome, funcao in sorted(descobrir().items()):
+        if nomes and nome not in nomes:
+            continue
+        plano = explicar(funcao())
+        yield nome, plano, varreduras_sequenciais(plano)
@@ -0,0 +1,672 @@
+"""
+Backup catalog: streaming full and incremental snapshots, deduplicated media and GFS retention.
+
+Layout under BACKUP_DIR::
+
+    catalogo.json                      sequence, files, checksums and row counts of every snapshot
+    snapshots/000001_completo_<ts>/    one folder per snapshot, with a SHA256SUMS file
+    midia/<aa>/<sha256>                media blobs, stored once per distinct content
+
+Full snapshots are physical copies. SQLite is copied with the online
+backup API a few pages at a time, so writers are only paused while each
+step runs. PostgreSQL tables are streamed with ``COPY ... TO STDOUT``
+inside one REPEATABLE READ, READ ONLY transaction, a consistent snapshot
+that never blocks writers. Per-table row counts and content checksums are
+recorded so a restore can be verified.
+
+Incremental snapshots are logical: the rows whose ``data_atualizacao`` (or
+``updated_at``/``atualizado_em``) moved since the previous snapshot
+started, less BACKUP_MARGEM_INCREMENTAL, plus the table's current primary
+keys so deletions replay too. The margin catches rows stamped before that
+snapshot started but committed after it read them; replaying a row twice
+is harmless.
+Tables without such a column are dumped whole. On SQLite they are read
+from an online-backup copy, like a full snapshot, so the dump never holds
+a lock on the live database. New migrations or a long
+chain make the next snapshot a full one.
+
+Every file is compressed and hashed while it is written, so nothing is
+held in memory whatever the size of the database or MEDIA_ROOT.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+TAMANHO_BLOCO = 1024 * 1024
+PAGINAS_POR_PASSO = 1024
+PAUSA_ENTRE_PASSOS = 0.005
+LOTE_LINHAS = 2000
+
+ARQUIVO_CATALOGO = 'catalogo.json'
+ARQUIVO_SOMAS = 'SHA256SUMS'
+ARQUIVO_MIDIA = 'midia.jsonl.gz'
+ARQUIVO_SQLITE = 'banco.sqlite3.gz'
+PASTA_SNAPSHOTS = 'snapshots'
+PASTA_MIDIA = 'midia'
+
+COMPLETO = 'completo'
+INCREMENTAL = 'incremental'
+
+# Columns that tell which rows changed, in order of preference
+COLUNAS_ATUALIZACAO = ('data_atualizacao', 'updated_at', 'atualizado_em')
+
+
+class EscritorComHash:
+    """Write-through file wrapper that tracks the SHA-256 and size of what it writes."""
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.hash = hashlib.sha256()
+        self.tamanho = 0
+
+    def write(self, dados):
+        self.hash.update(dados)
+        self.tamanho += len(dados)
+        return self.arquivo.write(dados)
+
+    def flush(self):
+        self.arquivo.flush()
+
+    def tell(self):
+        return self.tamanho
+
+
+class ArquivoDeBackup:
+    """
+    Opens ``caminho`` for a compressed, hashed write; use as a context manager.
+
+    After the block, ``resultado`` holds the file's name, SHA-256 and size.
+    """
+
+    def __init__(self, caminho, comprimir=True):
+        self.caminho = caminho
+        self.comprimir = comprimir
+
+    def __enter__(self):
+        self.arquivo = open(self.caminho, 'wb')
+        self.escritor = EscritorComHash(self.arquivo)
+        self.saida = gzip.GzipFile(fileobj=self.escritor, mode='wb', compresslevel=6) if self.comprimir else self.escritor
+        return self.saida
+
+    def __exit__(self, *exc):
+        if self.comprimir:
+            self.saida.close()
+        self.arquivo.close()
+        self.resultado = {
+            'nome': os.path.basename(self.caminho),
+            'sha256': self.escritor.hash.hexdigest(),
+            'tamanho': self.escritor.tamanho,
+        }
+        return False
+
+
+def sha256_arquivo(caminho):
+    soma = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), b''):
+            soma.update(bloco)
+    return soma.hexdigest()
+
+
+def _valor_json(valor):
+    if isinstance(valor, (datetime, date, time)):
+        return valor.isoformat()
+    if isinstance(valor, (Decimal, uuid.UUID, timedelta)):
+        return str(valor)
+    raise TypeError(f'Valor sem representação no backup: {type(valor).__name__}')
+
+
+def linha_json(valores):
+    return json.dumps(list(valores), default=_valor_json, ensure_ascii=False, separators=(',', ':'))
+
+
+# Database readers. Both return values exactly as the database stores
+# them, so checksums taken at backup time can be recomputed on a restore.
+
+class FonteSQLite:
+    """Reads a SQLite file through the sqlite3 module, inside one read transaction."""
+    placeholder = '?'
+
+    def __init__(self, caminho, somente_leitura=True):
+        uri = f'file:{caminho}?mode=ro' if somente_leitura else f'file:{caminho}'
+        self.conexao = sqlite3.connect(uri, uri=True, isolation_level=None, check_same_thread=False)
+        self.conexao.execute('BEGIN')
+
+    def fechar(self):
+        self.conexao.rollback()
+        self.conexao.close()
+
+    @staticmethod
+    def nome(identificador):
+        return '"%s"' % identificador.replace('"', '""')
+
+    def tabelas(self):
+        linhas = list(self.conexao.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        ))
+        # Full-text tables and their shadow tables are derived data: triggers rebuild them from the source table
+        virtuais = [nome for nome, sql in linhas if (sql or '').upper().startswith('CREATE VIRTUAL TABLE')]
+        return [
+            nome for nome, _ in linhas
+            if not any(nome == virtual or nome.startswith(f'{virtual}_') for virtual in virtuais)
+        ]
+
+    def colunas(self, tabela):
+        """Returns (colunas, chave primária or None)."""
+        info = list(self.conexao.execute(f'PRAGMA table_info({self.nome(tabela)})'))
+        chaves = [linha[1] for linha in info if linha[5]]
+        return [linha[1] for linha in info], chaves[0] if len(chaves) == 1 else None
+
+    def consultar(self, sql, params=()):
+        cursor = self.conexao.execute(sql, params)
+        while True:
+            linhas = cursor.fetchmany(LOTE_LINHAS)
+            if not linhas:
+                break
+            yield from linhas
+
+    def valor_data(self, momento):
+        return connection.ops.adapt_datetimefield_value(momento)
+
+
+class FontePostgres:
+    """Reads through a Django connection; use it inside the snapshot's transaction."""
+    placeholder = '%s'
+
+    def __init__(self, conexao=None):
+        self.conexao = conexao or connection
+
+    def fechar(self):
+        pass
+
+    def nome(self, identificador):
+        return self.conexao.ops.quote_name(identificador)
+
+    def tabelas(self):
+        with self.conexao.cursor() as cursor:
+            return sorted(self.conexao.introspection.table_names(cursor))
+
+    def colunas(self, tabela):
+        with self.conexao.cursor() as cursor:
+            descricao = self.conexao.introspection.get_table_description(cursor, tabela)
+            chave = self.conexao.introspection.get_primary_key_column(cursor, tabela)
+        return [coluna.name for coluna in descricao], chave
+
+    def consultar(self, sql, params=()):
+        # Server-side cursor, so large tables arrive in chunks
+        with self.conexao.chunked_cursor() as cursor:
+            cursor.execute(sql, params)
+            while True:
+                linhas = cursor.fetchmany(LOTE_LINHAS)
+                if not linhas:
+                    break
+                yield from linhas
+
+    def valor_data(self, momento):
+        return momento
+
+
+def estatisticas_tabela(fonte, tabela):
+    """Row count and SHA-256 of the table's rows in primary key order."""
+    colunas, chave = fonte.colunas(tabela)
+    ordem = fonte.nome(chave) if chave else ', '.join(fonte.nome(coluna) for coluna in colunas)
+    soma = hashlib.sha256()
+    linhas = 0
+    for linha in fonte.consultar(f'SELECT * FROM {fonte.nome(tabela)} ORDER BY {ordem}'):
+        soma.update(linha_json(linha).encode('utf-8') + b'\n')
+        linhas += 1
+    return {'linhas': linhas, 'sha256': soma.hexdigest()}
+
+
+def tabelas_ignoradas():
+    """Tables not worth an incremental dump: the database cache is rebuilt on demand."""
+    cache = settings.CACHES.get('default', {})
+    if cache.get('BACKEND') == 'django.core.cache.backends.db.DatabaseCache':
+        return {cache['LOCATION']}
+    return set()
+
+
+# Full (physical) snapshots
+
+@contextmanager
+def copia_sqlite(pasta):
+    """
+    Yields the path of a copy of the SQLite database, made with the online backup API.
+
+    The copy is taken a few pages at a time, so writers are only paused
+    while each step runs; everything after that reads the copy and leaves
+    the live database alone.
+    """
+    connection.ensure_connection()
+    with tempfile.NamedTemporaryFile(dir=pasta, suffix='.sqlite3', delete=False) as temporario:
+        caminho = temporario.name
+    try:
+        destino = sqlite3.connect(caminho)
+        try:
+            connection.connection.backup(destino, pages=PAGINAS_POR_PASSO, sleep=PAUSA_ENTRE_PASSOS)
+        finally:
+            destino.close()
+        yield caminho
+    finally:
+        os.remove(caminho)
+
+
+def backup_sqlite(pasta):
+    """Copies the SQLite database, takes its stats and compresses the copy."""
+    with copia_sqlite(pasta) as caminho:
+        fonte = FonteSQLite(caminho)
+        try:
+            tabelas = {tabela: estatisticas_tabela(fonte, tabela) for tabela in fonte.tabelas()}
+        finally:
+            fonte.fechar()
+
+        arquivo = ArquivoDeBackup(os.path.join(pasta, ARQUIVO_SQLITE))
+        with arquivo as saida, open(caminho, 'rb') as origem:
+            shutil.copyfileobj(origem, saida, TAMANHO_BLOCO)
+        return [arquivo.resultado], tabelas
+
+
+def _copiar_tabela(cursor, tabela, saida):
+    sql = f'COPY {connection.ops.quote_name(tabela)} TO STDOUT'
+    if hasattr(cursor, 'copy'):
+        # psycopg 3
+        with cursor.copy(sql) as copia:
+            for bloco in copia:
+                saida.write(bloco)
+    else:
+        # psycopg2
+        cursor.copy_expert(sql, saida, size=TAMANHO_BLOCO)
+
+
+def backup_postgres(pasta):
+    """Streams every table with COPY from one consistent, non-blocking snapshot."""
+    arquivos, tabelas = [], {}
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+        fonte = FontePostgres()
+        for tabela in fonte.tabelas():
+            arquivo = ArquivoDeBackup(os.path.join(pasta, f'{tabela}.copy.gz'))
+            with arquivo as saida, connection.cursor() as cursor:
+                _copiar_tabela(cursor.cursor, tabela, saida)
+            arquivos.append(arquivo.resultado)
+            tabelas[tabela] = estatisticas_tabela(fonte, tabela)
+    return arquivos, tabelas
+
+
+# Incremental (logical) snapshots
+
+def _dump_incremental(fonte, pasta, desde):
+    arquivos, tabelas = [], {}
+    ignoradas = tabelas_ignoradas()
+    for tabela in fonte.tabelas():
+        if tabela in ignoradas:
+            continue
+        colunas, chave = fonte.colunas(tabela)
+        coluna_data = next((coluna for coluna in COLUNAS_ATUALIZACAO if coluna in colunas), None)
+        parcial = bool(chave and coluna_data)
+        nome_tabela = fonte.nome(tabela)
+
+        sql, params = f'SELECT * FROM {nome_tabela}', ()
+        if parcial:
+            # ``desde`` already reaches back past the previous snapshot's start (see executar_backup)
+            sql += f' WHERE {fonte.nome(coluna_data)} >= {fonte.placeholder}'
+            params = (fonte.valor_data(desde),)
+
+        arquivo = ArquivoDeBackup(os.path.join(pasta, f'{tabela}.jsonl.gz'))
+        alteradas = 0
+        with arquivo as saida:
+            cabecalho = {'tabela': tabela, 'colunas': colunas, 'chave': chave, 'completa': not parcial}
+            saida.write(json.dumps(cabecalho).encode('utf-8') + b'\n')
+            for linha in fonte.consultar(sql, params):
+                saida.write(linha_json(linha).encode('utf-8') + b'\n')
+                alteradas += 1
+        arquivos.append(arquivo.resultado)
+
+        estatisticas = {'alteradas': alteradas, 'linhas': alteradas}
+        if parcial:
+            ids = ArquivoDeBackup(os.path.join(pasta, f'{tabela}.ids.gz'))
+            linhas = 0
+            with ids as saida:
+                for (valor,) in fonte.consultar(f'SELECT {fonte.nome(chave)} FROM {nome_tabela}'):
+                    saida.write(linha_json([valor]).encode('utf-8') + b'\n')
+                    linhas += 1
+            arquivos.append(ids.resultado)
+            estatisticas['linhas'] = linhas
+        tabelas[tabela] = estatisticas
+    return arquivos, tabelas
+
+
+def backup_incremental(pasta, desde):
+    if connection.vendor == 'sqlite':
+        # A read transaction on the live file would lock writers out for the whole dump
+        with copia_sqlite(pasta) as caminho:
+            fonte = FonteSQLite(caminho)
+            try:
+                return _dump_incremental(fonte, pasta, desde)
+            finally:
+                fonte.fechar()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+        return _dump_incremental(FontePostgres(), pasta, desde)
+
+
+# Media: content-addressed, deduplicated store
+
+def caminho_blob(raiz, sha256):
+    return os.path.join(raiz, PASTA_MIDIA, sha256[:2], sha256)
+
+
+def ler_manifesto_midia(pasta):
+    caminho = os.path.join(pasta, ARQUIVO_MIDIA)
+    if not os.path.exists(caminho):
+        return
+    with gzip.open(caminho, 'rt', encoding='utf-8') as manifesto:
+        for linha in manifesto:
+            yield json.loads(linha)
+
+
+def _guardar_blob(raiz, origem):
+    """Copies ``origem`` into the store, hashing it on the way; returns (sha256, novo)."""
+    pasta_midia = os.path.join(raiz, PASTA_MIDIA)
+    os.makedirs(pasta_midia, exist_ok=True)
+    soma = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=pasta_midia, delete=False) as temporario:
+        with open(origem, 'rb') as arquivo:
+            for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), b''):
+                soma.update(bloco)
+                temporario.write(bloco)
+    sha256 = soma.hexdigest()
+    destino = caminho_blob(raiz, sha256)
+    if os.path.exists(destino):
+        os.remove(temporario.name)
+        return sha256, False
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    os.replace(temporario.name, destino)
+    return sha256, True
+
+
+def backup_midia(raiz, pasta, anterior=None, midia_root=None):
+    """
+    Stores each MEDIA_ROOT file once per distinct content and writes the snapshot's manifest.
+
+    Files whose size and mtime match the previous snapshot's manifest are
+    not read again: their blob is already in the store.
+    """
+    midia_root = midia_root or settings.MEDIA_ROOT
+    conhecidos = {item['caminho']: item for item in ler_manifesto_midia(anterior)} if anterior else {}
+
+    estatisticas = {'arquivos': 0, 'bytes': 0, 'novos': 0, 'bytes_novos': 0}
+    arquivo = ArquivoDeBackup(os.path.join(pasta, ARQUIVO_MIDIA))
+    with arquivo as saida:
+        if os.path.isdir(midia_root):
+            for diretorio, subdiretorios, nomes in os.walk(midia_root):
+                subdiretorios.sort()
+                for nome in sorted(nomes):
+                    caminho = os.path.join(diretorio, nome)
+                    relativo = os.path.relpath(caminho, midia_root)
+                    info = os.stat(caminho)
+                    conhecido = conhecidos.get(relativo)
+                    if (conhecido and conhecido['tamanho'] == info.st_size
+                            and conhecido['mtime_ns'] == info.st_mtime_ns
+                            and os.path.exists(caminho_blob(raiz, conhecido['sha256']))):
+                        sha256, novo = conhecido['sha256'], False
+                    else:
+                        sha256, novo = _guardar_blob(raiz, caminho)
+                    item = {'caminho': relativo, 'sha256': sha256, 'tamanho': info.st_size, 'mtime_ns': info.st_mtime_ns}
+                    saida.write(json.dumps(item, ensure_ascii=False).encode('utf-8') + b'\n')
+                    estatisticas['arquivos'] += 1
+                    estatisticas['bytes'] += info.st_size
+                    if novo:
+                        estatisticas['novos'] += 1
+                        estatisticas['bytes_novos'] += info.st_size
+    return [arquivo.resultado], estatisticas
+
+
+# Catalog
+
+class Catalogo:
+    """The manifest of every snapshot in a backup directory."""
+
+    def __init__(self, raiz=None):
+        self.raiz = raiz or settings.BACKUP_DIR
+        self.caminho = os.path.join(self.raiz, ARQUIVO_CATALOGO)
+        if os.path.exists(self.caminho):
+            with open(self.caminho) as arquivo:
+                self.dados = json.load(arquivo)
+        else:
+            self.dados = {'versao': 1, 'snapshots': [], 'restauracoes': []}
+
+    @property
+    def snapshots(self):
+        return self.dados['snapshots']
+
+    def salvar(self):
+        os.makedirs(self.raiz, exist_ok=True)
+        temporario = self.caminho + '.tmp'
+        with open(temporario, 'w') as arquivo:
+            json.dump(self.dados, arquivo, indent=2, ensure_ascii=False)
+        os.replace(temporario, self.caminho)
+
+    def ultimo(self):
+        return self.snapshots[-1] if self.snapshots else None
+
+    def obter(self, sequencia):
+        for snapshot in self.snapshots:
+            if snapshot['sequencia'] == sequencia:
+                return snapshot
+        raise KeyError(f'Snapshot {sequencia} não está no catálogo')
+
+    def cadeia(self, sequencia):
+        """The full snapshot ``sequencia`` builds on, followed by its incrementals up to it."""
+        cadeia = [self.obter(sequencia)]
+        while cadeia[0]['anterior'] is not None:
+            cadeia.insert(0, self.obter(cadeia[0]['anterior']))
+        return cadeia
+
+    def pasta(self, snapshot):
+        return os.path.join(self.raiz, PASTA_SNAPSHOTS, snapshot['nome'])
+
+    @contextmanager
+    def trava(self):
+        """Keeps two backup, cleanup or restore runs from touching the catalog at once."""
+        os.makedirs(self.raiz, exist_ok=True)
+        caminho = os.path.join(self.raiz, '.trava')
+        try:
+            descritor = os.open(caminho, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            raise RuntimeError(f'Outra operação de backup está em andamento (remova {caminho} se não estiver)')
+        try:
+            os.write(descritor, str(os.getpid()).encode())
+            yield
+        finally:
+            os.close(descritor)
+            os.remove(caminho)
+
+
+def assinatura_migracoes(conexao=None):
+    """Hash of the applied migrations; when it changes, incrementals can no longer be replayed."""
+    aplicadas = sorted(MigrationRecorder(conexao or connection).applied_migrations())
+    return hashlib.sha256(repr(aplicadas).encode()).hexdigest()
+
+
+def escrever_somas(pasta, arquivos):
+    with open(os.path.join(pasta, ARQUIVO_SOMAS), 'w') as somas:
+        for arquivo in arquivos:
+            somas.write(f"{arquivo['sha256']}  {arquivo['nome']}\n")
+
+
+def executar_backup(raiz=None, midia=True, incremental=False):
+    """
+    Takes a snapshot, records it in the catalog and returns its entry.
+
+    ``incremental=True`` still takes a full snapshot when there is nothing
+    to build on, the migrations changed or the chain already has
+    BACKUP_INCREMENTAIS_MAX incrementals. Raises RuntimeError for a
+    database other than SQLite or PostgreSQL.
+    """
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        raise RuntimeError(f'Backup não suportado para o banco {connection.vendor}')
+    catalogo = Catalogo(raiz)
+    with catalogo.trava():
+        anterior = catalogo.ultimo()
+        migracoes = assinatura_migracoes()
+        incremental = bool(
+            incremental and anterior
+            and anterior['banco'] == connection.vendor
+            and anterior['migracoes'] == migracoes
+            and len(catalogo.cadeia(anterior['sequencia'])) <= settings.BACKUP_INCREMENTAIS_MAX
+        )
+
+        iniciado_em = timezone.now()
+        desde = None
+        if incremental:
+            # A transaction open when the previous snapshot read the data commits rows stamped earlier
+            margem = timedelta(seconds=settings.BACKUP_MARGEM_INCREMENTAL)
+            desde = parse_datetime(anterior['iniciado_em']) - margem
+        sequencia = (anterior['sequencia'] if anterior else 0) + 1
+        tipo = INCREMENTAL if incremental else COMPLETO
+        snapshot = {
+            'sequencia': sequencia,
+            'nome': f"{sequencia:06d}_{tipo}_{timezone.localtime(iniciado_em).strftime('%Y%m%d_%H%M%S')}",
+            'tipo': tipo,
+            'anterior': anterior['sequencia'] if incremental else None,
+            'banco': connection.vendor,
+            'migracoes': migracoes,
+            'iniciado_em': iniciado_em.isoformat(),
+            'desde': desde.isoformat() if desde else None,
+        }
+        pasta = catalogo.pasta(snapshot)
+        os.makedirs(pasta)
+
+        try:
+            if incremental:
+                arquivos, tabelas = backup_incremental(pasta, desde)
+            elif connection.vendor == 'sqlite':
+                arquivos, tabelas = backup_sqlite(pasta)
+            else:
+                arquivos, tabelas = backup_postgres(pasta)
+
+            if midia:
+                arquivos_midia, snapshot['midia'] = backup_midia(
+                    catalogo.raiz, pasta, catalogo.pasta(anterior) if anterior else None
+                )
+                arquivos += arquivos_midia
+            escrever_somas(pasta, arquivos)
+        except BaseException:
+            # Never leave a half-written snapshot behind
+            shutil.rmtree(pasta, ignore_errors=True)
+            raise
+
+        snapshot.update({
+            'concluido_em': timezone.now().isoformat(),
+            'arquivos': arquivos,
+            'tabelas': tabelas,
+        })
+        catalogo.snapshots.append(snapshot)
+        catalogo.salvar()
+    return snapshot
+
+
+def verificar_backup(pasta):
+    """Rechecks every file against SHA256SUMS; returns the names that do not match."""
+    divergentes = []
+    with open(os.path.join(pasta, ARQUIVO_SOMAS)) as somas:
+        for linha in somas:
+            esperado, nome = linha.rstrip('\n').split('  ', 1)
+            caminho = os.path.join(pasta, nome)
+            if not os.path.exists(caminho) or sha256_arquivo(caminho) != esperado:
+                divergentes.append(nome)
+    return divergentes
+
+
+# Retention
+
+def selecionar_retencao(snapshots, diarios, semanais, mensais):
+    """
+    Grandfather-father-son selection of restore points.
+
+    Keeps the newest snapshot of each of the last ``diarios`` days,
+    ``semanais`` ISO weeks and ``mensais`` months that have backups, the
+    newest snapshot overall, and every snapshot those depend on.
+    """
+    por_sequencia = {snapshot['sequencia']: snapshot for snapshot in snapshots}
+    pontos = sorted(snapshots, key=lambda snapshot: snapshot['sequencia'], reverse=True)
+    manter = {pontos[0]['sequencia']} if pontos else set()
+
+    periodos = (
+        (diarios, lambda momento: momento.date()),
+        (semanais, lambda momento: momento.isocalendar()[:2]),
+        (mensais, lambda momento: (momento.year, momento.month)),
+    )
+    for quantidade, periodo_de in periodos:
+        vistos = set()
+        for snapshot in pontos:
+            periodo = periodo_de(timezone.localtime(parse_datetime(snapshot['iniciado_em'])))
+            if periodo in vistos:
+                continue
+            if len(vistos) >= quantidade:
+                break
+            vistos.add(periodo)
+            manter.add(snapshot['sequencia'])
+
+    for sequencia in list(manter):
+        anterior = por_sequencia[sequencia]['anterior']
+        while anterior is not None:
+            manter.add(anterior)
+            anterior = por_sequencia[anterior]['anterior']
+    return manter
+
+
+def aplicar_retencao(raiz=None, diarios=None, semanais=None, mensais=None, simular=False):
+    """
+    Removes the snapshots outside the GFS window and the media blobs no kept snapshot references.
+
+    Returns (snapshots removidos, blobs removidos); ``simular=True`` only reports them.
+    """
+    catalogo = Catalogo(raiz)
+    with catalogo.trava():
+        manter = selecionar_retencao(
+            catalogo.snapshots,
+            settings.BACKUP_RETENCAO_DIARIA if diarios is None else diarios,
+            settings.BACKUP_RETENCAO_SEMANAL if semanais is None else semanais,
+            settings.BACKUP_RETENCAO_MENSAL if mensais is None else mensais,
+        )
+        mantidos = [snapshot for snapshot in catalogo.snapshots if snapshot['sequencia'] in manter]
+        removidos = [snapshot for snapshot in catalogo.snapshots if snapshot['sequencia'] not in manter]
+
+        referenciados = set()
+        for snapshot in mantidos:
+            referenciados.update(item['sha256'] for item in ler_manifesto_midia(catalogo.pasta(snapshot)))
+        blobs_removidos = []
+        pasta_midia = os.path.join(catalogo.raiz, PASTA_MIDIA)
+        for diretorio, _, nomes in os.walk(pasta_midia):
+            for nome in nomes:
+                # Leftover temp files from an interrupted backup go too
+                if nome not in referenciados:
+                    blobs_removidos.append(os.path.join(diretorio, nome))
+
+        if not simular:
+            # Catalog first: a crash halfway leaves orphan files, never entries pointing at nothing
+            catalogo.dados['snapshots'] = mantidos
+            catalogo.salvar()
+            for snapshot in removidos:
+                shutil.rmtree(catalogo.pasta(snapshot), ignore_errors=True)
+            for caminho in blobs_removidos:
+                os.remove(caminho)
+    return removidos, blobs_removidos
@@ -0,0 +1,327 @@
+"""
+Query-count, latency and memory benchmark for every API endpoint.
+
+Used by the ``benchmark`` management command. The dataset is seeded into the
+test database, so the real database is never touched.
+"""
+import logging
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import brotli
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.renderers import OrjsonRenderer
+
+# Tamanho padrão do conjunto de dados sintético
+ESCALA_PADRAO = {
+    'familias': 5000,
+    'membros': 20000,
+    'presencas': 1000000,
+    'entregas': 100000,
+}
+
+LOTE = 5000
+
+# Endpoints de resposta mais pesada, usados na comparação de serialização
+ENDPOINTS_SERIALIZACAO = ('familia-list', 'presenca-report', 'relatorio-resumo')
+
+
+def escalar(fator):
+    return {chave: max(1, int(valor * fator)) for chave, valor in ESCALA_PADRAO.items()}
+
+
+def popular_dados(escala, seed=42, log=print):
+    """Seeds a synthetic dataset with the given row counts using bulk inserts."""
+    from familias.models import Familia, Responsavel
+    from membros.models import Membro
+    from turmas.models import Turma
+    from presencas.models import Presenca
+    from cestas.models import EntregaDeCesta
+    from django.core.management import call_command
+
+    aleatorio = random.Random(seed)
+    bairros = ['Centro', 'Jardim América', 'Vila Nova', 'São José', 'Boa Vista']
+
+    Turma.objects.bulk_create([
+        Turma(nome=f'Turma {minima}-{minima + 2}', idade_minima=minima, idade_maxima=minima + 2)
+        for minima in range(4, 17, 3)
+    ])
+    turmas = list(Turma.objects.values_list('id', 'idade_minima', 'idade_maxima'))
+
+    log(f"Famílias: {escala['familias']}")
+    Familia.objects.bulk_create((
+        Familia(
+            nome=f'Família {i}',
+            bairro=aleatorio.choice(bairros),
+            cidade='São Paulo',
+            estado='SP',
+            recebe_programas_sociais=aleatorio.random() < 0.6,
+            programas_sociais='Bolsa Família' if aleatorio.random() < 0.5 else None
+        )
+        for i in range(escala['familias'])
+    ), batch_size=LOTE)
+    familia_ids = list(Familia.objects.values_list('id', flat=True))
+    Responsavel.objects.bulk_create((
+        Responsavel(familia_id=familia_id, nome_completo=f'Responsável {familia_id}', telefone='11999999999')
+        for familia_id in familia_ids
+    ), batch_size=LOTE)
+
+    log(f"Membros: {escala['membros']}")
+    Membro.objects.bulk_create((
+        Membro(
+            nome=f'Membro {i}',
+            data_nascimento=date(2008, 1, 1) + timedelta(days=aleatorio.randrange(365 * 14)),
+            sexo=aleatorio.choice('MF'),
+            familia_id=familia_ids[i % len(familia_ids)],
+            grau_parentesco='FILHO'
+        )
+        for i in range(escala['membros'])
+    ), batch_size=LOTE)
+    membros = list(Membro.objects.values_list('id', 'data_nascimento'))
+
+    log(f"Presenças: {escala['presencas']}")
+    encontros = max(1, escala['presencas'] // len(membros))
+    inicio = date.today() - timedelta(weeks=encontros)
+
+    def turma_para(nascimento, dia):
+        idade = dia.year - nascimento.year
+        for turma_id, minima, maxima in turmas:
+            if minima <= idade <= maxima:
+                return turma_id
+        return None
+
+    def gerar_presencas():
+        for semana in range(encontros):
+            dia = inicio + timedelta(weeks=semana)
+            for membro_id, nascimento in membros:
+                yield Presenca(
+                    membro_id=membro_id,
+                    data=dia,
+                    presente=aleatorio.random() < 0.8,
+                    turma_id=turma_para(nascimento, dia)
+                )
+
+    Presenca.objects.bulk_create(gerar_presencas(), batch_size=LOTE)
+    call_command('recalcular_frequencia', verbosity=0)
+    # bulk_create skips the signals that keep the search index current
+    call_command('reindexar_busca', verbosity=0)
+
+    log(f"Entregas de cesta: {escala['entregas']}")
+    meses = max(1, escala['entregas'] // len(familia_ids))
+    EntregaDeCesta.objects.bulk_create((
+        EntregaDeCesta(familia_id=familia_id, data_entrega=date.today() - timedelta(days=30 * mes))
+        for mes in range(meses)
+        for familia_id in familia_ids
+    ), batch_size=LOTE)
+
+
+def listar_endpoints():
+    """
+    Yields (nome, url_name, metodo, viewset) for every router route.
+
+    Only GET routes are listed here; write routes are benchmarked through
+    explicit scenarios because they need a payload.
+    """
+    def percorrer(padroes):
+        for padrao in padroes:
+            if isinstance(padrao, URLResolver):
+                yield from percorrer(padrao.url_patterns)
+            elif isinstance(padrao, URLPattern):
+                acoes = getattr(padrao.callback, 'actions', None)
+                if not acoes or 'format' in str(padrao.pattern) or 'get' not in acoes:
+                    continue
+                yield padrao.name, str(padrao.pattern), padrao.callback.cls
+
+    vistos = set()
+    for nome, padrao, viewset in percorrer(get_resolver().url_patterns):
+        if nome not in vistos:
+            vistos.add(nome)
+            yield nome, '(?P<pk>' in padrao, viewset
+
+
+def parametros_por_endpoint():
+    """Query strings needed by actions that require parameters."""
+    from membros.models import Membro
+    from familias.models import Familia
+    from turmas.models import Turma
+
+    membro = Membro.objects.order_by('id').values_list('id', flat=True).first()
+    familia = Familia.objects.order_by('id').values_list('id', flat=True).first()
+    turma = Turma.objects.order_by('id').values_list('id', flat=True).first()
+    hoje = date.today()
+    periodo = {'data_inicio': (hoje - timedelta(days=365)).isoformat(), 'data_fim': hoje.isoformat()}
+    return {
+        'presenca-historico': {'membro_id': membro},
+        'presenca-report': {'membro': membro},
+        'presenca-turma': {'turma_id': turma, 'data': hoje.isoformat()},
+        'entregadecesta-familia': {'familia_id': familia},
+        'entregadecesta-historico': {'familia_id': familia},
+        'relatorio-frequencia': periodo,
+        'relatorio-frequencia-mensal': periodo,
+        'relatorio-cestas': periodo,
+        'relatorio-resumo': periodo,
+        'busca-list': {'q': 'respons 1'},
+    }
+
+
+def cenarios_de_escrita():
+    """Yields (nome, url, payload) for write endpoints, run inside a rolled back transaction."""
+    from membros.models import Membro
+    from familias.models import Familia
+    from turmas.models import Turma
+
+    turma = Turma.objects.order_by('id').values_list('id', flat=True).first()
+    membros = list(Membro.objects.order_by('id').values_list('id', flat=True)[:60])
+    familias = list(Familia.objects.order_by('id').values_list('id', flat=True)[:300])
+    dia = date.today() + timedelta(days=1)
+    yield 'presenca-chamada', reverse('presenca-chamada'), {
+        'turma_id': turma,
+        'data': dia.isoformat(),
+        'presencas': [{'membro_id': membro_id, 'presente': True} for membro_id in membros],
+    }
+    yield 'entregadecesta-batch-create', reverse('entregadecesta-batch-create'), [
+        {'familia_id': familia_id, 'data_entrega': dia.isoformat()} for familia_id in familias
+    ]
+
+
+def percentil(amostras, p):
+    ordenadas = sorted(amostras)
+    indice = min(len(ordenadas) - 1, max(0, round(p / 100 * len(ordenadas)) - 1))
+    return ordenadas[indice]
+
+
+def medir(client, metodo, url, dados=None, repeticoes=10, rollback=False):
+    """
+    Runs a request repeatedly and returns its query count, latency percentiles and peak memory.
+
+    Memory is traced on a separate extra run so tracemalloc overhead does not
+    inflate the latency samples.
+    """
+    def requisitar():
+        cache.clear()
+        with transaction.atomic():
+            inicio = time.perf_counter()
+            response = getattr(client, metodo)(url, dados, format='json')
+            duracao = (time.perf_counter() - inicio) * 1000
+            if rollback:
+                transaction.set_rollback(True)
+        return response, duracao
+
+    latencias = []
+    for _ in range(repeticoes):
+        # The query log is a bounded deque; keep it short so the capture indexes stay valid
+        reset_queries()
+        with CaptureQueriesContext(connection) as contexto:
+            response, duracao = requisitar()
+        latencias.append(duracao)
+
+    tracemalloc.start()
+    try:
+        requisitar()
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'consultas': len(contexto),
+        'p50_ms': round(statistics.median(latencias), 2),
+        'p95_ms': round(percentil(latencias, 95), 2),
+        'pico_memoria_kb': round(pico / 1024, 1),
+    }
+
+
+def executar(usuario, repeticoes=10):
+    """Benchmarks every endpoint and returns a {nome: medidas} dict."""
+    # Failing endpoints are reported in the results, not as tracebacks
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    client = APIClient()
+    client.raise_request_exception = False
+    client.force_authenticate(usuario)
+    parametros = parametros_por_endpoint()
+    resultados = {}
+
+    for nome, detalhe, viewset in listar_endpoints():
+        kwargs = {}
+        if detalhe:
+            pk = viewset.queryset.order_by('pk').values_list('pk', flat=True).first()
+            if pk is None:
+                continue
+            kwargs['pk'] = pk
+        url = reverse(nome, kwargs=kwargs)
+        resultados[nome] = medir(client, 'get', url, parametros.get(nome), repeticoes)
+
+    for nome, url, payload in cenarios_de_escrita():
+        resultados[nome] = medir(client, 'post', url, payload, repeticoes, rollback=True)
+
+    return resultados
+
+
+def comparar_serializacao(usuario, repeticoes=10):
+    """
+    Renders the heaviest responses with DRF's JSONRenderer and with
+    OrjsonRenderer, and measures the body raw, in gzip and in brotli.
+
+    Returns {nome: medidas}; times are the median of ``repeticoes`` renders.
+    """
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    client = APIClient()
+    client.raise_request_exception = False
+    client.force_authenticate(usuario)
+    parametros = parametros_por_endpoint()
+    renderers = {'json': JSONRenderer(), 'orjson': OrjsonRenderer()}
+    resultados = {}
+    for nome in ENDPOINTS_SERIALIZACAO:
+        response = client.get(reverse(nome), parametros.get(nome))
+        medidas = {'status': response.status_code}
+        if not hasattr(response, 'data'):
+            # A crash has no serialized data to compare
+            resultados[nome] = medidas
+            continue
+        for rotulo, renderer in renderers.items():
+            amostras = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                corpo = renderer.render(response.data)
+                amostras.append((time.perf_counter() - inicio) * 1000)
+            medidas[f'{rotulo}_ms'] = round(statistics.median(amostras), 3)
+        medidas['bytes'] = len(corpo)
+        medidas['gzip_bytes'] = len(compress_string(corpo))
+        medidas['br_bytes'] = len(brotli.compress(corpo, quality=settings.COMPRESSAO_QUALIDADE_BROTLI))
+        resultados[nome] = medidas
+    return resultados
+
+
+def comparar(resultados, baseline, tolerancia):
+    """
+    Returns the list of regressions against a stored baseline.
+
+    Query counts must not grow at all; latency and memory may grow up to
+    ``tolerancia`` (a fraction) plus a small absolute slack before counting
+    as a regression, so sub-millisecond noise does not fail the gate.
+    """
+    folga = {'p95_ms': 5, 'pico_memoria_kb': 256}
+    regressoes = []
+    for nome, atual in sorted(resultados.items()):
+        anterior = baseline.get(nome)
+        if anterior is None:
+            continue
+        if anterior['status'] < 400 <= atual['status']:
+            regressoes.append(f"{nome}: status {anterior['status']} -> {atual['status']}")
+        if atual['consultas'] > anterior['consultas']:
+            regressoes.append(f"{nome}: consultas {anterior['consultas']} -> {atual['consultas']}")
+        for medida in ('p95_ms', 'pico_memoria_kb'):
+            if atual[medida] > anterior[medida] * (1 + tolerancia) + folga[medida]:
+                regressoes.append(f"{nome}: {medida} {anterior[medida]} -> {atual[medida]}")
+    return regressoes
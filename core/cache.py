@@ -0,0 +1,18 @@
+from django.core.cache import cache
+from core.models import VersaoDados
+
+
+def em_cache_versionado(prefixo, fontes, calcular, timeout=None):
+    """
+    Returns the cached value for ``prefixo`` at the current version of ``fontes``.
+
+    Any write to one of the sources bumps its VersaoDados and therefore
+    changes the key, so entries never need explicit deletion.
+    """
+    versoes, _ = VersaoDados.obter(*fontes)
+    chave = prefixo + ':' + ':'.join(f'{fonte}={versoes[fonte]}' for fonte in sorted(versoes))
+    valor = cache.get(chave)
+    if valor is None:
+        valor = calcular()
+        cache.set(chave, valor, timeout)
+    return valor
@@ -0,0 +1,184 @@
+"""
+Streaming CSV and XLSX writers.
+
+Both writers consume an iterator of row tuples and yield bytes as they go,
+so an export holds at most one batch of rows in memory and the first bytes
+leave the server before the query has finished.
+"""
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+LOTE_LINHAS = 500
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class _Eco:
+    """File-like object that hands back whatever is written, for csv.writer."""
+
+    def write(self, valor):
+        return valor
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).isoformat() if timezone.is_aware(valor) else valor.isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return valor
+
+
+def gerar_csv(cabecalho, linhas):
+    """Yields a UTF-8 CSV (with BOM, so spreadsheets detect the accents) in batches of rows."""
+    escritor = csv.writer(_Eco())
+    yield '\ufeff'.encode('utf-8') + escritor.writerow(cabecalho).encode('utf-8')
+    lote = []
+    for linha in linhas:
+        lote.append(escritor.writerow([_texto(valor) for valor in linha]))
+        if len(lote) >= LOTE_LINHAS:
+            yield ''.join(lote).encode('utf-8')
+            lote = []
+    if lote:
+        yield ''.join(lote).encode('utf-8')
+
+
+class _SaidaZip:
+    """Unseekable sink for ZipFile; the generator drains it between batches."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        dados = b''.join(self.partes)
+        self.partes.clear()
+        return dados
+
+
+# Control characters are not allowed in XML 1.0 text
+CARACTERES_INVALIDOS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+XLSX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{nome}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+XLSX_PLANILHA_INICIO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+XLSX_PLANILHA_FIM = '</sheetData></worksheet>'
+
+
+def _celula(valor):
+    if valor is None:
+        return '<c/>'
+    if isinstance(valor, bool):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float, Decimal)):
+        return f'<c><v>{valor}</v></c>'
+    texto = escape(CARACTERES_INVALIDOS.sub('', str(_texto(valor))))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _linha_xlsx(numero, valores):
+    return f'<row r="{numero}">' + ''.join(_celula(valor) for valor in valores) + '</row>'
+
+
+def gerar_xlsx(cabecalho, linhas, planilha='Dados'):
+    """
+    Yields a single-sheet XLSX workbook.
+
+    The sheet is written with inline strings straight into a deflated zip
+    entry, so no shared-string table or whole-file buffer is needed.
+    """
+    saida = _SaidaZip()
+    with zipfile.ZipFile(saida, 'w', zipfile.ZIP_DEFLATED) as arquivo:
+        arquivo.writestr('[Content_Types].xml', XLSX_CONTENT_TYPES)
+        arquivo.writestr('_rels/.rels', XLSX_RELS)
+        arquivo.writestr('xl/workbook.xml', XLSX_WORKBOOK.format(nome=escape(planilha[:31], {'"': '&quot;'})))
+        arquivo.writestr('xl/_rels/workbook.xml.rels', XLSX_WORKBOOK_RELS)
+        with arquivo.open('xl/worksheets/sheet1.xml', 'w') as folha:
+            folha.write((XLSX_PLANILHA_INICIO + _linha_xlsx(1, cabecalho)).encode('utf-8'))
+            lote = []
+            for numero, linha in enumerate(linhas, start=2):
+                lote.append(_linha_xlsx(numero, linha))
+                if len(lote) >= LOTE_LINHAS:
+                    folha.write(''.join(lote).encode('utf-8'))
+                    lote = []
+                    dados = saida.esvaziar()
+                    if dados:
+                        yield dados
+            folha.write((''.join(lote) + XLSX_PLANILHA_FIM).encode('utf-8'))
+    yield saida.esvaziar()
+
+
+GERADORES = {
+    'csv': gerar_csv,
+    'xlsx': gerar_xlsx,
+}
+
+
+def resposta_exportacao(formato, nome, cabecalho, linhas):
+    """StreamingHttpResponse downloading ``linhas`` as ``nome-<today>.<formato>``."""
+    response = StreamingHttpResponse(GERADORES[formato](cabecalho, linhas), content_type=FORMATOS[formato])
+    response['Content-Disposition'] = f'attachment; filename="{nome}-{date.today().isoformat()}.{formato}"'
+    return response
+
+
+def linhas_de_dados(dados):
+    """(cabecalho, linhas) for an already built payload: a list of dicts or a flat dict."""
+    if isinstance(dados, dict):
+        return ['campo', 'valor'], [(chave, valor) for chave, valor in dados.items()]
+    dados = list(dados or [])
+    if dados and isinstance(dados[0], dict):
+        cabecalho = list(dados[0])
+        return cabecalho, [[item.get(campo) for campo in cabecalho] for item in dados]
+    return ['valor'], [[item] for item in dados]
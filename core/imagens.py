@@ -0,0 +1,122 @@
+"""
+Image processing for uploaded photos and scanned documents.
+
+``processar_imagem`` turns whatever a phone camera uploaded into a
+reasonably sized original plus JPEG and WebP variants. Orientation is
+applied from the EXIF tag and the metadata is dropped (it may carry the
+GPS position of the member's home). The work runs in the job queue, never
+in the request, and variants are stored next to the original under
+``variantes/``. Every file written carries a hash of its content in the
+name, so core.midia can serve it as immutable.
+"""
+import io
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .midia import HASH_NO_NOME, nome_com_hash
+
+# lado_maximo: longest side of the stored original; variantes: longest side of each variant
+PERFIS = {
+    'foto': {'lado_maximo': 1200, 'qualidade': 82, 'variantes': {'miniatura': 160, 'media': 480}},
+    'documento': {'lado_maximo': 2000, 'qualidade': 85, 'variantes': {'miniatura': 320}},
+}
+QUALIDADE_WEBP = 80
+FORMATOS_VARIANTES = {'jpg': 'JPEG', 'webp': 'WEBP'}
+
+
+class ImagemInvalida(Exception):
+    pass
+
+
+def abrir_imagem(arquivo):
+    """
+    Opens and decodes an image with the EXIF orientation applied.
+
+    Returns (imagem, formato, tinha_metadados); raises ImagemInvalida.
+    """
+    try:
+        imagem = Image.open(arquivo)
+        imagem.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ImagemInvalida(str(e)) from e
+    formato, tinha_metadados = imagem.format, bool(imagem.getexif())
+    imagem = ImageOps.exif_transpose(imagem)
+    if imagem.mode not in ('RGB', 'L'):
+        # JPEG has no alpha: flatten transparency onto white instead of black
+        fundo = Image.new('RGB', imagem.size, 'white')
+        imagem = imagem.convert('RGBA')
+        fundo.paste(imagem, mask=imagem.getchannel('A'))
+        imagem = fundo
+    return imagem, formato, tinha_metadados
+
+
+def reduzir(imagem, lado_maximo):
+    if max(imagem.size) <= lado_maximo:
+        return imagem
+    copia = imagem.copy()
+    copia.thumbnail((lado_maximo, lado_maximo), Image.Resampling.LANCZOS)
+    return copia
+
+
+def codificar(imagem, formato, qualidade):
+    """Encodes without any metadata: Pillow only writes EXIF when asked to."""
+    saida = io.BytesIO()
+    if formato == 'JPEG':
+        imagem.save(saida, 'JPEG', quality=qualidade, optimize=True, progressive=True)
+    else:
+        imagem.save(saida, 'WEBP', quality=QUALIDADE_WEBP, method=6)
+    return saida.getvalue()
+
+
+def nome_variante(nome, variante, extensao):
+    pasta, arquivo = os.path.split(nome)
+    base = HASH_NO_NOME.sub('', os.path.splitext(arquivo)[0])
+    return os.path.join(pasta, 'variantes', f'{base}_{variante}.{extensao}')
+
+
+def salvar(storage, nome, dados):
+    return storage.save(nome_com_hash(nome, dados), ContentFile(dados))
+
+
+def processar_imagem(campo, perfil):
+    """
+    Recompresses the file in the FieldFile ``campo`` and writes its variants.
+
+    Returns (novo nome do original or None when it is kept as is,
+    {variante: {extensao: nome}} including 'original' in WebP). Raises
+    ImagemInvalida when the file is not an image, such as a PDF declaration.
+    """
+    configuracao = PERFIS[perfil]
+    storage = campo.storage
+    with storage.open(campo.name, 'rb') as arquivo:
+        tamanho_original = storage.size(campo.name)
+        imagem, formato, tinha_metadados = abrir_imagem(arquivo)
+
+    original = reduzir(imagem, configuracao['lado_maximo'])
+    dados = codificar(original, 'JPEG', configuracao['qualidade'])
+    novo_nome = None
+    # A small, clean JPEG that would only grow when re-encoded stays untouched
+    if original is not imagem or tinha_metadados or formato != 'JPEG' or len(dados) < tamanho_original:
+        novo_nome = salvar(storage, os.path.splitext(campo.name)[0] + '.jpg', dados)
+
+    variantes = {'original': {
+        'webp': salvar(storage, nome_variante(campo.name, 'original', 'webp'), codificar(original, 'WEBP', None))
+    }}
+    for variante, lado in configuracao['variantes'].items():
+        reduzida = reduzir(original, lado)
+        variantes[variante] = {
+            extensao: salvar(
+                storage, nome_variante(campo.name, variante, extensao),
+                codificar(reduzida, formato_pillow, configuracao['qualidade']),
+            )
+            for extensao, formato_pillow in FORMATOS_VARIANTES.items()
+        }
+    return novo_nome, variantes
+
+
+def remover_variantes(storage, variantes):
+    for formatos in (variantes or {}).values():
+        for nome in formatos.values():
+            storage.delete(nome)
@@ -0,0 +1,197 @@
+"""
+Streaming CSV and XLSX readers.
+
+The counterpart of core.exportacao: both readers take a binary file and
+yield ``(número da linha, {coluna: texto})`` one row at a time, so an
+import holds at most the batch being validated in memory. Column names
+are normalized (``"Data de Nascimento"`` -> ``data_de_nascimento``) and
+every value comes back as a stripped string.
+
+The XLSX reader parses the first worksheet with ``iterparse`` and drops
+each row once read. Only the shared-string table is kept whole, since any
+cell may point into it.
+"""
+import codecs
+import csv
+import io
+import posixpath
+import re
+import zipfile
+from decimal import Decimal, InvalidOperation
+from xml.etree import ElementTree
+
+from core.texto import normalizar
+
+ASSINATURA_ZIP = b'PK\x03\x04'
+TAMANHO_AMOSTRA = 64 * 1024
+
+NS_PLANILHA = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+NS_RELACOES = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+NS_DOCUMENTO = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+
+class ArquivoInvalido(Exception):
+    pass
+
+
+def normalizar_coluna(nome):
+    return normalizar(nome).replace(' ', '_')
+
+
+def _codificacao(arquivo):
+    """UTF-8 when the first bytes decode as such, otherwise Windows-1252 (Excel's "CSV" on Windows)."""
+    amostra = arquivo.read(TAMANHO_AMOSTRA)
+    arquivo.seek(0)
+    try:
+        # final=False: a multi-byte character cut at the end of the sample is not an error
+        codecs.getincrementaldecoder('utf-8')().decode(amostra, final=False)
+    except UnicodeDecodeError:
+        return 'cp1252'
+    return 'utf-8-sig'
+
+
+def ler_csv(arquivo):
+    texto = io.TextIOWrapper(arquivo, encoding=_codificacao(arquivo), newline='')
+    primeira = texto.readline()
+    # Spreadsheets set to Portuguese save CSV with semicolons
+    delimitador = ';' if primeira.count(';') > primeira.count(',') else ','
+    cabecalho = [normalizar_coluna(coluna) for coluna in next(csv.reader([primeira], delimiter=delimitador), [])]
+    if not any(cabecalho):
+        raise ArquivoInvalido('O arquivo não tem cabeçalho.')
+    leitor = csv.reader(texto, delimiter=delimitador)
+    try:
+        for valores in leitor:
+            if any(valor.strip() for valor in valores):
+                # line_num counts the header, read apart, and the lines of quoted multi-line values
+                yield leitor.line_num + 1, {
+                    coluna: valor.strip() for coluna, valor in zip(cabecalho, valores) if coluna
+                }
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise ArquivoInvalido(f'CSV inválido na linha {leitor.line_num + 1}: {e}') from e
+    finally:
+        # Leave the underlying file open for the caller
+        texto.detach()
+
+
+def _indice_coluna(referencia):
+    """'C7' -> 2."""
+    indice = 0
+    for letra in re.match(r'[A-Z]+', referencia).group():
+        indice = indice * 26 + ord(letra) - ord('A') + 1
+    return indice - 1
+
+
+def _texto_elemento(elemento):
+    # Rich text splits a string into runs, each with its own <t>
+    return ''.join(parte.text or '' for parte in elemento.iter(f'{NS_PLANILHA}t'))
+
+
+def _numero(valor):
+    """Integral numbers without '.0' or exponent: a CPF typed as a number comes back as its digits."""
+    try:
+        numero = Decimal(valor)
+    except InvalidOperation:
+        return valor
+    if numero == numero.to_integral_value():
+        return str(int(numero))
+    return format(numero.normalize(), 'f')
+
+
+def _textos_compartilhados(pacote):
+    try:
+        arquivo = pacote.open('xl/sharedStrings.xml')
+    except KeyError:
+        return []
+    textos = []
+    with arquivo:
+        for _, elemento in ElementTree.iterparse(arquivo):
+            if elemento.tag == f'{NS_PLANILHA}si':
+                textos.append(_texto_elemento(elemento))
+                elemento.clear()
+    return textos
+
+
+def _primeira_planilha(pacote):
+    try:
+        pasta = ElementTree.fromstring(pacote.read('xl/workbook.xml'))
+        relacoes = ElementTree.fromstring(pacote.read('xl/_rels/workbook.xml.rels'))
+    except KeyError:
+        return 'xl/worksheets/sheet1.xml'
+    planilha = pasta.find(f'{NS_PLANILHA}sheets/{NS_PLANILHA}sheet')
+    if planilha is None:
+        raise ArquivoInvalido('A planilha não tem abas.')
+    relacao = planilha.get(f'{NS_DOCUMENTO}id')
+    for item in relacoes.iter(f'{NS_RELACOES}Relationship'):
+        if item.get('Id') == relacao:
+            alvo = item.get('Target')
+            return alvo.lstrip('/') if alvo.startswith('/') else posixpath.normpath(posixpath.join('xl', alvo))
+    return 'xl/worksheets/sheet1.xml'
+
+
+def _valores_linha(linha, compartilhadas):
+    valores = {}
+    for posicao, celula in enumerate(linha.iter(f'{NS_PLANILHA}c')):
+        referencia = celula.get('r')
+        indice = _indice_coluna(referencia) if referencia else posicao
+        tipo = celula.get('t', 'n')
+        if tipo == 'inlineStr':
+            valores[indice] = _texto_elemento(celula)
+            continue
+        valor = celula.findtext(f'{NS_PLANILHA}v')
+        if valor is None:
+            continue
+        if tipo == 's':
+            valor = compartilhadas[int(valor)]
+        elif tipo == 'b':
+            valor = 'sim' if valor == '1' else 'não'
+        elif tipo == 'n':
+            valor = _numero(valor)
+        valores[indice] = valor
+    return valores
+
+
+def ler_xlsx(arquivo):
+    try:
+        pacote = zipfile.ZipFile(arquivo)
+    except zipfile.BadZipFile as e:
+        raise ArquivoInvalido('Planilha XLSX inválida.') from e
+    with pacote:
+        compartilhadas = _textos_compartilhados(pacote)
+        try:
+            folha = pacote.open(_primeira_planilha(pacote))
+        except KeyError as e:
+            raise ArquivoInvalido('Planilha XLSX sem a primeira aba.') from e
+        cabecalho, dados = None, None
+        with folha:
+            for evento, elemento in ElementTree.iterparse(folha, events=('start', 'end')):
+                if evento == 'start':
+                    if elemento.tag == f'{NS_PLANILHA}sheetData':
+                        dados = elemento
+                    continue
+                if elemento.tag != f'{NS_PLANILHA}row':
+                    continue
+                numero = int(elemento.get('r') or 0)
+                valores = _valores_linha(elemento, compartilhadas)
+                # Read rows are dropped from the tree, keeping memory flat however long the sheet
+                dados.clear()
+                if cabecalho is None:
+                    if valores:
+                        cabecalho = {indice: normalizar_coluna(nome) for indice, nome in valores.items()}
+                    continue
+                linha = {
+                    coluna: valores.get(indice, '').strip()
+                    for indice, coluna in cabecalho.items() if coluna
+                }
+                if any(linha.values()):
+                    yield numero, linha
+        if cabecalho is None:
+            raise ArquivoInvalido('A planilha está vazia.')
+
+
+def ler_planilha(arquivo):
+    """Rows of a CSV or XLSX file, told apart by the zip signature rather than the name."""
+    inicio = arquivo.read(len(ASSINATURA_ZIP))
+    arquivo.seek(0)
+    if inicio == ASSINATURA_ZIP:
+        return ler_xlsx(arquivo)
+    return ler_csv(arquivo)
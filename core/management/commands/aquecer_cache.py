@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.aquecimento import aquecer
+
+
+class Command(BaseCommand):
+    help = 'Pré-carrega no cache as turmas ativas e os relatórios do painel'
+
+    def handle(self, *args, **options):
+        if settings.CACHE_BACKEND == 'locmem':
+            self.stdout.write(self.style.WARNING(
+                'CACHE_BACKEND=locmem é por processo: o aquecimento só vale para este processo. '
+                'Use CACHE_WARM_ON_STARTUP para aquecer cada worker do gunicorn.'
+            ))
+
+        for entrada, resultado in aquecer().items():
+            if isinstance(resultado, str) and resultado.startswith('erro'):
+                self.stdout.write(self.style.ERROR(f'{entrada}: {resultado}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{entrada}: {resultado}'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.auditoria import auditar, descobrir
+
+
+class Command(BaseCommand):
+    help = 'Executa EXPLAIN nas consultas quentes registradas e aponta as varreduras sequenciais'
+
+    def add_arguments(self, parser):
+        parser.add_argument('consultas', nargs='*', help='Audita apenas estas consultas')
+        parser.add_argument('--listar', action='store_true', help='Lista as consultas registradas e sai')
+        parser.add_argument('--plano', action='store_true', help='Mostra o plano completo de cada consulta')
+        parser.add_argument(
+            '--estrito', action='store_true',
+            help='Termina com erro se alguma consulta usar varredura sequencial (para CI)'
+        )
+
+    def handle(self, *args, **options):
+        if options['listar']:
+            for nome in sorted(descobrir()):
+                self.stdout.write(nome)
+            return
+
+        desconhecidas = set(options['consultas']) - set(descobrir())
+        if desconhecidas:
+            raise CommandError(f'Consultas não registradas: {", ".join(sorted(desconhecidas))}')
+
+        com_varredura = []
+        for nome, plano, tabelas in auditar(options['consultas']):
+            if tabelas:
+                com_varredura.append(nome)
+                self.stdout.write(self.style.ERROR(f'{nome}: varredura sequencial em {", ".join(tabelas)}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{nome}: ok'))
+            if options['plano'] or tabelas:
+                for linha in plano.splitlines():
+                    self.stdout.write(f'    {linha}')
+
+        if com_varredura and options['estrito']:
+            raise CommandError(f'{len(com_varredura)} consulta(s) com varredura sequencial')
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from core.backup import Catalogo, executar_backup, verificar_backup
+
+
+class Command(BaseCommand):
+    help = 'Backup do banco de dados e dos arquivos de mídia para o catálogo de snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--destino', help='Diretório do catálogo (padrão: BACKUP_DIR)')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Só as linhas alteradas desde o último snapshot (vira completo se não houver base)')
+        parser.add_argument('--sem-midia', action='store_true', help='Não inclui o MEDIA_ROOT')
+        parser.add_argument('--listar', action='store_true', help='Lista os snapshots do catálogo e sai')
+        parser.add_argument('--verificar', metavar='SEQUENCIA', type=int,
+                            help='Confere os checksums de um snapshot existente e sai')
+
+    def handle(self, *args, **options):
+        catalogo = Catalogo(options['destino'])
+
+        if options['listar']:
+            for snapshot in catalogo.snapshots:
+                tamanho = sum(arquivo['tamanho'] for arquivo in snapshot['arquivos'])
+                base = f" (base {snapshot['anterior']})" if snapshot['anterior'] else ''
+                self.stdout.write(f"{snapshot['sequencia']:>6}  {snapshot['iniciado_em']}  "
+                                  f"{snapshot['tipo']}{base}  {tamanho / 1024 / 1024:.1f} MB")
+            for restauracao in catalogo.dados['restauracoes'][-5:]:
+                self.stdout.write(f"Restauração de {restauracao['sequencia']} em {restauracao['em']}: "
+                                  f"{restauracao['duracao']:.1f}s")
+            return
+
+        if options['verificar']:
+            try:
+                snapshot = catalogo.obter(options['verificar'])
+            except KeyError as e:
+                raise CommandError(e.args[0])
+            divergentes = verificar_backup(catalogo.pasta(snapshot))
+            if divergentes:
+                raise CommandError(f'Checksums divergentes: {", ".join(divergentes)}')
+            self.stdout.write(self.style.SUCCESS('Todos os arquivos conferem com o SHA256SUMS'))
+            return
+
+        inicio = time.monotonic()
+        try:
+            snapshot = executar_backup(
+                options['destino'], midia=not options['sem_midia'], incremental=options['incremental']
+            )
+        except RuntimeError as e:
+            # Unsupported database or another backup holding the catalog lock
+            raise CommandError(str(e)) from e
+        except Exception as e:
+            raise CommandError(f'Erro ao criar backup: {e}') from e
+
+        tamanho = sum(arquivo['tamanho'] for arquivo in snapshot['arquivos'])
+        self.stdout.write(f"  {len(snapshot['arquivos'])} arquivo(s), {tamanho / 1024:.1f} KB")
+        if 'midia' in snapshot:
+            midia = snapshot['midia']
+            self.stdout.write(f"  mídia: {midia['arquivos']} arquivo(s), {midia['novos']} novo(s) "
+                              f"({midia['bytes_novos'] / 1024:.1f} KB copiados)")
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot {snapshot['tipo']} {snapshot['sequencia']} criado em {catalogo.pasta(snapshot)} "
+            f"({time.monotonic() - inicio:.1f}s)"
+        ))
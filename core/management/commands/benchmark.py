@@ -0,0 +1,100 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Mede consultas, latência e memória de todos os endpoints da API e compara com a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escala', type=float, default=1.0,
+            help='Fração do conjunto padrão (5k famílias, 20k membros, 1M presenças, 100k entregas)'
+        )
+        parser.add_argument('--repeticoes', type=int, default=10, help='Requisições por endpoint')
+        parser.add_argument(
+            '--baseline', default=os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json'),
+            help='Arquivo JSON com a baseline'
+        )
+        parser.add_argument('--atualizar-baseline', action='store_true', help='Grava os resultados como nova baseline')
+        parser.add_argument('--tolerancia', type=float, default=0.2, help='Piora relativa aceita em latência e memória')
+        parser.add_argument(
+            '--serializacao', action='store_true',
+            help='Só compara tempo de serialização (json x orjson) e bytes (bruto, gzip, brotli) das respostas mais pesadas'
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Reaproveita o banco de teste já populado de uma execução anterior'
+        )
+
+    def handle(self, *args, **options):
+        escala = benchmark.escalar(options['escala'])
+        nome_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, keepdb=options['keepdb'])
+        try:
+            if options['serializacao']:
+                return self.serializacao(escala, options)
+            resultados = self.executar(escala, options)
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0, keepdb=options['keepdb'])
+
+        for nome, medidas in sorted(resultados.items()):
+            self.stdout.write(
+                f"{nome:40} {medidas['status']:>4} {medidas['consultas']:>4} consultas "
+                f"p50 {medidas['p50_ms']:>9.2f} ms  p95 {medidas['p95_ms']:>9.2f} ms  "
+                f"pico {medidas['pico_memoria_kb']:>10.1f} KB"
+            )
+
+        conteudo = {'escala': escala, 'resultados': resultados}
+        if options['atualizar_baseline']:
+            os.makedirs(os.path.dirname(options['baseline']), exist_ok=True)
+            with open(options['baseline'], 'w') as arquivo:
+                json.dump(conteudo, arquivo, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Baseline gravada em {options['baseline']}"))
+            return
+
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(self.style.WARNING('Nenhuma baseline encontrada, nada a comparar'))
+            return
+        with open(options['baseline']) as arquivo:
+            baseline = json.load(arquivo)
+        if baseline['escala'] != escala:
+            raise CommandError(f"A baseline foi gerada com outra escala: {baseline['escala']}")
+
+        regressoes = benchmark.comparar(resultados, baseline['resultados'], options['tolerancia'])
+        if regressoes:
+            for regressao in regressoes:
+                self.stdout.write(self.style.ERROR(regressao))
+            raise CommandError(f'{len(regressoes)} regressões em relação à baseline')
+        self.stdout.write(self.style.SUCCESS('Nenhuma regressão em relação à baseline'))
+
+    def preparar(self, escala, options):
+        from usuarios.models import Usuario
+        from familias.models import Familia
+
+        if not options['keepdb'] or not Familia.objects.exists():
+            self.stdout.write('Populando banco de teste...')
+            benchmark.popular_dados(escala, log=self.stdout.write)
+
+        usuario, _ = Usuario.objects.get_or_create(email='benchmark@teste.com', defaults={'is_staff': True})
+        return usuario
+
+    def executar(self, escala, options):
+        return benchmark.executar(self.preparar(escala, options), options['repeticoes'])
+
+    def serializacao(self, escala, options):
+        resultados = benchmark.comparar_serializacao(self.preparar(escala, options), options['repeticoes'])
+        for nome, medidas in resultados.items():
+            if 'bytes' not in medidas:
+                self.stdout.write(self.style.ERROR(f"{nome:20} {medidas['status']:>4}"))
+                continue
+            self.stdout.write(
+                f"{nome:20} {medidas['status']:>4} json {medidas['json_ms']:>9.3f} ms  "
+                f"orjson {medidas['orjson_ms']:>9.3f} ms  {medidas['bytes']:>9} B  "
+                f"gzip {medidas['gzip_bytes']:>8} B  brotli {medidas['br_bytes']:>8} B"
+            )
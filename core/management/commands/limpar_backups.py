@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.backup import aplicar_retencao
+
+
+class Command(BaseCommand):
+    help = 'Aplica a retenção GFS (diária, semanal e mensal) ao catálogo de backups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--destino', help='Diretório do catálogo (padrão: BACKUP_DIR)')
+        parser.add_argument('--diarios', type=int, help='Dias mantidos (padrão: BACKUP_RETENCAO_DIARIA)')
+        parser.add_argument('--semanais', type=int, help='Semanas mantidas (padrão: BACKUP_RETENCAO_SEMANAL)')
+        parser.add_argument('--mensais', type=int, help='Meses mantidos (padrão: BACKUP_RETENCAO_MENSAL)')
+        parser.add_argument('--simular', action='store_true', help='Só mostra o que seria removido')
+
+    def handle(self, *args, **options):
+        try:
+            removidos, blobs = aplicar_retencao(
+                options['destino'], options['diarios'], options['semanais'], options['mensais'],
+                simular=options['simular'],
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        acao = 'Seria removido' if options['simular'] else 'Removido'
+        for snapshot in removidos:
+            self.stdout.write(f"{acao}: snapshot {snapshot['sequencia']} ({snapshot['nome']})")
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(removidos)} snapshot(s) e {len(blobs)} arquivo(s) de mídia sem referência '
+            f"{'a remover' if options['simular'] else 'removidos'}"
+        ))
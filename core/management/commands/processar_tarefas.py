@@ -0,0 +1,63 @@
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from core.tarefas import descobrir, executar, purgar_finalizadas, recuperar_abandonadas, reservar
+
+
+# Segundos entre duas limpezas das tarefas finalizadas
+INTERVALO_LIMPEZA = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Executa as tarefas em segundo plano da fila no banco de dados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos entre consultas à fila vazia')
+        parser.add_argument('--uma-vez', action='store_true', help='Esvazia a fila e termina')
+        parser.add_argument('--max-tarefas', type=int, default=None, help='Termina depois de N tarefas')
+        parser.add_argument('--tarefa', action='append', dest='nomes', help='Executa apenas estas tarefas')
+
+    def handle(self, *args, **options):
+        trabalhador = f'{socket.gethostname()}:{os.getpid()}'
+        self.parar = False
+        # SIGTERM (deploy/restart) lets the current job finish before exiting
+        signal.signal(signal.SIGTERM, self.sinalizar_parada)
+        signal.signal(signal.SIGINT, self.sinalizar_parada)
+
+        registradas = sorted(descobrir())
+        self.stdout.write(f'Trabalhador {trabalhador} pronto; tarefas: {", ".join(registradas)}')
+
+        executadas = 0
+        ultima_limpeza = None
+        while not self.parar:
+            recuperadas = recuperar_abandonadas()
+            if recuperadas:
+                self.stdout.write(self.style.WARNING(f'{recuperadas} tarefa(s) abandonada(s) devolvida(s) à fila'))
+
+            tarefa = reservar(trabalhador, options['nomes'])
+            if tarefa is None:
+                # Idle: the moment to drop old finished jobs
+                if ultima_limpeza is None or time.monotonic() - ultima_limpeza > INTERVALO_LIMPEZA:
+                    ultima_limpeza = time.monotonic()
+                    removidas = purgar_finalizadas()
+                    if removidas:
+                        self.stdout.write(f'{removidas} tarefa(s) finalizada(s) removida(s)')
+                if options['uma_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            inicio = time.monotonic()
+            tarefa = executar(tarefa)
+            estilo = self.style.SUCCESS if tarefa.status == tarefa.CONCLUIDA else self.style.ERROR
+            self.stdout.write(estilo(f'{tarefa} em {time.monotonic() - inicio:.2f}s'))
+
+            executadas += 1
+            if options['max_tarefas'] and executadas >= options['max_tarefas']:
+                break
+
+    def sinalizar_parada(self, signum, frame):
+        self.parar = True
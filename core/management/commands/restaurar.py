@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from core.restauracao import RestauracaoError, restaurar
+
+
+class Command(BaseCommand):
+    help = 'Restaura um snapshot do catálogo de backups, conferindo contagens e checksums e medindo o tempo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sequencia', nargs='?', type=int, help='Snapshot a restaurar (padrão: o mais recente)')
+        parser.add_argument('--destino', help='Diretório do catálogo (padrão: BACKUP_DIR)')
+        parser.add_argument('--banco', default='default', help='Conexão restaurada (padrão: default)')
+        parser.add_argument('--saida', help='SQLite: arquivo a gerar em vez de substituir o banco configurado')
+        parser.add_argument('--midia', help='Diretório onde restaurar a mídia (padrão: MEDIA_ROOT)')
+        parser.add_argument('--sem-midia', action='store_true', help='Não restaura a mídia')
+        parser.add_argument('--paralelismo', type=int, default=4, help='Tabelas e arquivos processados ao mesmo tempo')
+        parser.add_argument('--teste', action='store_true',
+                            help='SQLite: restaura num diretório temporário e descarta, só para conferir e medir')
+        parser.add_argument('--confirmar', action='store_true',
+                            help='Necessário para sobrescrever o banco configurado e o MEDIA_ROOT')
+
+    def handle(self, *args, **options):
+        if options['teste'] and connections[options['banco']].vendor != 'sqlite':
+            raise CommandError('--teste só vale para SQLite; no PostgreSQL restaure com --banco numa base descartável')
+        temporario = tempfile.mkdtemp(prefix='restauracao_') if options['teste'] else None
+        destino, midia = options['saida'], options['midia']
+        if temporario:
+            destino = os.path.join(temporario, 'banco.sqlite3')
+            midia = os.path.join(temporario, 'midia')
+        elif not destino and not options['confirmar']:
+            raise CommandError('Isto substitui o banco configurado: use --confirmar, --saida ou --teste')
+        if not midia and not options['sem_midia']:
+            if not options['confirmar']:
+                raise CommandError('Isto sobrescreve o MEDIA_ROOT: use --confirmar, --midia, --sem-midia ou --teste')
+            midia = settings.MEDIA_ROOT
+
+        try:
+            relatorio = restaurar(
+                options['sequencia'], options['destino'], destino=destino, banco=options['banco'],
+                midia_destino=None if options['sem_midia'] else midia, paralelismo=options['paralelismo'],
+            )
+        except (RestauracaoError, RuntimeError, KeyError) as e:
+            raise CommandError(str(e.args[0] if isinstance(e, KeyError) else e))
+        finally:
+            if temporario:
+                shutil.rmtree(temporario, ignore_errors=True)
+
+        for fase, segundos in relatorio['fases'].items():
+            self.stdout.write(f'  {fase}: {segundos:.2f}s')
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot {relatorio['sequencia']} restaurado e conferido ({relatorio['linhas']} linhas, "
+            f"{relatorio['arquivos_midia']} arquivo(s) de mídia) em {relatorio['duracao']:.1f}s"
+        ))
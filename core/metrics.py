@@ -0,0 +1,272 @@
+"""
+Request metrics rendered in the Prometheus text format.
+
+Each process keeps its own registry. When METRICS_DIR is set (gunicorn.conf.py
+points it at a directory per master) every worker also writes its series
+there, and /metrics adds up all the files, so whichever worker answers the
+scrape reports the whole service. Files of workers that already exited are
+kept: their counts stay in the sums, which therefore never go back.
+"""
+import contextvars
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import traceback
+import uuid
+
+from django.conf import settings
+
+logger = logging.getLogger('core.metrics')
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# Seconds between writes of a worker's registry to METRICS_DIR
+INTERVALO_PUBLICACAO = 5
+
+
+class Histogram:
+    def __init__(self, nome, descricao, buckets, labels):
+        self.nome = nome
+        self.descricao = descricao
+        self.buckets = buckets
+        self.labels = labels
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, valor, **labels):
+        chave = tuple(str(labels[label]) for label in self.labels)
+        with self.lock:
+            serie = self.series.get(chave)
+            if serie is None:
+                serie = self.series[chave] = {'buckets': [0] * len(self.buckets), 'soma': 0.0, 'total': 0}
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie['buckets'][i] += 1
+            serie['soma'] += valor
+            serie['total'] += 1
+        publicador.marcar()
+
+    def exportar(self):
+        """This process's series as JSON-ready ``[labels, buckets, soma, total]`` rows."""
+        with self.lock:
+            return [[list(chave), list(serie['buckets']), serie['soma'], serie['total']] for chave, serie in self.series.items()]
+
+    def render(self, linhas_exportadas):
+        """Renders the sum of several processes' ``exportar()`` rows."""
+        series = {}
+        for chave, buckets, soma, total in linhas_exportadas:
+            if len(buckets) != len(self.buckets):
+                # Written by a worker running other bucket limits; adding it would corrupt the histogram
+                continue
+            serie = series.setdefault(tuple(chave), {'buckets': [0] * len(self.buckets), 'soma': 0.0, 'total': 0})
+            serie['buckets'] = [a + b for a, b in zip(serie['buckets'], buckets)]
+            serie['soma'] += soma
+            serie['total'] += total
+
+        linhas = [f'# HELP {self.nome} {self.descricao}', f'# TYPE {self.nome} histogram']
+        for chave, serie in sorted(series.items()):
+            base = ','.join(f'{label}="{_escapar(valor)}"' for label, valor in zip(self.labels, chave))
+            separador = ',' if base else ''
+            for limite, quantidade in zip(self.buckets, serie['buckets']):
+                linhas.append(f'{self.nome}_bucket{{{base}{separador}le="{limite}"}} {quantidade}')
+            linhas.append(f'{self.nome}_bucket{{{base}{separador}le="+Inf"}} {serie["total"]}')
+            linhas.append(f'{self.nome}_sum{{{base}}} {serie["soma"]}')
+            linhas.append(f'{self.nome}_count{{{base}}} {serie["total"]}')
+        return '\n'.join(linhas)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+LABELS = ('view', 'action', 'method')
+
+request_duration = Histogram(
+    'http_request_duration_seconds', 'Request latency in seconds.',
+    BUCKETS_SEGUNDOS, LABELS + ('status',)
+)
+db_queries = Histogram(
+    'http_request_db_queries', 'Database queries per request.',
+    BUCKETS_CONSULTAS, LABELS
+)
+db_duration = Histogram(
+    'http_request_db_duration_seconds', 'Total database time per request in seconds.',
+    BUCKETS_SEGUNDOS, LABELS
+)
+serializer_duration = Histogram(
+    'http_request_serializer_duration_seconds', 'Time spent building serializer data per request in seconds.',
+    BUCKETS_SEGUNDOS, LABELS
+)
+response_bytes = Histogram(
+    'http_response_bytes', 'Response body size in bytes.',
+    BUCKETS_BYTES, LABELS
+)
+
+REGISTRO = (request_duration, db_queries, db_duration, serializer_duration, response_bytes)
+
+
+def exportar():
+    return {metrica.nome: metrica.exportar() for metrica in REGISTRO}
+
+
+class Publicador:
+    """
+    Writes this process's registry to its own file in METRICS_DIR.
+
+    A daemon thread flushes changes every INTERVALO_PUBLICACAO seconds, so
+    the other workers' counts in a scrape are at most that old. The file is
+    named by pid plus a random suffix: a recycled pid never overwrites, and
+    so never shrinks, the counts of the worker that had it before.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.alterado = threading.Event()
+        self.pid = None
+        self.nome = None
+
+    def marcar(self):
+        if not settings.METRICS_DIR:
+            return
+        self.alterado.set()
+        if self.pid != os.getpid():
+            with self.lock:
+                # After a fork the parent's thread does not exist in this process
+                if self.pid != os.getpid():
+                    self.pid = os.getpid()
+                    self.nome = f'{self.pid}-{uuid.uuid4().hex[:8]}.json'
+                    threading.Thread(target=self._laco, daemon=True).start()
+
+    def _laco(self):
+        while True:
+            time.sleep(INTERVALO_PUBLICACAO)
+            if self.alterado.is_set():
+                try:
+                    self.publicar()
+                except OSError:
+                    logger.exception('Could not write metrics to %s', settings.METRICS_DIR)
+
+    def publicar(self):
+        if not settings.METRICS_DIR or self.pid != os.getpid():
+            return
+        with self.lock:
+            self.alterado.clear()
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+            arquivo = os.path.join(settings.METRICS_DIR, self.nome)
+            with open(arquivo + '.tmp', 'w') as saida:
+                json.dump(exportar(), saida)
+            # Atomic: a scrape reads either the previous file or this one, never half of it
+            os.replace(arquivo + '.tmp', arquivo)
+
+
+publicador = Publicador()
+
+
+def ler_processos():
+    """Every process's exported registry found in METRICS_DIR."""
+    processos = []
+    try:
+        nomes = sorted(os.listdir(settings.METRICS_DIR))
+    except FileNotFoundError:
+        return processos
+    for nome in nomes:
+        if not nome.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(settings.METRICS_DIR, nome)) as entrada:
+                processos.append(json.load(entrada))
+        except (OSError, ValueError):
+            logger.warning('Skipping unreadable metrics file %s', nome)
+    return processos
+
+
+def render():
+    if settings.METRICS_DIR:
+        # This worker's own counts go in fresh, not as of its last flush
+        publicador.publicar()
+        processos = ler_processos()
+    else:
+        processos = [exportar()]
+    return '\n'.join(
+        metrica.render([linha for processo in processos for linha in processo.get(metrica.nome, ())])
+        for metrica in REGISTRO
+    ) + '\n'
+
+
+def limpar_processos():
+    """Drops the files of a previous gunicorn master's workers."""
+    if settings.METRICS_DIR:
+        shutil.rmtree(settings.METRICS_DIR, ignore_errors=True)
+
+
+class EstadoRequisicao:
+    """Per-request counters filled by the DB execute wrapper and the serializer hook."""
+
+    def __init__(self, labels):
+        self.labels = labels
+        self.consultas = 0
+        self.tempo_db = 0.0
+        self.tempo_serializer = 0.0
+        self.serializando = False
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = time.perf_counter() - inicio
+            self.consultas += 1
+            self.tempo_db += duracao
+            limite = getattr(settings, 'METRICS_SLOW_QUERY_MS', None)
+            if limite is not None and duracao * 1000 >= limite:
+                registrar_consulta_lenta(sql, duracao, self.labels)
+
+
+estado_atual = contextvars.ContextVar('estado_requisicao_metricas', default=None)
+
+
+def registrar_consulta_lenta(sql, duracao, labels):
+    """Logs a slow query with the project frames that issued it."""
+    raiz = str(settings.BASE_DIR)
+    ignorados = (os.path.join(raiz, 'core', 'middleware.py'), __file__)
+    pilha = [
+        f'{os.path.relpath(frame.filename, raiz)}:{frame.lineno} in {frame.name}'
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(raiz)
+        and 'site-packages' not in frame.filename
+        and frame.filename not in ignorados
+    ]
+    logger.warning(
+        'Slow query (%.1f ms) in %s.%s: %s\n  %s',
+        duracao * 1000, labels['view'], labels['action'], sql,
+        '\n  '.join(pilha) or '(no project frames, query issued by the framework)'
+    )
+
+
+def instrumentar_serializers():
+    """Wraps BaseSerializer.data so the time spent serializing is added to the current request."""
+    from rest_framework.serializers import BaseSerializer
+
+    data_original = BaseSerializer.data
+    if getattr(data_original.fget, '_instrumentado', False):
+        return
+
+    def data(self):
+        estado = estado_atual.get()
+        if estado is None or estado.serializando:
+            return data_original.fget(self)
+        estado.serializando = True
+        inicio = time.perf_counter()
+        try:
+            return data_original.fget(self)
+        finally:
+            estado.tempo_serializer += time.perf_counter() - inicio
+            estado.serializando = False
+
+    propriedade = property(data)
+    propriedade.fget._instrumentado = True
+    BaseSerializer.data = propriedade
@@ -1,6 +1,17 @@
+import time
+from contextlib import ExitStack
+import brotli
 from rest_framework.exceptions import APIException
 from rest_framework.views import exception_handler
+from django.conf import settings
+from django.db import connections
+from django.http import FileResponse, JsonResponse
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
 from django.utils.translation import gettext_lazy as _
+from core import metrics
+from core.uploads import ArquivoMuitoGrande, LimitesUploadHandler, TipoDeArquivoNaoPermitido
 
 def custom_exception_handler(exc, context):
     # Call REST framework's default exception handler first,
@@ -9,49 +20,209 @@ def custom_exception_handler(exc, context):
 
     # Now add the HTTP status code to the response.
     if response is not None:
-        response.data['status_code'] = response.status_code
+        # Copy the payload: for dict/list details it is exc.detail itself,
+        # and storing exc.detail inside it would make it self-referencing
+        data = dict(response.data) if isinstance(response.data, dict) else {}
+        data['status_code'] = response.status_code
         
         # Customize error messages
         if isinstance(exc, APIException):
-            response.data['message'] = exc.detail
-            response.data['error_type'] = type(exc).__name__
+            data['message'] = exc.detail
+            data['error_type'] = type(exc).__name__
             
             # Remove default error code if it exists
-            if 'detail' in response.data:
-                del response.data['detail']
+            if 'detail' in data:
+                del data['detail']
+
+        response.data = data
 
     return response
 
-class CustomExceptionHandlerMiddleware:
+class MetricsMiddleware:
+    """
+    Records latency, DB queries, DB time, serializer time and response size
+    per view and action, exposed by core.views.metrics.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path == reverse('metrics'):
+            return self.get_response(request)
+
+        request._metrics_labels = {'view': 'desconhecida', 'action': '', 'method': request.method}
+        estado = metrics.EstadoRequisicao(request._metrics_labels)
+        token = metrics.estado_atual.set(estado)
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conexao in connections.all():
+                    stack.enter_context(conexao.execute_wrapper(estado))
+                response = self.get_response(request)
+        finally:
+            metrics.estado_atual.reset(token)
+
+        labels = request._metrics_labels
+        metrics.request_duration.observe(time.perf_counter() - inicio, status=response.status_code, **labels)
+        metrics.db_queries.observe(estado.consultas, **labels)
+        metrics.db_duration.observe(estado.tempo_db, **labels)
+        metrics.serializer_duration.observe(estado.tempo_serializer, **labels)
+        if response.has_header('Content-Length'):
+            # Known size: don't wrap a FileResponse, which would lose wsgi.file_wrapper (sendfile)
+            metrics.response_bytes.observe(int(response['Content-Length']), **labels)
+        elif response.streaming:
+            response.streaming_content = self._contar_bytes(response.streaming_content, labels)
+        else:
+            metrics.response_bytes.observe(len(response.content), **labels)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        labels = getattr(request, '_metrics_labels', None)
+        if labels is None:
+            return None
+        view = getattr(view_func, 'cls', view_func)
+        labels['view'] = getattr(view, '__name__', type(view).__name__)
+        acoes = getattr(view_func, 'actions', None) or {}
+        labels['action'] = acoes.get(request.method.lower(), '')
+        return None
+
+    def _contar_bytes(self, conteudo, labels):
+        total = 0
+        for parte in conteudo:
+            total += len(parte)
+            yield parte
+        metrics.response_bytes.observe(total, **labels)
+
+
+def codificacoes_aceitas(cabecalho):
+    """Content codings an Accept-Encoding header allows, without the ones refused with q=0."""
+    aceitas = set()
+    for item in cabecalho.split(','):
+        nome, _, parametros = item.partition(';')
+        qualidade = 1.0
+        for parametro in parametros.split(';'):
+            chave, _, valor = parametro.partition('=')
+            if chave.strip().lower() == 'q':
+                try:
+                    qualidade = float(valor)
+                except ValueError:
+                    qualidade = 0
+        if nome.strip() and qualidade > 0:
+            aceitas.add(nome.strip().lower())
+    return aceitas
+
+
+class CompressaoMiddleware:
+    """
+    Compresses text responses with brotli or gzip, whichever the client accepts.
+
+    Works like Django's GZipMiddleware, plus brotli, which makes API JSON
+    noticeably smaller than gzip does. Bodies under
+    COMPRESSAO_TAMANHO_MINIMO, responses already encoded, partial content
+    and files pass through untouched: a FileResponse keeps its sendfile
+    and byte ranges. Streamed exports are compressed chunk by chunk.
+
+    HTML (the admin, the browsable API) carries CSRF tokens, so it only
+    gets gzip, which Django pads with random bytes against BREACH.
+    """
+    tipos = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+    max_random_bytes = 100
+
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
         response = self.get_response(request)
+        tipo = response.get('Content-Type', '').partition(';')[0].strip().lower()
+        if (
+            response.has_header('Content-Encoding')
+            or response.status_code == 206
+            or isinstance(response, FileResponse)
+            or not tipo.startswith(self.tipos)
+            or (not response.streaming and len(response.content) < settings.COMPRESSAO_TAMANHO_MINIMO)
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        aceitas = codificacoes_aceitas(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if 'br' in aceitas and tipo != 'text/html':
+            codificacao = 'br'
+        elif 'gzip' in aceitas:
+            codificacao = 'gzip'
+        else:
+            return response
+
+        if response.streaming:
+            response.streaming_content = self._comprimir_sequencia(response, codificacao)
+            # The compressed size is only known once the whole body has been sent
+            del response.headers['Content-Length']
+        else:
+            comprimido = self._comprimir(response.content, codificacao)
+            if len(comprimido) >= len(response.content):
+                return response
+            response.content = comprimido
+            response.headers['Content-Length'] = str(len(comprimido))
+
+        # Compression changes the bytes, so a strong ETag has to become weak (RFC 9110, 8.8.1)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = codificacao
         return response
 
+    def _comprimir(self, conteudo, codificacao):
+        if codificacao == 'br':
+            return brotli.compress(conteudo, quality=settings.COMPRESSAO_QUALIDADE_BROTLI)
+        return compress_string(conteudo, max_random_bytes=self.max_random_bytes)
+
+    def _comprimir_sequencia(self, response, codificacao):
+        partes = response.streaming_content
+        if response.is_async:
+            return self._comprimir_assincrono(partes, codificacao)
+        if codificacao == 'gzip':
+            return compress_sequence(partes, max_random_bytes=self.max_random_bytes)
+        return self._brotli_sequencia(partes)
+
+    def _brotli_sequencia(self, partes):
+        compressor = brotli.Compressor(quality=settings.COMPRESSAO_QUALIDADE_BROTLI)
+        for parte in partes:
+            dados = compressor.process(parte)
+            if dados:
+                yield dados
+        yield compressor.finish()
+
+    async def _comprimir_assincrono(self, partes, codificacao):
+        # Each chunk as its own gzip member or brotli flush, as Django does for async streams
+        compressor = brotli.Compressor(quality=settings.COMPRESSAO_QUALIDADE_BROTLI)
+        async for parte in partes:
+            if codificacao == 'gzip':
+                yield compress_string(parte, max_random_bytes=self.max_random_bytes)
+            else:
+                yield compressor.process(parte) + compressor.flush()
+        if codificacao == 'br':
+            yield compressor.finish()
+
 
 class FileUploadSecurityMiddleware:
+    """
+    Validates multipart uploads while they stream in, through core.uploads.LimitesUploadHandler.
+
+    The handler has to be installed before anything reads the body; its
+    errors surface as DRF exceptions in API views and are turned into the
+    same JSON error here for plain Django views.
+    """
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        # Verifica se é uma requisição de upload
-        if request.method == 'POST' and 'file' in request.FILES:
-            file = request.FILES['file']
-            
-            # Verifica tamanho máximo do arquivo (5MB)
-            if file.size > 5242880:  # 5MB em bytes
-                return JsonResponse({
-                    'error': 'Arquivo muito grande. O tamanho máximo permitido é 5MB.'
-                }, status=400)
-            
-            # Verifica tipo de arquivo permitido
-            allowed_types = ['image/jpeg', 'image/png', 'image/gif']
-            if file.content_type not in allowed_types:
-                return JsonResponse({
-                    'error': 'Tipo de arquivo não permitido. Apenas JPEG, PNG e GIF são aceitos.'
-                }, status=400)
+        if request.content_type == 'multipart/form-data':
+            request.upload_handlers.insert(0, LimitesUploadHandler(request))
+        return self.get_response(request)
 
-        response = self.get_response(request)
-        return response
+    def process_exception(self, request, exception):
+        if isinstance(exception, (ArquivoMuitoGrande, TipoDeArquivoNaoPermitido)):
+            return JsonResponse({
+                'error': str(exception.detail),
+                'status_code': exception.status_code,
+            }, status=exception.status_code)
+        return None
@@ -0,0 +1,148 @@
+"""
+Media delivery: strong validators, byte ranges and web server offload.
+
+``servir`` answers a request for one MEDIA_ROOT file:
+
+- A strong ETag (mtime and size) and Last-Modified, so revalidation
+  costs a 304 and no bytes.
+- Names carrying a content hash (``foto.3f2a9c1b7d4e.jpg``, as the image
+  pipeline writes them) never change content. They are cached for a year
+  as ``immutable``; anything else must revalidate.
+- Single ``Range: bytes=`` requests (and If-Range) get a 206 with only
+  the requested bytes.
+- With MIDIA_OFFLOAD set to ``x-accel`` (nginx) or ``x-sendfile``
+  (Apache/lighttpd), the response carries only headers and the web
+  server sends the file and handles ranges itself.
+
+Every response is ``private``: media is only served to authenticated users.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+
+TAMANHO_BLOCO = 64 * 1024
+HASH_NO_NOME = re.compile(r'\.[0-9a-f]{12}$')
+INTERVALO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+CACHE_IMUTAVEL = 'private, max-age=31536000, immutable'
+CACHE_REVALIDAR = 'private, no-cache'
+
+
+def nome_com_hash(nome, conteudo):
+    """'pasta/foto.jpg' -> 'pasta/foto.<12 hex digits of the SHA-256 of conteudo>.jpg'."""
+    raiz, extensao = os.path.splitext(nome)
+    raiz = HASH_NO_NOME.sub('', raiz)
+    return f'{raiz}.{hashlib.sha256(conteudo).hexdigest()[:12]}{extensao}'
+
+
+def tem_hash(nome):
+    return bool(HASH_NO_NOME.search(os.path.splitext(nome)[0]))
+
+
+def etag_arquivo(info):
+    return f'"{info.st_mtime_ns:x}-{info.st_size:x}"'
+
+
+class IntervaloInvalido(Exception):
+    pass
+
+
+def intervalo_pedido(cabecalho, tamanho):
+    """
+    (inicio, fim) inclusive for a single ``bytes=`` range, or None to send the whole file.
+
+    Multiple ranges are answered with the whole file, as the spec allows.
+    Raises IntervaloInvalido when the range cannot be satisfied.
+    """
+    correspondencia = INTERVALO.match(cabecalho.strip())
+    if not correspondencia or correspondencia.groups() == ('', ''):
+        return None
+    inicio, fim = correspondencia.groups()
+    if not inicio:
+        # "bytes=-500": the last 500 bytes
+        sufixo = int(fim)
+        if sufixo == 0 or tamanho == 0:
+            raise IntervaloInvalido
+        return max(tamanho - sufixo, 0), tamanho - 1
+    inicio = int(inicio)
+    fim = min(int(fim), tamanho - 1) if fim else tamanho - 1
+    if inicio >= tamanho or inicio > fim:
+        raise IntervaloInvalido
+    return inicio, fim
+
+
+def nao_modificado(request, etag, modificado_em):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        etags = [valor.strip() for valor in if_none_match.split(',')]
+        # Weak comparison, as If-None-Match requires
+        return '*' in etags or etag in etags or f'W/{etag}' in etags
+    desde = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return desde is not None and int(modificado_em) <= desde
+
+
+def _ler(caminho, inicio, quantidade):
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(inicio)
+        while quantidade > 0:
+            bloco = arquivo.read(min(TAMANHO_BLOCO, quantidade))
+            if not bloco:
+                break
+            quantidade -= len(bloco)
+            yield bloco
+
+
+def servir(request, caminho, relativo):
+    """Response for the file at ``caminho``, known to the client as ``relativo`` under MEDIA_URL."""
+    info = os.stat(caminho)
+    etag = etag_arquivo(info)
+    cabecalhos = {
+        'ETag': etag,
+        'Last-Modified': http_date(info.st_mtime),
+        'Cache-Control': CACHE_IMUTAVEL if tem_hash(relativo) else CACHE_REVALIDAR,
+    }
+    if nao_modificado(request, etag, info.st_mtime):
+        response = HttpResponseNotModified()
+        for cabecalho, valor in cabecalhos.items():
+            response[cabecalho] = valor
+        return response
+
+    tipo = mimetypes.guess_type(caminho)[0] or 'application/octet-stream'
+
+    if settings.MIDIA_OFFLOAD:
+        response = HttpResponse(content_type=tipo)
+        if settings.MIDIA_OFFLOAD == 'x-accel':
+            response['X-Accel-Redirect'] = settings.MIDIA_X_ACCEL_PREFIXO.rstrip('/') + '/' + quote(relativo)
+        else:
+            response['X-Sendfile'] = caminho
+    else:
+        intervalo = None
+        pedido = request.META.get('HTTP_RANGE')
+        if_range = request.META.get('HTTP_IF_RANGE')
+        # If-Range with a stale validator means "the file changed: send all of it"
+        if pedido and (not if_range or if_range in (etag, cabecalhos['Last-Modified'])):
+            try:
+                intervalo = intervalo_pedido(pedido, info.st_size)
+            except IntervaloInvalido:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{info.st_size}'
+                return response
+
+        if intervalo:
+            inicio, fim = intervalo
+            response = StreamingHttpResponse(_ler(caminho, inicio, fim - inicio + 1), status=206, content_type=tipo)
+            response['Content-Range'] = f'bytes {inicio}-{fim}/{info.st_size}'
+            response['Content-Length'] = str(fim - inicio + 1)
+        else:
+            response = FileResponse(open(caminho, 'rb'), content_type=tipo)
+
+    response['Accept-Ranges'] = 'bytes'
+    for cabecalho, valor in cabecalhos.items():
+        response[cabecalho] = valor
+    return response
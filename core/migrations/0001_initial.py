@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-17 23:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoDados',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=50, unique=True, verbose_name='chave')),
+                ('versao', models.PositiveBigIntegerField(default=0, verbose_name='versão')),
+                ('atualizado_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='atualizado em')),
+            ],
+            options={
+                'verbose_name': 'versão de dados',
+                'verbose_name_plural': 'versões de dados',
+            },
+        ),
+    ]
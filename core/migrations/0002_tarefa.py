@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:09
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarefa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100, verbose_name='nome')),
+                ('argumentos', models.JSONField(blank=True, default=dict, verbose_name='argumentos')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('EXECUTANDO', 'Executando'), ('CONCLUIDA', 'Concluída'), ('FALHOU', 'Falhou')], default='PENDENTE', max_length=20, verbose_name='status')),
+                ('tentativas', models.PositiveSmallIntegerField(default=0, verbose_name='tentativas')),
+                ('max_tentativas', models.PositiveSmallIntegerField(default=3, verbose_name='máximo de tentativas')),
+                ('disponivel_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='disponível em')),
+                ('iniciada_em', models.DateTimeField(blank=True, null=True, verbose_name='iniciada em')),
+                ('concluida_em', models.DateTimeField(blank=True, null=True, verbose_name='concluída em')),
+                ('trabalhador', models.CharField(blank=True, max_length=100, verbose_name='trabalhador')),
+                ('erro', models.TextField(blank=True, verbose_name='erro')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'tarefa',
+                'verbose_name_plural': 'tarefas',
+                'ordering': ['disponivel_em', 'id'],
+                'indexes': [models.Index(fields=['status', 'disponivel_em'], name='tarefa_fila_idx')],
+            },
+        ),
+    ]
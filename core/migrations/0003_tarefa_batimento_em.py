@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:35
+
+from django.db import migrations, models
+
+
+def copiar_inicio(apps, schema_editor):
+    # Jobs running across the deploy are judged by their start, as before
+    Tarefa = apps.get_model('core', 'Tarefa')
+    Tarefa.objects.filter(status='EXECUTANDO').update(batimento_em=models.F('iniciada_em'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_tarefa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarefa',
+            name='batimento_em',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='último sinal em'),
+        ),
+        migrations.RunPython(copiar_inicio, migrations.RunPython.noop),
+    ]
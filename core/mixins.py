@@ -0,0 +1,118 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+
+from .exportacao import FORMATOS, resposta_exportacao
+from .renderers import CSVRenderer, XLSXRenderer
+from .serializers import campos_renderizados
+
+
+def split_related_lookups(model, lookups):
+    """
+    Splits relation lookups into select_related and prefetch_related groups.
+
+    A lookup made only of forward foreign keys/one-to-ones can be joined;
+    anything crossing a reverse or many-to-many relation has to be prefetched,
+    and so is a Prefetch object, which carries its own queryset.
+    """
+    select, prefetch = [], []
+    for lookup in lookups:
+        if isinstance(lookup, Prefetch):
+            prefetch.append(lookup)
+            continue
+        atual = model
+        multiplo = False
+        for parte in lookup.split('__'):
+            try:
+                field = atual._meta.get_field(parte)
+            except FieldDoesNotExist:
+                multiplo = True
+                break
+            if field.many_to_many or field.one_to_many or not field.concrete:
+                multiplo = True
+                break
+            atual = field.related_model
+        (prefetch if multiplo else select).append(lookup)
+    return select, prefetch
+
+
+class EagerLoadingMixin:
+    """
+    Eager-loads the relations a viewset's serializer renders.
+
+    ``eager_loading`` maps a serializer field to the relation lookups it
+    reads; nested fields use dotted paths (``'familia.membros'``). Only the
+    fields the serializer will actually output for this request count, so
+    ``?fields=`` and ``?expand=`` (see core.serializers) skip the queries of
+    what they leave out. ``eager_loading_actions`` can narrow the fields for
+    a given action, e.g. ``{'destroy': ()}``.
+    """
+    eager_loading = {}
+    eager_loading_actions = {}
+
+    def get_eager_loading_fields(self):
+        acao = getattr(self, 'action', None)
+        if acao in self.eager_loading_actions:
+            return self.eager_loading_actions[acao]
+        renderizados = campos_renderizados(self.get_serializer())
+        return [campo for campo in self.eager_loading if campo in renderizados]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        lookups = []
+        for campo in self.get_eager_loading_fields():
+            for lookup in self.eager_loading.get(campo, ()):
+                if lookup not in lookups:
+                    lookups.append(lookup)
+        select, prefetch = split_related_lookups(queryset.model, lookups)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
+class ExportacaoMixin:
+    """
+    Adds ``?format=csv`` and ``?format=xlsx`` streaming exports to a viewset.
+
+    ``exportacao_campos`` lists (cabecalho, lookup) pairs read with
+    ``values_list`` for the list export; other actions named in
+    ``exportacao_acoes`` build their own rows and call ``exportar``.
+    """
+    exportacao_campos = ()
+    exportacao_acoes = ('list',)
+    exportacao_nome = None
+    exportacao_lote = 2000
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if getattr(self, 'action', None) in self.exportacao_acoes:
+            renderers += [CSVRenderer(), XLSXRenderer()]
+        return renderers
+
+    @property
+    def formato_exportacao(self):
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        formato = getattr(renderer, 'format', None)
+        return formato if formato in FORMATOS else None
+
+    def exportar(self, cabecalho, linhas, nome=None):
+        nome = nome or self.exportacao_nome or self.queryset.model._meta.model_name
+        return resposta_exportacao(self.formato_exportacao, nome, cabecalho, linhas)
+
+    def get_queryset_exportacao(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        # values_list reads the joined columns itself; prefetches would only run extra queries
+        queryset = queryset.select_related(None).prefetch_related(None)
+        ordering = getattr(self, 'keyset_ordering', None)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if not self.formato_exportacao:
+            return super().list(request, *args, **kwargs)
+        cabecalho = [cabecalho for cabecalho, _ in self.exportacao_campos]
+        lookups = [lookup for _, lookup in self.exportacao_campos]
+        linhas = self.get_queryset_exportacao().values_list(*lookups).iterator(chunk_size=self.exportacao_lote)
+        return self.exportar(cabecalho, linhas)
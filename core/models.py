@@ -0,0 +1,87 @@
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class VersaoDados(models.Model):
+    """
+    Monotonic version per data source, bumped on every write.
+
+    Kept in the database so every gunicorn worker sees the same version,
+    whatever cache backend is configured.
+    """
+    chave = models.CharField(max_length=50, unique=True, verbose_name=_('chave'))
+    versao = models.PositiveBigIntegerField(default=0, verbose_name=_('versão'))
+    atualizado_em = models.DateTimeField(default=timezone.now, verbose_name=_('atualizado em'))
+
+    class Meta:
+        verbose_name = _('versão de dados')
+        verbose_name_plural = _('versões de dados')
+
+    def __str__(self):
+        return f'{self.chave} v{self.versao}'
+
+    @classmethod
+    def incrementar(cls, *chaves):
+        agora = timezone.now()
+        for chave in chaves:
+            atualizadas = cls.objects.filter(chave=chave).update(versao=F('versao') + 1, atualizado_em=agora)
+            if not atualizadas:
+                cls.objects.get_or_create(chave=chave, defaults={'versao': 1, 'atualizado_em': agora})
+
+    @classmethod
+    def obter(cls, *chaves):
+        """Returns ({chave: versao}, last modification) for the given sources in one query."""
+        versoes = {chave: 0 for chave in chaves}
+        modificado_em = None
+        for chave, versao, atualizado_em in cls.objects.filter(chave__in=chaves).values_list(
+            'chave', 'versao', 'atualizado_em'
+        ):
+            versoes[chave] = versao
+            modificado_em = max(modificado_em or atualizado_em, atualizado_em)
+        return versoes, modificado_em
+
+
+class Tarefa(models.Model):
+    """
+    Background job stored in the database, run by ``manage.py processar_tarefas``.
+
+    Workers claim a pending job with a conditional UPDATE on its status, so
+    several workers can poll the same table without an external broker.
+    """
+    PENDENTE = 'PENDENTE'
+    EXECUTANDO = 'EXECUTANDO'
+    CONCLUIDA = 'CONCLUIDA'
+    FALHOU = 'FALHOU'
+    STATUS_CHOICES = [
+        (PENDENTE, _('Pendente')),
+        (EXECUTANDO, _('Executando')),
+        (CONCLUIDA, _('Concluída')),
+        (FALHOU, _('Falhou')),
+    ]
+
+    nome = models.CharField(max_length=100, verbose_name=_('nome'))
+    argumentos = models.JSONField(default=dict, blank=True, verbose_name=_('argumentos'))
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDENTE, verbose_name=_('status'))
+    tentativas = models.PositiveSmallIntegerField(default=0, verbose_name=_('tentativas'))
+    max_tentativas = models.PositiveSmallIntegerField(default=3, verbose_name=_('máximo de tentativas'))
+    disponivel_em = models.DateTimeField(default=timezone.now, verbose_name=_('disponível em'))
+    iniciada_em = models.DateTimeField(null=True, blank=True, verbose_name=_('iniciada em'))
+    # Renewed while the job runs (core.tarefas.batimento); a stale one means its worker died
+    batimento_em = models.DateTimeField(null=True, blank=True, verbose_name=_('último sinal em'))
+    concluida_em = models.DateTimeField(null=True, blank=True, verbose_name=_('concluída em'))
+    trabalhador = models.CharField(max_length=100, blank=True, verbose_name=_('trabalhador'))
+    erro = models.TextField(blank=True, verbose_name=_('erro'))
+    data_criacao = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('tarefa')
+        verbose_name_plural = _('tarefas')
+        ordering = ['disponivel_em', 'id']
+        indexes = [
+            models.Index(fields=['status', 'disponivel_em'], name='tarefa_fila_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.nome} #{self.pk} ({self.status})'
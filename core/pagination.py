@@ -0,0 +1,157 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination over a unique (field, id) ordering.
+
+    Each page is fetched with ``WHERE (field, id) < (last values) LIMIT n``,
+    so deep pages cost the same as the first one, unlike OFFSET. Views set
+    ``keyset_ordering`` to two model fields, the last one unique, e.g.
+    ``('-data', '-id')``; a composite index on both keeps the seek cheap.
+
+    Query params: ``cursor`` (opaque), ``page_size`` (up to
+    ``max_page_size``) and ``count=false`` to skip the COUNT(*).
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    page_size = 10
+    max_page_size = 100
+    ordering = ('-id',)
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size_atual = self.get_page_size(request)
+        self.ordering = tuple(getattr(view, 'keyset_ordering', self.ordering))
+        self.campos = [campo.lstrip('-') for campo in self.ordering]
+        self.model = queryset.model
+
+        cursor = self.decode_cursor(request)
+        self.count = queryset.count() if self.get_include_count(request) else None
+
+        reverso = bool(cursor and cursor['r'])
+        ordering = [self.inverter(campo) for campo in self.ordering] if reverso else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if cursor:
+            queryset = queryset.filter(self.filtro_apos(cursor['v'], ordering))
+
+        # One extra row tells whether there is a page beyond this one
+        linhas = list(queryset[:self.page_size_atual + 1])
+        tem_mais = len(linhas) > self.page_size_atual
+        linhas = linhas[:self.page_size_atual]
+        if reverso:
+            linhas.reverse()
+            self.has_next = cursor is not None
+            self.has_previous = tem_mais
+        else:
+            self.has_next = tem_mais
+            self.has_previous = cursor is not None
+
+        self.primeira = self.valores(linhas[0]) if linhas else None
+        self.ultima = self.valores(linhas[-1]) if linhas else None
+        if not linhas and cursor:
+            # Walked past either end: point back at the cursor we came from
+            self.primeira = self.ultima = cursor['v']
+        return linhas
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_include_count(self, request):
+        return request.query_params.get(self.count_query_param, 'true').lower() not in ('false', '0', 'no')
+
+    @staticmethod
+    def inverter(campo):
+        return campo[1:] if campo.startswith('-') else f'-{campo}'
+
+    def filtro_apos(self, valores, ordering):
+        """Builds ``(a, b) > (x, y)`` (or ``<``) as OR'ed comparisons the planner can seek on."""
+        # The redundant inclusive bound on the leading field turns the index scan into a seek
+        primeiro = ordering[0]
+        limite = Q(**{f"{primeiro.lstrip('-')}__{'lte' if primeiro.startswith('-') else 'gte'}": valores[0]})
+        filtro = Q()
+        for posicao, campo in enumerate(ordering):
+            nome = campo.lstrip('-')
+            lookup = 'lt' if campo.startswith('-') else 'gt'
+            condicao = Q(**{f'{nome}__{lookup}': valores[posicao]})
+            for anterior in range(posicao):
+                condicao &= Q(**{self.campos[anterior]: valores[anterior]})
+            filtro |= condicao
+        return limite & filtro
+
+    def valores(self, instancia):
+        return [
+            self.model._meta.get_field(campo).value_to_string(instancia)
+            for campo in self.campos
+        ]
+
+    def decode_cursor(self, request):
+        codificado = request.query_params.get(self.cursor_query_param)
+        if not codificado:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(codificado.encode('ascii')).decode('utf-8'))
+            valores = [
+                self.model._meta.get_field(campo).to_python(valor)
+                for campo, valor in zip(self.campos, cursor['v'], strict=True)
+            ]
+            return {'v': valores, 'r': bool(cursor.get('r'))}
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, valores, reverso):
+        dados = json.dumps({'v': [str(valor) for valor in valores], 'r': int(reverso)})
+        codificado = base64.urlsafe_b64encode(dados.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, codificado)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.ultima, reverso=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.primeira is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.primeira, reverso=True)
+
+    def get_paginated_response(self, data):
+        resposta = {}
+        if self.count is not None:
+            resposta['count'] = self.count
+        resposta.update({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+        return Response(resposta)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
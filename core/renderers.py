@@ -0,0 +1,56 @@
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .exportacao import FORMATOS, GERADORES, linhas_de_dados
+
+OPCOES_ORJSON = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class OrjsonRenderer(JSONRenderer):
+    """
+    DRF's JSONRenderer on orjson, several times faster on large lists.
+
+    Strings, numbers, UUIDs and containers are written natively. Anything
+    else (dates and times, decimals, lazy translations, querysets...) goes
+    through DRF's own encoder, so the bytes are the same as before; dates
+    are passed through too because DRF writes UTC datetimes with a 'Z'.
+    An indented response (the browsable API or ``; indent=``) falls back
+    to the standard encoder, since orjson only indents by two spaces.
+    """
+    codificador = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=self.codificador.default, option=OPCOES_ORJSON)
+
+
+class ExportacaoRenderer(BaseRenderer):
+    """
+    Makes ``?format=`` negotiate an export format.
+
+    Exports are streamed by the views themselves; this renderer only runs
+    for regular responses, such as validation errors, and writes them as a
+    small table in the same format.
+    """
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        cabecalho, linhas = linhas_de_dados(data)
+        return b''.join(GERADORES[self.format](cabecalho, linhas))
+
+
+class CSVRenderer(ExportacaoRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+
+class XLSXRenderer(ExportacaoRenderer):
+    media_type = FORMATOS['xlsx']
+    format = 'xlsx'
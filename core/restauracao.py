@@ -0,0 +1,405 @@
+"""
+Restore of the snapshots in the backup catalog, verified and timed.
+
+A restore replays a chain: the full snapshot, then each incremental in
+sequence. Every phase is timed and the result is recorded in the
+catalog's ``restauracoes``, so the time a restore takes is a measured
+number instead of a guess; ``restaurar --teste`` runs the whole thing
+into a temporary database as a drill.
+
+- Files are checked against the catalog's SHA-256 before anything is written.
+- PostgreSQL tables are loaded with parallel ``COPY ... FROM STDIN``, one
+  connection per table; SQLite is a single file and is decompressed as is.
+- After the full snapshot every table's row count and content checksum is
+  compared with the catalog, in parallel; after each incremental the row
+  counts are.
+- Media is copied back from the deduplicated store in parallel, each blob
+  rehashed on the way.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .backup import (
+    ARQUIVO_MIDIA, ARQUIVO_SQLITE, LOTE_LINHAS, TAMANHO_BLOCO, Catalogo, FontePostgres, FonteSQLite,
+    assinatura_migracoes, caminho_blob, estatisticas_tabela, ler_manifesto_midia, sha256_arquivo,
+)
+
+# Restore drills are kept in the catalog; older ones are dropped
+MAX_RESTAURACOES_REGISTRADAS = 50
+
+
+class RestauracaoError(Exception):
+    pass
+
+
+class Cronometro:
+    """Collects the duration of each named phase of a restore."""
+
+    def __init__(self):
+        self.fases = {}
+        self.inicio = time.monotonic()
+
+    @contextmanager
+    def fase(self, nome):
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            self.fases[nome] = round(time.monotonic() - inicio, 3)
+
+    @property
+    def total(self):
+        return round(time.monotonic() - self.inicio, 3)
+
+
+def _em_paralelo(funcao, itens, paralelismo):
+    with ThreadPoolExecutor(max_workers=paralelismo) as executor:
+        return list(executor.map(funcao, itens))
+
+
+def verificar_arquivos(catalogo, cadeia, paralelismo):
+    """Hashes every file of the chain in parallel; raises on the first mismatch found."""
+    arquivos = [
+        (os.path.join(catalogo.pasta(snapshot), arquivo['nome']), arquivo['sha256'])
+        for snapshot in cadeia for arquivo in snapshot['arquivos']
+    ]
+
+    def divergente(item):
+        caminho, esperado = item
+        return None if os.path.exists(caminho) and sha256_arquivo(caminho) == esperado else caminho
+
+    divergentes = [caminho for caminho in _em_paralelo(divergente, arquivos, paralelismo) if caminho]
+    if divergentes:
+        raise RestauracaoError(f'Arquivos corrompidos ou ausentes: {", ".join(divergentes)}')
+
+
+def comparar_tabelas(esperadas, obtidas, campos):
+    divergencias = []
+    for tabela, estatisticas in esperadas.items():
+        for campo in campos:
+            if estatisticas.get(campo) != obtidas.get(tabela, {}).get(campo):
+                divergencias.append(f'{tabela}.{campo}')
+    if divergencias:
+        raise RestauracaoError(f'Restauração não confere com o catálogo: {", ".join(divergencias)}')
+
+
+# Full snapshot
+
+def _descomprimir(origem, destino):
+    with gzip.open(origem, 'rb') as entrada, open(destino, 'wb') as saida:
+        shutil.copyfileobj(entrada, saida, TAMANHO_BLOCO)
+
+
+def _estatisticas_sqlite(caminho, tabelas, paralelismo):
+    def calcular(tabela):
+        fonte = FonteSQLite(caminho)
+        try:
+            return tabela, estatisticas_tabela(fonte, tabela)
+        finally:
+            fonte.fechar()
+    return dict(_em_paralelo(calcular, tabelas, paralelismo))
+
+
+def _estatisticas_postgres(banco, tabelas, paralelismo):
+    def calcular(tabela):
+        # Each thread gets its own connection from Django's per-thread handler
+        conexao = connections[banco]
+        try:
+            return tabela, estatisticas_tabela(FontePostgres(conexao), tabela)
+        finally:
+            conexao.close()
+    return dict(_em_paralelo(calcular, tabelas, paralelismo))
+
+
+def _carregar_tabela_postgres(banco, pasta, tabela):
+    conexao = connections[banco]
+    try:
+        with transaction.atomic(using=banco), conexao.cursor() as cursor:
+            # Foreign keys are checked by the final verification, not row by row in table order
+            cursor.execute('SET LOCAL session_replication_role = replica')
+            sql = f'COPY {conexao.ops.quote_name(tabela)} FROM STDIN'
+            with gzip.open(os.path.join(pasta, f'{tabela}.copy.gz'), 'rb') as entrada:
+                if hasattr(cursor.cursor, 'copy'):
+                    # psycopg 3
+                    with cursor.cursor.copy(sql) as copia:
+                        for bloco in iter(lambda: entrada.read(TAMANHO_BLOCO), b''):
+                            copia.write(bloco)
+                else:
+                    # psycopg2
+                    cursor.cursor.copy_expert(sql, entrada, size=TAMANHO_BLOCO)
+    finally:
+        conexao.close()
+
+
+def restaurar_completo_postgres(banco, pasta, tabelas, paralelismo):
+    conexao = connections[banco]
+    nomes = ', '.join(conexao.ops.quote_name(tabela) for tabela in tabelas)
+    with transaction.atomic(using=banco), conexao.cursor() as cursor:
+        cursor.execute(f'TRUNCATE {nomes} CASCADE')
+    _em_paralelo(lambda tabela: _carregar_tabela_postgres(banco, pasta, tabela), tabelas, paralelismo)
+
+    # COPY does not move the sequences behind the serial primary keys
+    modelos = apps.get_models(include_auto_created=True)
+    with transaction.atomic(using=banco), conexao.cursor() as cursor:
+        for sql in conexao.ops.sequence_reset_sql(no_style(), modelos):
+            cursor.execute(sql)
+
+
+# Incrementals
+
+class DestinoSQLite:
+    placeholder = '?'
+
+    def __init__(self, caminho):
+        self.conexao = sqlite3.connect(caminho, isolation_level=None)
+        self.conexao.execute('PRAGMA foreign_keys = OFF')
+        self.cursor = self.conexao.cursor()
+        self.nome = FonteSQLite.nome
+
+    @contextmanager
+    def transacao(self):
+        self.conexao.execute('BEGIN')
+        try:
+            yield
+        except BaseException:
+            self.conexao.rollback()
+            raise
+        self.conexao.commit()
+
+    def executar(self, sql, params=()):
+        self.cursor.execute(sql, params)
+
+    def executar_muitos(self, sql, linhas):
+        self.cursor.executemany(sql, linhas)
+
+    def criar_tabela_ids(self, tabela, chave):
+        self.executar('CREATE TEMPORARY TABLE restauracao_ids (id_restaurado PRIMARY KEY)')
+
+    def contar(self, tabela):
+        return self.conexao.execute(f'SELECT COUNT(*) FROM {self.nome(tabela)}').fetchone()[0]
+
+    def fechar(self):
+        self.conexao.close()
+
+
+class DestinoPostgres:
+    placeholder = '%s'
+
+    def __init__(self, banco):
+        self.banco = banco
+        self.conexao = connections[banco]
+        self.nome = self.conexao.ops.quote_name
+
+    @contextmanager
+    def transacao(self):
+        with transaction.atomic(using=self.banco), self.conexao.cursor() as cursor:
+            self.cursor = cursor
+            cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+            yield
+
+    def executar(self, sql, params=()):
+        self.cursor.execute(sql, params)
+
+    def executar_muitos(self, sql, linhas):
+        self.cursor.executemany(sql, linhas)
+
+    def criar_tabela_ids(self, tabela, chave):
+        self.executar(
+            'CREATE TEMPORARY TABLE restauracao_ids AS '
+            f'SELECT {self.nome(chave)} AS id_restaurado FROM {self.nome(tabela)} WITH NO DATA'
+        )
+
+    def contar(self, tabela):
+        with self.conexao.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {self.nome(tabela)}')
+            return cursor.fetchone()[0]
+
+    def fechar(self):
+        pass
+
+
+def _lotes(linhas):
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= LOTE_LINHAS:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _linhas_jsonl(caminho):
+    with gzip.open(caminho, 'rt', encoding='utf-8') as arquivo:
+        cabecalho = json.loads(next(arquivo))
+        yield cabecalho
+        for linha in arquivo:
+            yield json.loads(linha)
+
+
+def aplicar_incremental(destino, pasta, snapshot):
+    """Replays one incremental: upserts the changed rows, then deletes the rows whose key is gone."""
+    with destino.transacao():
+        for tabela in snapshot['tabelas']:
+            linhas = _linhas_jsonl(os.path.join(pasta, f'{tabela}.jsonl.gz'))
+            cabecalho = next(linhas)
+            colunas, chave = cabecalho['colunas'], cabecalho['chave']
+            nome_tabela = destino.nome(tabela)
+            lista_colunas = ', '.join(destino.nome(coluna) for coluna in colunas)
+            valores = ', '.join([destino.placeholder] * len(colunas))
+            sql = f'INSERT INTO {nome_tabela} ({lista_colunas}) VALUES ({valores})'
+
+            if cabecalho['completa']:
+                destino.executar(f'DELETE FROM {nome_tabela}')
+            else:
+                atualizar = ', '.join(
+                    f'{destino.nome(coluna)} = excluded.{destino.nome(coluna)}' for coluna in colunas if coluna != chave
+                )
+                sql += f' ON CONFLICT ({destino.nome(chave)}) ' + (f'DO UPDATE SET {atualizar}' if atualizar else 'DO NOTHING')
+            for lote in _lotes(linhas):
+                destino.executar_muitos(sql, lote)
+
+            if not cabecalho['completa']:
+                destino.criar_tabela_ids(tabela, chave)
+                with gzip.open(os.path.join(pasta, f'{tabela}.ids.gz'), 'rt', encoding='utf-8') as ids:
+                    for lote in _lotes(json.loads(linha) for linha in ids):
+                        destino.executar_muitos(
+                            f'INSERT INTO restauracao_ids (id_restaurado) VALUES ({destino.placeholder})', lote
+                        )
+                destino.executar(
+                    f'DELETE FROM {nome_tabela} WHERE {destino.nome(chave)} NOT IN '
+                    '(SELECT id_restaurado FROM restauracao_ids)'
+                )
+                destino.executar('DROP TABLE restauracao_ids')
+
+    contagens = {tabela: {'linhas': destino.contar(tabela)} for tabela in snapshot['tabelas']}
+    comparar_tabelas(snapshot['tabelas'], contagens, ('linhas',))
+
+
+# Media
+
+def restaurar_midia(catalogo, snapshot, midia_destino, paralelismo):
+    def copiar(item):
+        origem = caminho_blob(catalogo.raiz, item['sha256'])
+        destino = os.path.join(midia_destino, item['caminho'])
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        soma = hashlib.sha256()
+        with open(origem, 'rb') as entrada, open(destino, 'wb') as saida:
+            for bloco in iter(lambda: entrada.read(TAMANHO_BLOCO), b''):
+                soma.update(bloco)
+                saida.write(bloco)
+        os.utime(destino, ns=(item['mtime_ns'], item['mtime_ns']))
+        return None if soma.hexdigest() == item['sha256'] else item['caminho']
+
+    itens = list(ler_manifesto_midia(catalogo.pasta(snapshot)))
+    divergentes = [caminho for caminho in _em_paralelo(copiar, itens, paralelismo) if caminho]
+    if divergentes:
+        raise RestauracaoError(f'Arquivos de mídia corrompidos no backup: {", ".join(divergentes)}')
+    return len(itens)
+
+
+def _restaurar_sqlite(catalogo, completo, incrementais, destino, banco, cronometro, paralelismo):
+    """Rebuilds the database in a temp file next to ``destino`` and swaps it in once it verified."""
+    temporario = tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(destino)), suffix='.sqlite3', delete=False)
+    temporario.close()
+    try:
+        with cronometro.fase('banco_completo'):
+            _descomprimir(os.path.join(catalogo.pasta(completo), ARQUIVO_SQLITE), temporario.name)
+        with cronometro.fase('verificacao_completo'):
+            obtidas = _estatisticas_sqlite(temporario.name, sorted(completo['tabelas']), paralelismo)
+            comparar_tabelas(completo['tabelas'], obtidas, ('linhas', 'sha256'))
+        with cronometro.fase('incrementais'):
+            destino_sqlite = DestinoSQLite(temporario.name)
+            try:
+                for snapshot in incrementais:
+                    aplicar_incremental(destino_sqlite, catalogo.pasta(snapshot), snapshot)
+            finally:
+                destino_sqlite.fechar()
+        if str(connections[banco].settings_dict['NAME']) == str(destino):
+            connections[banco].close()
+        os.replace(temporario.name, destino)
+    finally:
+        if os.path.exists(temporario.name):
+            os.remove(temporario.name)
+
+
+def _restaurar_postgres(catalogo, completo, incrementais, banco, cronometro, paralelismo):
+    conexao = connections[banco]
+    alvo = (incrementais or [completo])[-1]
+    if conexao.vendor != completo['banco']:
+        raise RestauracaoError(f"O snapshot é de {completo['banco']} e o banco '{banco}' é {conexao.vendor}")
+    if assinatura_migracoes(conexao) != alvo['migracoes']:
+        raise RestauracaoError(f"O banco '{banco}' não está nas migrações do snapshot; rode o migrate antes")
+
+    tabelas = sorted(completo['tabelas'])
+    with cronometro.fase('banco_completo'):
+        restaurar_completo_postgres(banco, catalogo.pasta(completo), tabelas, paralelismo)
+    with cronometro.fase('verificacao_completo'):
+        obtidas = _estatisticas_postgres(banco, tabelas, paralelismo)
+        comparar_tabelas(completo['tabelas'], obtidas, ('linhas', 'sha256'))
+    with cronometro.fase('incrementais'):
+        for snapshot in incrementais:
+            aplicar_incremental(DestinoPostgres(banco), catalogo.pasta(snapshot), snapshot)
+
+
+def restaurar(sequencia=None, raiz=None, destino=None, banco='default', midia_destino=None, paralelismo=4):
+    """
+    Rebuilds the database (and media) as of snapshot ``sequencia``, the latest by default.
+
+    A SQLite snapshot is restored into the file ``destino`` (the ``banco``
+    database by default). A PostgreSQL one is restored into the ``banco``
+    connection, which must already be migrated to the snapshot's
+    migrations. ``midia_destino=None`` skips media. Returns the timing
+    report, which is also appended to the catalog's ``restauracoes``.
+    """
+    catalogo = Catalogo(raiz)
+    with catalogo.trava():
+        if not catalogo.snapshots:
+            raise RestauracaoError('O catálogo não tem nenhum snapshot')
+        cadeia = catalogo.cadeia(sequencia or catalogo.ultimo()['sequencia'])
+        completo, incrementais, alvo = cadeia[0], cadeia[1:], cadeia[-1]
+        cronometro = Cronometro()
+
+        with cronometro.fase('verificacao_arquivos'):
+            verificar_arquivos(catalogo, cadeia, paralelismo)
+
+        if completo['banco'] == 'sqlite':
+            destino = destino or connections[banco].settings_dict['NAME']
+            _restaurar_sqlite(catalogo, completo, incrementais, destino, banco, cronometro, paralelismo)
+        else:
+            _restaurar_postgres(catalogo, completo, incrementais, banco, cronometro, paralelismo)
+
+        arquivos_midia = 0
+        if midia_destino and os.path.exists(os.path.join(catalogo.pasta(alvo), ARQUIVO_MIDIA)):
+            with cronometro.fase('midia'):
+                arquivos_midia = restaurar_midia(catalogo, alvo, midia_destino, paralelismo)
+
+        relatorio = {
+            'sequencia': alvo['sequencia'],
+            'cadeia': [snapshot['sequencia'] for snapshot in cadeia],
+            'em': timezone.now().isoformat(),
+            'banco': completo['banco'],
+            'paralelismo': paralelismo,
+            'linhas': sum(estatisticas['linhas'] for estatisticas in alvo['tabelas'].values()),
+            'arquivos_midia': arquivos_midia,
+            'fases': cronometro.fases,
+            'duracao': cronometro.total,
+        }
+        restauracoes = catalogo.dados.setdefault('restauracoes', [])
+        restauracoes.append(relatorio)
+        del restauracoes[:-MAX_RESTAURACOES_REGISTRADAS]
+        catalogo.salvar()
+    return relatorio
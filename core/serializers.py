@@ -0,0 +1,98 @@
+"""
+Sparse fieldsets and expandable relations for read requests.
+
+``?fields=id,nome,familia.nome`` keeps only the listed fields; a relation
+named without sub-fields renders whole. ``?expand=familia`` embeds only the
+listed relations (dotted paths reach nested ones) and collapses every other
+expandable relation: a foreign key to its primary key, a list of related
+rows out of the payload. Without ``expand`` relations embed as they always
+did, so existing clients see the same payload.
+
+EagerLoadingMixin walks the same pruned fields to decide what to join or
+prefetch, so a relation left out of the response is not queried either.
+"""
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def arvore_campos(valor):
+    """'id,familia.nome' -> {'id': {}, 'familia': {'nome': {}}}; None when the parameter is absent."""
+    if valor is None:
+        return None
+    arvore = {}
+    for caminho in valor.split(','):
+        no = arvore
+        for parte in caminho.strip().split('.'):
+            if parte:
+                no = no.setdefault(parte, {})
+    return arvore
+
+
+def selecao_pedida(request):
+    """The (fields, expand) trees of a read request; writes always get the whole serializer."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+    return arvore_campos(request.query_params.get('fields')), arvore_campos(request.query_params.get('expand'))
+
+
+class ChaveRelacaoField(serializers.ReadOnlyField):
+    """Stands in for a collapsed relation: its key, read from the local column."""
+
+
+class CamposDinamicosMixin:
+    """
+    Applies ``?fields=`` and ``?expand=`` to a serializer and to the ones nested in it.
+
+    ``expansiveis`` maps each nested relation to the attribute holding its
+    key when collapsed (``'familia': 'familia_id'``), or to None for a
+    reverse relation, which is then left out.
+    """
+    expansiveis = {}
+
+    def _caminho(self):
+        caminho, no = [], self
+        while no.parent is not None:
+            # The child of a ListSerializer is bound with an empty name
+            if no.field_name:
+                caminho.insert(0, no.field_name)
+            no = no.parent
+        return caminho
+
+    def _selecao(self):
+        campos, expandir = selecao_pedida(self.context.get('request'))
+        for nome in self._caminho():
+            if campos is not None:
+                # A relation named without sub-fields renders whole
+                campos = campos.get(nome) or None
+            if expandir is not None:
+                expandir = expandir.get(nome, {})
+        return campos, expandir
+
+    def get_fields(self):
+        fields = super().get_fields()
+        campos, expandir = self._selecao()
+        if campos is not None:
+            fields = {nome: campo for nome, campo in fields.items() if nome in campos or campo.write_only}
+        if expandir is not None:
+            for nome, chave in self.expansiveis.items():
+                if nome not in fields or nome in expandir:
+                    continue
+                if chave:
+                    fields[nome] = ChaveRelacaoField(source=chave)
+                else:
+                    del fields[nome]
+        return fields
+
+
+def campos_renderizados(serializer, prefixo=''):
+    """Dotted paths of every field ``serializer`` will output, nested ones included."""
+    caminhos = set()
+    for nome, campo in serializer.fields.items():
+        if campo.write_only or isinstance(campo, ChaveRelacaoField):
+            continue
+        caminho = prefixo + nome
+        caminhos.add(caminho)
+        campo = getattr(campo, 'child', campo)
+        if isinstance(campo, serializers.BaseSerializer):
+            caminhos |= campos_renderizados(campo, caminho + '.')
+    return caminhos
@@ -48,6 +48,15 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.OrjsonRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.OrjsonParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema',
@@ -59,6 +68,7 @@ REST_FRAMEWORK = {
     'DEFAULT_THROTTLE_RATES': {
         'user': '1000/day',
         'anon': '100/day',
+        'midia': '20000/day',
     }
 }
 
@@ -92,6 +102,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'corsheaders',
+    'core',
     'usuarios',
     'familias',
     'membros',
@@ -99,10 +110,15 @@ INSTALLED_APPS = [
     'presencas',
     'cestas',
     'relatorios',
+    'busca',
+    'duplicados',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.CompressaoMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -111,7 +127,6 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'core.middleware.FileUploadSecurityMiddleware',
-    'core.middleware.CustomExceptionHandlerMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -159,6 +174,11 @@ else:
 
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    # Nomes com hash e versões comprimidas, servidos pelo WhiteNoise com cache imutável
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
 
 # Media files configuration
 MEDIA_URL = '/media/'
@@ -166,23 +186,117 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 # File Upload Settings
 FILE_UPLOAD_PERMISSIONS = 0o644
+# Limites de upload verificados durante o envio (core.uploads), por nome de campo
+UPLOAD_TAMANHO_MAXIMO_REQUISICAO = config('UPLOAD_TAMANHO_MAXIMO_REQUISICAO', default=25 * 1024 * 1024, cast=int)
+UPLOAD_LIMITE_PADRAO = {'tamanho_maximo': 5 * 1024 * 1024, 'tipos': ('jpeg', 'png', 'webp')}
+UPLOAD_LIMITES = {
+    # Fotos de celular chegam com 4-8MB; o pipeline de imagens reduz depois
+    'foto_3x4': {'tamanho_maximo': 12 * 1024 * 1024, 'tipos': ('jpeg', 'png', 'webp')},
+    'declaracao_matricula': {'tamanho_maximo': 12 * 1024 * 1024, 'tipos': ('jpeg', 'png', 'webp', 'pdf')},
+    # Planilhas de cadastro importadas por familias.importacao (10 mil famílias ocupam uns 4MB em CSV)
+    'arquivo': {'tamanho_maximo': 20 * 1024 * 1024, 'tipos': ('csv', 'xlsx')},
+}
 FILE_UPLOAD_DIRECTORY_PERMISSIONS = 0o755
 
 # Business Rules
 X_PERCENTUAL_MINIMO_PRESENCA = config('X_PERCENTUAL_MINIMO_PRESENCA', default=70, cast=int)
 
-# Security settings for media files
-DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+# Mídia servida por core.views.MidiaView (autenticada). Em produção, com
+# MIDIA_OFFLOAD = 'x-accel' (nginx) ou 'x-sendfile' (Apache), o servidor web
+# envia o arquivo; no nginx, MIDIA_X_ACCEL_PREFIXO é uma location `internal`
+# apontando para o MEDIA_ROOT
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MIDIA_OFFLOAD = config('MIDIA_OFFLOAD', default='')
+MIDIA_X_ACCEL_PREFIXO = config('MIDIA_X_ACCEL_PREFIXO', default='/midia-interna/')
+
+# Metrics
+# /metrics só responde para estes IPs; consultas acima de METRICS_SLOW_QUERY_MS
+# são registradas no logger core.metrics com a pilha de chamadas do projeto
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1', cast=lambda v: [s.strip() for s in v.split(',')])
+METRICS_SLOW_QUERY_MS = config('METRICS_SLOW_QUERY_MS', default=None, cast=lambda v: float(v) if v else None)
+# Pasta onde cada processo grava suas métricas para o /metrics somar todos os workers; o
+# gunicorn.conf.py cria uma por execução do gunicorn. Vazia, cada processo responde só por si
+METRICS_DIR = config('METRICS_DIR', default='')
+
+# Compressão das respostas (brotli ou gzip, conforme o Accept-Encoding)
+# Corpos menores que COMPRESSAO_TAMANHO_MINIMO bytes vão sem compressão; a
+# qualidade do brotli vai de 0 a 11, e acima de 5 custa CPU demais por requisição
+COMPRESSAO_TAMANHO_MINIMO = config('COMPRESSAO_TAMANHO_MINIMO', default=1024, cast=int)
+COMPRESSAO_QUALIDADE_BROTLI = config('COMPRESSAO_QUALIDADE_BROTLI', default=5, cast=int)
+
+# Relatórios em cache são invalidados pela versão dos dados; o timeout só limita o espaço usado
+RELATORIOS_CACHE_TIMEOUT = config('RELATORIOS_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+# Consultas que o resumo executa ao mesmo tempo, cada uma com sua conexão, somando todas as
+# requisições do processo; 1 executa tudo em sequência. No SQLite o padrão é 1: o banco roda no
+# próprio processo, disputando a mesma CPU, e as consultas em paralelo não terminam antes
+RELATORIOS_CONSULTAS_PARALELAS = config(
+    'RELATORIOS_CONSULTAS_PARALELAS',
+    default=1 if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3' else 4,
+    cast=int
+)
+
+# Backups (python manage.py backup / restaurar / limpar_backups)
+BACKUP_DIR = config('BACKUP_DIR', default=os.path.join(BASE_DIR, 'backups'))
+# Incrementais seguidos antes de o backup voltar a ser completo
+BACKUP_INCREMENTAIS_MAX = config('BACKUP_INCREMENTAIS_MAX', default=6, cast=int)
+# Segundos que o incremental recua antes do início do snapshot anterior; deve cobrir a transação mais
+# longa esperada, senão uma linha gravada antes e confirmada depois daquele snapshot fica de fora dos dois
+BACKUP_MARGEM_INCREMENTAL = config('BACKUP_MARGEM_INCREMENTAL', default=3600, cast=int)
+# Retenção GFS: último snapshot de cada um dos N dias, semanas e meses mais recentes
+BACKUP_RETENCAO_DIARIA = config('BACKUP_RETENCAO_DIARIA', default=7, cast=int)
+BACKUP_RETENCAO_SEMANAL = config('BACKUP_RETENCAO_SEMANAL', default=4, cast=int)
+BACKUP_RETENCAO_MENSAL = config('BACKUP_RETENCAO_MENSAL', default=12, cast=int)
+
+# Detecção de duplicidades (python manage.py detectar_duplicados)
+# Pontuação mínima, de 0 a 1, para um par ser sugerido como duplicado
+DUPLICADOS_LIMIAR = config('DUPLICADOS_LIMIAR', default=0.85, cast=float)
+# Chaves compartilhadas por mais registros que isso (um telefone genérico) não geram comparações
+DUPLICADOS_TAMANHO_MAXIMO_BLOCO = config('DUPLICADOS_TAMANHO_MAXIMO_BLOCO', default=200, cast=int)
+
+# Fila de tarefas (python manage.py processar_tarefas)
+# Tarefas em execução sem sinal de vida (core.tarefas.batimento) há mais de TAREFAS_TIMEOUT
+# segundos voltam para a fila
+TAREFAS_TIMEOUT = config('TAREFAS_TIMEOUT', default=60 * 30, cast=int)
+# Tarefas concluídas ou que falharam são apagadas depois de TAREFAS_RETENCAO_DIAS dias
+TAREFAS_RETENCAO_DIAS = config('TAREFAS_RETENCAO_DIAS', default=7, cast=int)
+# Executa a fila num processo ao lado do gunicorn (gunicorn.conf.py), no mesmo banco e MEDIA_ROOT
+TAREFAS_NO_WEB = config('TAREFAS_NO_WEB', default=False, cast=bool)
 
 # Cache settings
-CACHES = {
-    'default': {
+# CACHE_BACKEND escolhe o cache: 'locmem' é por processo; 'database' e 'file'
+# são compartilhados entre os workers do gunicorn sem serviço externo
+# ('database' exige python manage.py createcachetable); 'redis' exige redis-py
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
+    },
+    'database': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': config('CACHE_LOCATION', default='cache_compartilhado'),
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_LOCATION', default=os.path.join(BASE_DIR, 'cache')),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_LOCATION', default='redis://127.0.0.1:6379'),
+    },
+}
+CACHES = {
+    'default': {
+        **CACHE_BACKENDS[CACHE_BACKEND],
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=10000, cast=int),
+        } if CACHE_BACKEND != 'redis' else {},
     }
 }
+# Com cache por processo cada worker aquece o próprio cache ao iniciar (gunicorn.conf.py)
+CACHE_WARM_ON_STARTUP = config('CACHE_WARM_ON_STARTUP', default=False, cast=bool)
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
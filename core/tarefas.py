@@ -0,0 +1,187 @@
+"""
+Local job queue backed by the Tarefa table.
+
+Tasks are plain functions registered with ``@tarefa('nome')`` and enqueued
+with ``enfileirar('nome', **argumentos)``. Enqueuing inside a transaction
+commits the job together with the data it refers to. Tasks run outside a
+transaction so they can report progress; they open their own when needed.
+Long tasks call ``batimento()`` as they go, so a job is only taken for
+abandoned when its worker stops sending those, not when it merely runs long.
+"""
+import contextvars
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Tarefa
+
+logger = logging.getLogger(__name__)
+
+REGISTRO = {}
+AO_FALHAR = {}
+# Seconds between two heartbeats written by the same job
+INTERVALO_BATIMENTO = 30
+
+em_execucao = contextvars.ContextVar('tarefa_em_execucao', default=None)
+
+
+def tarefa(nome, ao_falhar=None):
+    """
+    Registers ``funcao`` as the task ``nome``; it receives the job's argumentos as kwargs.
+
+    ``ao_falhar(erro, **argumentos)`` runs once the last attempt has failed.
+    """
+    def decorador(funcao):
+        REGISTRO[nome] = funcao
+        if ao_falhar:
+            AO_FALHAR[nome] = ao_falhar
+        return funcao
+    return decorador
+
+
+def descobrir():
+    autodiscover_modules('tarefas')
+    return REGISTRO
+
+
+def enfileirar(nome, max_tentativas=3, **argumentos):
+    if nome not in descobrir():
+        raise ValueError(f'Tarefa não registrada: {nome}')
+    return Tarefa.objects.create(nome=nome, argumentos=argumentos, max_tentativas=max_tentativas)
+
+
+def enfileirar_se_ausente(nome, max_tentativas=3, **argumentos):
+    """
+    Like ``enfileirar``, but returns None instead when the same job is still pending.
+
+    For jobs that read the current state when they run, such as a check
+    enqueued on every save: a pending one will already see the new data.
+    """
+    if Tarefa.objects.filter(nome=nome, status=Tarefa.PENDENTE, argumentos=argumentos).exists():
+        return None
+    return enfileirar(nome, max_tentativas=max_tentativas, **argumentos)
+
+
+def enfileirar_em_lote(nome, argumentos, max_tentativas=3):
+    """Enqueues one job per item of ``argumentos`` with a single INSERT."""
+    if nome not in descobrir():
+        raise ValueError(f'Tarefa não registrada: {nome}')
+    return Tarefa.objects.bulk_create(
+        Tarefa(nome=nome, argumentos=item, max_tentativas=max_tentativas) for item in argumentos
+    )
+
+
+def falhar(tarefa_atual):
+    """Marks a job as failed for good and runs its ``ao_falhar`` handler."""
+    tarefa_atual.status = Tarefa.FALHOU
+    tarefa_atual.concluida_em = timezone.now()
+    if tarefa_atual.nome in AO_FALHAR:
+        AO_FALHAR[tarefa_atual.nome](erro=tarefa_atual.erro, **tarefa_atual.argumentos)
+
+
+def batimento():
+    """
+    Records that the running job is still alive; does nothing outside a job.
+
+    Called from the tasks' progress points. Writes at most once every
+    INTERVALO_BATIMENTO seconds, and only while the job is still claimed by
+    this worker.
+    """
+    atual = em_execucao.get()
+    if atual is None:
+        return
+    agora = time.monotonic()
+    if agora - atual['ultimo'] < INTERVALO_BATIMENTO:
+        return
+    atual['ultimo'] = agora
+    Tarefa.objects.filter(
+        pk=atual['tarefa'].pk, status=Tarefa.EXECUTANDO, trabalhador=atual['tarefa'].trabalhador
+    ).update(batimento_em=timezone.now())
+
+
+def recuperar_abandonadas():
+    """
+    Returns to the queue jobs with no heartbeat for TAREFAS_TIMEOUT seconds.
+
+    The attempt was counted when the job was claimed, so a job that keeps
+    killing its worker (out of memory on a huge upload, say) fails once it
+    has used up max_tentativas instead of being retried forever.
+    """
+    limite = timezone.now() - timedelta(seconds=settings.TAREFAS_TIMEOUT)
+    abandonadas = Tarefa.objects.filter(status=Tarefa.EXECUTANDO, batimento_em__lt=limite)
+    esgotadas = 0
+    for tarefa_atual in abandonadas.filter(tentativas__gte=F('max_tentativas')):
+        tarefa_atual.erro = f'Trabalhador {tarefa_atual.trabalhador} parou durante a execução.'
+        falhar(tarefa_atual)
+        tarefa_atual.save(update_fields=['status', 'concluida_em', 'erro'])
+        esgotadas += 1
+    return esgotadas + abandonadas.update(status=Tarefa.PENDENTE, trabalhador='')
+
+
+def purgar_finalizadas():
+    """Deletes finished jobs older than TAREFAS_RETENCAO_DIAS so the table stays small."""
+    limite = timezone.now() - timedelta(days=settings.TAREFAS_RETENCAO_DIAS)
+    removidas, _ = Tarefa.objects.filter(
+        status__in=[Tarefa.CONCLUIDA, Tarefa.FALHOU], concluida_em__lt=limite
+    ).delete()
+    return removidas
+
+
+def reservar(trabalhador, nomes=None):
+    """
+    Claims the oldest available job for ``trabalhador`` or returns None.
+
+    The claim is an UPDATE conditioned on the job still being pending, which
+    works the same on SQLite and PostgreSQL: when two workers race for one
+    job only one UPDATE matches and the other moves on to the next candidate.
+    The same UPDATE counts the attempt, so it is recorded even if the worker
+    never gets to finish the job, and writes the first heartbeat.
+    """
+    candidatas = Tarefa.objects.filter(status=Tarefa.PENDENTE, disponivel_em__lte=timezone.now())
+    if nomes:
+        candidatas = candidatas.filter(nome__in=nomes)
+    for tarefa_id in candidatas.order_by('disponivel_em', 'id').values_list('id', flat=True)[:10]:
+        agora = timezone.now()
+        reservada = Tarefa.objects.filter(pk=tarefa_id, status=Tarefa.PENDENTE).update(
+            status=Tarefa.EXECUTANDO,
+            trabalhador=trabalhador,
+            iniciada_em=agora,
+            batimento_em=agora,
+            tentativas=F('tentativas') + 1,
+        )
+        if reservada:
+            return Tarefa.objects.get(pk=tarefa_id)
+    return None
+
+
+def executar(tarefa_atual):
+    """Runs a claimed job, retrying failures with exponential backoff up to max_tentativas."""
+    funcao = descobrir().get(tarefa_atual.nome)
+    # The claim wrote the first heartbeat
+    token = em_execucao.set({'tarefa': tarefa_atual, 'ultimo': time.monotonic()})
+    try:
+        if funcao is None:
+            raise LookupError(f'Tarefa não registrada: {tarefa_atual.nome}')
+        funcao(**tarefa_atual.argumentos)
+    except Exception:
+        tarefa_atual.erro = traceback.format_exc()
+        logger.exception('Tarefa %s falhou (tentativa %s)', tarefa_atual, tarefa_atual.tentativas)
+        if funcao is not None and tarefa_atual.tentativas < tarefa_atual.max_tentativas:
+            tarefa_atual.status = Tarefa.PENDENTE
+            tarefa_atual.disponivel_em = timezone.now() + timedelta(seconds=30 * 2 ** (tarefa_atual.tentativas - 1))
+        else:
+            falhar(tarefa_atual)
+    else:
+        tarefa_atual.status = Tarefa.CONCLUIDA
+        tarefa_atual.concluida_em = timezone.now()
+        tarefa_atual.erro = ''
+    finally:
+        em_execucao.reset(token)
+    tarefa_atual.save(update_fields=['status', 'disponivel_em', 'concluida_em', 'erro'])
+    return tarefa_atual
@@ -0,0 +1,40 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from usuarios.models import Usuario
+
+
+class QueryCountTestCase(APITestCase):
+    """
+    Base test case for asserting an endpoint's query count does not grow with its data.
+
+    ``criar_linhas(n)`` must add ``n`` more rows (with their nested relations)
+    to whatever the endpoint returns. Keep the amounts under PAGE_SIZE so
+    pagination does not hide a per-row query.
+    """
+    quantidades = (1, 5)
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user('consultas@teste.com', 'senha', is_staff=True)
+        self.client.force_authenticate(self.usuario)
+
+    def contar_consultas(self, url, method='get', data=None):
+        # Measure cold: a cache hit on the second request would hide growth
+        cache.clear()
+        with CaptureQueriesContext(connection) as contexto:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 400, getattr(response, 'data', response))
+        return len(contexto)
+
+    def assertConstantQueries(self, url, criar_linhas, method='get', data=None, queries=None):
+        contagens = []
+        for quantidade in self.quantidades:
+            criar_linhas(quantidade)
+            contagens.append(self.contar_consultas(url, method, data))
+        self.assertEqual(
+            len(set(contagens)), 1,
+            f'{url} query count grows with the data: {dict(zip(self.quantidades, contagens))}'
+        )
+        if queries is not None:
+            self.assertEqual(contagens[0], queries, f'{url} ran {contagens[0]} queries, expected {queries}')
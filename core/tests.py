@@ -0,0 +1,242 @@
+import io
+import json
+import os
+import re
+import sqlite3
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import metrics, tarefas
+from core.backup import Catalogo
+from core.models import Tarefa
+from core.tarefas import batimento, enfileirar, executar, purgar_finalizadas, recuperar_abandonadas, reservar
+from familias.models import Familia
+
+chamadas = []
+
+
+@tarefas.tarefa('testes.ok')
+def tarefa_ok(valor):
+    chamadas.append(valor)
+
+
+@tarefas.tarefa('testes.falha', ao_falhar=lambda erro, valor: chamadas.append(('falhou', valor)))
+def tarefa_falha(valor):
+    raise RuntimeError('falha')
+
+
+@tarefas.tarefa('testes.longa')
+def tarefa_longa(valor):
+    # Runs past TAREFAS_TIMEOUT, reporting progress
+    antiga = timezone.now() - timedelta(minutes=5)
+    Tarefa.objects.filter(status=Tarefa.EXECUTANDO).update(iniciada_em=antiga, batimento_em=antiga)
+    batimento()
+    chamadas.append(recuperar_abandonadas())
+
+
+class FilaTarefasTest(TestCase):
+    def setUp(self):
+        chamadas.clear()
+
+    def test_reserva_conta_tentativa(self):
+        tarefa = enfileirar('testes.ok', valor=1)
+        reservada = reservar('a')
+        self.assertEqual(reservada.pk, tarefa.pk)
+        self.assertEqual((reservada.status, reservada.tentativas), (Tarefa.EXECUTANDO, 1))
+        # Claimed jobs are not handed out twice
+        self.assertIsNone(reservar('b'))
+        executar(reservada)
+        tarefa.refresh_from_db()
+        self.assertEqual((tarefa.status, tarefa.tentativas), (Tarefa.CONCLUIDA, 1))
+        self.assertEqual(chamadas, [1])
+
+    def test_repete_ate_max_tentativas(self):
+        tarefa = enfileirar('testes.falha', max_tentativas=2, valor=7)
+        with self.assertLogs('core.tarefas', 'ERROR'):
+            executar(reservar('a'))
+        tarefa.refresh_from_db()
+        self.assertEqual((tarefa.status, tarefa.tentativas), (Tarefa.PENDENTE, 1))
+        self.assertGreater(tarefa.disponivel_em, timezone.now())
+        self.assertIsNone(reservar('a'))
+
+        Tarefa.objects.filter(pk=tarefa.pk).update(disponivel_em=timezone.now())
+        with self.assertLogs('core.tarefas', 'ERROR'):
+            executar(reservar('a'))
+        tarefa.refresh_from_db()
+        self.assertEqual((tarefa.status, tarefa.tentativas), (Tarefa.FALHOU, 2))
+        self.assertIn('RuntimeError', tarefa.erro)
+        self.assertEqual(chamadas, [('falhou', 7)])
+
+    @override_settings(TAREFAS_TIMEOUT=60)
+    def test_recupera_abandonadas(self):
+        tarefa = enfileirar('testes.falha', max_tentativas=2, valor=3)
+        for tentativa in (1, 2):
+            # The worker dies mid-run: nothing but the claim reaches the database
+            self.assertEqual(reservar('a').tentativas, tentativa)
+            Tarefa.objects.filter(pk=tarefa.pk).update(batimento_em=timezone.now() - timedelta(minutes=5))
+            self.assertEqual(recuperar_abandonadas(), 1)
+            tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, Tarefa.FALHOU)
+        self.assertIsNone(reservar('a'))
+        self.assertEqual(chamadas, [('falhou', 3)])
+
+    @override_settings(TAREFAS_TIMEOUT=60)
+    def test_nao_recupera_em_execucao(self):
+        enfileirar('testes.ok', valor=1)
+        reservar('a')
+        self.assertEqual(recuperar_abandonadas(), 0)
+
+    @override_settings(TAREFAS_TIMEOUT=60)
+    def test_batimento_mantem_tarefa_longa(self):
+        tarefa = enfileirar('testes.longa', valor=1)
+        with mock.patch('core.tarefas.INTERVALO_BATIMENTO', 0):
+            executar(reservar('a'))
+        self.assertEqual(chamadas, [0])
+        tarefa.refresh_from_db()
+        self.assertEqual((tarefa.status, tarefa.tentativas), (Tarefa.CONCLUIDA, 1))
+        self.assertGreater(tarefa.batimento_em, tarefa.iniciada_em)
+
+    @override_settings(TAREFAS_TIMEOUT=60)
+    def test_batimento_espaca_escritas(self):
+        enfileirar('testes.longa', valor=1)
+        # Right after the claim's heartbeat nothing is written, so the stale one stands
+        executar(reservar('a'))
+        self.assertEqual(chamadas, [1])
+        with self.assertNumQueries(0):
+            batimento()
+
+    @override_settings(TAREFAS_RETENCAO_DIAS=7)
+    def test_purga_finalizadas(self):
+        antiga = timezone.now() - timedelta(days=8)
+        velhas = [
+            Tarefa.objects.create(nome='testes.ok', status=status, concluida_em=antiga)
+            for status in (Tarefa.CONCLUIDA, Tarefa.FALHOU)
+        ]
+        recente = Tarefa.objects.create(nome='testes.ok', status=Tarefa.CONCLUIDA, concluida_em=timezone.now())
+        pendente = enfileirar('testes.ok', valor=1)
+        self.assertEqual(purgar_finalizadas(), 2)
+        self.assertFalse(Tarefa.objects.filter(pk__in=[tarefa.pk for tarefa in velhas]).exists())
+        self.assertEqual(set(Tarefa.objects.values_list('pk', flat=True)), {recente.pk, pendente.pk})
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta, ignore_errors=True)
+
+    def amostras(self, texto):
+        return dict(re.findall(r'^(\S+) (\S+)$', texto, re.MULTILINE))
+
+    def test_soma_os_workers(self):
+        with override_settings(METRICS_DIR=self.pasta):
+            self.client.get(reverse('familia-list'))
+            # Another worker that served exactly the same requests
+            with open(os.path.join(self.pasta, '99999-outro.json'), 'w') as arquivo:
+                json.dump(metrics.exportar(), arquivo)
+            with open(os.path.join(self.pasta, '99998-outro.json.tmp'), 'w') as arquivo:
+                arquivo.write('{')
+            resposta = self.client.get('/metrics')
+            # This worker published its own file on the way
+            self.assertEqual(len(os.listdir(self.pasta)), 3)
+        with override_settings(METRICS_DIR=''):
+            sozinho = self.amostras(self.client.get('/metrics').content.decode())
+
+        texto = resposta.content.decode()
+        self.assertEqual(resposta['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertEqual(texto.count('# TYPE http_request_duration_seconds histogram'), 1)
+        self.assertIn('http_request_db_queries_count{view="FamiliaViewSet",action="list",method="GET"}', sozinho)
+        somadas = self.amostras(texto)
+        self.assertEqual(somadas.keys(), sozinho.keys())
+        for nome, valor in sozinho.items():
+            self.assertAlmostEqual(float(somadas[nome]), 2 * float(valor), msg=nome)
+
+    def test_restrito_aos_ips(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.1').status_code, 403)
+
+
+class BackupTest(TestCase):
+    def test_banco_nao_suportado(self):
+        with tempfile.TemporaryDirectory() as raiz, mock.patch.object(connection, 'vendor', 'oracle'):
+            with self.assertRaisesMessage(CommandError, 'Backup não suportado para o banco oracle'):
+                call_command('backup', destino=raiz, sem_midia=True)
+
+
+class BackupRestauracaoTest(TransactionTestCase):
+    def setUp(self):
+        self.raiz = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.raiz, ignore_errors=True)
+
+    def backup(self, *args):
+        call_command('backup', *args, destino=self.raiz, sem_midia=True, stdout=io.StringIO())
+
+    def test_completo_incremental_e_restauracao(self):
+        mantida = Familia.objects.create(nome='Família Mantida')
+        removida = Familia.objects.create(nome='Família Removida')
+        self.backup()
+
+        removida.delete()
+        mantida.nome = 'Família Renomeada'
+        mantida.save()
+        nova = Familia.objects.create(nome='Família Nova')
+        self.backup('--incremental')
+
+        self.assertEqual([snapshot['tipo'] for snapshot in Catalogo(self.raiz).snapshots], ['completo', 'incremental'])
+        saida = io.StringIO()
+        call_command('restaurar', destino=self.raiz, teste=True, sem_midia=True, stdout=saida)
+        self.assertIn('restaurado e conferido', saida.getvalue())
+
+        arquivo = os.path.join(self.raiz, 'restaurado.sqlite3')
+        call_command('restaurar', destino=self.raiz, saida=arquivo, sem_midia=True, stdout=io.StringIO())
+        conexao = sqlite3.connect(arquivo)
+        try:
+            familias = dict(conexao.execute('SELECT id, nome FROM familias_familia'))
+        finally:
+            conexao.close()
+        self.assertEqual(familias, {mantida.id: 'Família Renomeada', nova.id: 'Família Nova'})
+
+    def test_incremental_cobre_transacao_confirmada_depois(self):
+        alterada = Familia.objects.create(nome='Família Original')
+        self.backup()
+        self.backup('--incremental')
+        inicio = parse_datetime(Catalogo(self.raiz).ultimo()['iniciado_em'])
+
+        # Written inside transactions that were open while that incremental read the data
+        antes = inicio - timedelta(seconds=30)
+        atrasada = Familia.objects.create(nome='Família Atrasada')
+        Familia.objects.filter(pk=atrasada.pk).update(data_atualizacao=antes)
+        Familia.objects.filter(pk=alterada.pk).update(nome='Família Alterada', data_atualizacao=antes)
+        self.backup('--incremental')
+
+        arquivo = os.path.join(self.raiz, 'restaurado.sqlite3')
+        call_command('restaurar', destino=self.raiz, saida=arquivo, sem_midia=True, stdout=io.StringIO())
+        conexao = sqlite3.connect(arquivo)
+        try:
+            familias = dict(conexao.execute('SELECT id, nome FROM familias_familia'))
+        finally:
+            conexao.close()
+        self.assertEqual(familias, {alterada.id: 'Família Alterada', atrasada.id: 'Família Atrasada'})
+
+    def test_incremental_nao_trava_escritas(self):
+        Familia.objects.create(nome='Família Base')
+        self.backup()
+        for i in range(50):
+            Familia.objects.create(nome=f'Família {i}')
+        # A read transaction held on the database would make this write fail with "database is locked"
+        with mock.patch('core.backup._dump_incremental', side_effect=self.escrever_durante_dump):
+            self.backup('--incremental')
+        self.assertTrue(Familia.objects.filter(nome='Escrita durante o backup').exists())
+
+    def escrever_durante_dump(self, fonte, pasta, desde):
+        # The dump's read transaction holds its lock from the first read on
+        self.assertTrue(list(fonte.consultar('SELECT id FROM familias_familia')))
+        Familia.objects.create(nome='Escrita durante o backup')
+        return [], {}
@@ -0,0 +1,14 @@
+"""Text normalization shared by search, duplicate detection and imports."""
+import re
+import unicodedata
+
+PALAVRA = re.compile(r'[0-9a-z]+')
+
+
+def normalizar(texto):
+    """'José da Conceição, 123.456' -> 'jose da conceicao 123 456'."""
+    if not texto:
+        return ''
+    decomposto = unicodedata.normalize('NFKD', str(texto))
+    sem_acentos = ''.join(caractere for caractere in decomposto if not unicodedata.combining(caractere))
+    return ' '.join(PALAVRA.findall(sem_acentos.lower()))
@@ -0,0 +1,113 @@
+"""
+Upload limits enforced while the request body streams in.
+
+``LimitesUploadHandler`` sits first in ``request.upload_handlers`` (the
+FileUploadSecurityMiddleware puts it there). It rejects a request whose
+declared length is already too big before reading it. Otherwise it counts
+each file's bytes against the limit of its field, aborting as soon as one
+is exceeded. It also holds back the first bytes of every file until the
+magic number identified an allowed type, so nothing the client merely
+*called* an image reaches memory or the temp-file handler.
+
+Limits come from ``settings.UPLOAD_LIMITES`` by field name, falling back
+to ``UPLOAD_LIMITE_PADRAO``.
+"""
+import re
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# Bytes needed to recognize every signature below
+TAMANHO_ASSINATURA = 16
+
+
+ASSINATURAS = {
+    'jpeg': lambda inicio: inicio.startswith(b'\xff\xd8\xff'),
+    'png': lambda inicio: inicio.startswith(b'\x89PNG\r\n\x1a\n'),
+    'gif': lambda inicio: inicio[:6] in (b'GIF87a', b'GIF89a'),
+    'webp': lambda inicio: inicio[:4] == b'RIFF' and inicio[8:12] == b'WEBP',
+    'pdf': lambda inicio: inicio.startswith(b'%PDF-'),
+    # XLSX is a zip package; core.importacao rejects any other zip when it opens it
+    'xlsx': lambda inicio: inicio.startswith(b'PK\x03\x04'),
+    # Plain text has no magic number: no control bytes other than tab and line breaks (checked last)
+    'csv': lambda inicio: not any(byte < 0x20 and byte not in b'\t\r\n' for byte in inicio),
+}
+
+
+def identificar_tipo(inicio):
+    """Name of the file type whose magic number ``inicio`` starts with, or None."""
+    for tipo, confere in ASSINATURAS.items():
+        if confere(inicio):
+            return tipo
+    return None
+
+
+def nome_base(campo):
+    """'membros[0][foto_3x4]' and 'membros.0.foto_3x4' both limit as 'foto_3x4'."""
+    return [parte for parte in re.split(r'[\[\].]', campo) if parte][-1]
+
+
+class ArquivoMuitoGrande(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = _('Arquivo muito grande.')
+    default_code = 'arquivo_muito_grande'
+
+
+class TipoDeArquivoNaoPermitido(APIException):
+    status_code = status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    default_detail = _('Tipo de arquivo não permitido.')
+    default_code = 'tipo_nao_permitido'
+
+
+def _megabytes(tamanho):
+    return f'{tamanho / 1024 / 1024:.0f}MB'
+
+
+class LimitesUploadHandler(FileUploadHandler):
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        maximo = settings.UPLOAD_TAMANHO_MAXIMO_REQUISICAO
+        if content_length and content_length > maximo:
+            raise ArquivoMuitoGrande(f'Requisição muito grande. O tamanho máximo é {_megabytes(maximo)}.')
+        return None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.limite = settings.UPLOAD_LIMITES.get(nome_base(field_name), settings.UPLOAD_LIMITE_PADRAO)
+        self.recebido = 0
+        self.inicio = b''
+        self.identificado = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.recebido += len(raw_data)
+        if self.recebido > self.limite['tamanho_maximo']:
+            raise ArquivoMuitoGrande(
+                f'O arquivo de {self.field_name} excede o tamanho máximo de {_megabytes(self.limite["tamanho_maximo"])}.'
+            )
+        if self.identificado:
+            return raw_data
+
+        # Hold the bytes back (returning None) until there are enough to identify the type
+        self.inicio += raw_data
+        if len(self.inicio) < TAMANHO_ASSINATURA:
+            return None
+        self.verificar_tipo()
+        dados, self.inicio = self.inicio, b''
+        return dados
+
+    def file_complete(self, file_size):
+        if not self.identificado:
+            # Shorter than any signature: empty or truncated, and its bytes never went downstream
+            raise TipoDeArquivoNaoPermitido(f'O arquivo de {self.field_name} está vazio ou incompleto.')
+        return None
+
+    def verificar_tipo(self):
+        tipo = identificar_tipo(self.inicio)
+        if tipo not in self.limite['tipos']:
+            raise TipoDeArquivoNaoPermitido(
+                f'Tipo de arquivo não permitido em {self.field_name}. '
+                f'Tipos aceitos: {", ".join(self.limite["tipos"]).upper()}.'
+            )
+        self.identificado = True
@@ -14,11 +14,14 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
+from core.views import MidiaView, metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
     path('api/', include('usuarios.urls')),
     path('api/familias/', include('familias.urls')),
     path('api/membros/', include('membros.urls')),
@@ -26,4 +29,7 @@ urlpatterns = [
     path('api/presencas/', include('presencas.urls')),
     path('api/cestas/', include('cestas.urls')),
     path('api/relatorios/', include('relatorios.urls')),
+    path('api/busca/', include('busca.urls')),
+    path('api/duplicados/', include('duplicados.urls')),
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:caminho>", MidiaView.as_view(), name='midia'),
 ]
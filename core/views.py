@@ -0,0 +1,41 @@
+import os
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils._os import safe_join
+from rest_framework import permissions
+from rest_framework.exceptions import NotFound
+from rest_framework.throttling import ScopedRateThrottle
+from rest_framework.views import APIView
+from core import metrics as registro
+from core.midia import servir
+
+
+def metrics(request):
+    """Prometheus scrape endpoint, restricted to METRICS_ALLOWED_IPS."""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(registro.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class MidiaView(APIView):
+    """
+    Serves MEDIA_ROOT files to authenticated users.
+
+    Conditional requests, byte ranges and X-Sendfile/X-Accel-Redirect
+    offload are handled by core.midia.servir.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    # A list page loads one thumbnail per row; keep that off the API's daily quota
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'midia'
+
+    def get(self, request, caminho):
+        try:
+            absoluto = safe_join(settings.MEDIA_ROOT, caminho)
+        except SuspiciousFileOperation:
+            raise NotFound()
+        if not os.path.isfile(absoluto):
+            raise NotFound()
+        return servir(request, absoluto, caminho)
@@ -0,0 +1,417 @@
+"""
+Duplicate person and family detection.
+
+Comparing every record with every other one is O(n²). Instead each
+record gets a few blocking keys and only records sharing a key are
+compared:
+
+- people: CPF, NIS or RG digits, and the birth date with the phonetic
+  key of the first or the last name (``nasc:2015-01-01:ana``). Without a
+  birth date, the phonetic first and last name together.
+- families: CEP plus house number, phonetic street plus house number, and
+  each responsável's CPF and phone.
+
+A key shared by more than DUPLICADOS_TAMANHO_MAXIMO_BLOCO records (a
+phone typed as 11999999999 everywhere) says nothing and is skipped.
+
+Candidate pairs are scored from 0 to 1: Jaro-Winkler similarity of the
+names, weighed by the documents and birth date they agree or disagree on.
+Pairs at or above DUPLICADOS_LIMIAR are stored as ParDuplicado, and
+``grupos`` joins them into clusters (A~B and B~C put A, B and C together).
+
+``detectar`` rebuilds everything in one pass; ``verificar`` re-checks a
+single record after it was saved, using the stored keys to find its block.
+"""
+import re
+from collections import defaultdict
+from itertools import combinations
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from core.texto import normalizar
+from .models import ChaveDuplicidade, ParDuplicado
+
+PESSOAS = ('responsavel', 'membro', 'membro_familia')
+FAMILIA = 'familia'
+# Particles carry no identity: "Maria da Silva" and "Maria Silva" are the same name
+PARTICULAS = {'da', 'das', 'de', 'do', 'dos', 'e'}
+
+# Portuguese spelling variants that sound alike, applied left to right in a single pass
+REGRAS_FONETICAS = [
+    ('ph', 'f'), ('lh', 'l'), ('nh', 'n'), ('ch', 'x'), ('sh', 'x'), ('th', 't'), ('ct', 't'),
+    ('qu', 'k'), ('gu(?=[ei])', 'g'), ('sc(?=[ei])', 's'), ('c(?=[ei])', 's'), ('g(?=[ei])', 'j'),
+    ('c', 'k'), ('q', 'k'), ('w', 'v'), ('y', 'i'), ('z', 's'), ('h', ''),
+]
+_FONETICA = re.compile('|'.join(f'({padrao})' for padrao, _ in REGRAS_FONETICAS))
+
+
+def digitos(valor):
+    return re.sub(r'\D', '', valor or '')
+
+
+def palavras_nome(nome):
+    return [palavra for palavra in normalizar(nome).split() if palavra not in PARTICULAS]
+
+
+def fonetica(palavra):
+    """'Thaís' and 'Tais', 'Souza' and 'Sousa', 'Raphael' and 'Rafael' share a key."""
+    chave = _FONETICA.sub(lambda m: REGRAS_FONETICAS[m.lastindex - 1][1], normalizar(palavra).replace(' ', ''))
+    return re.sub(r'(.)\1+', r'\1', chave)
+
+
+def jaro_winkler(a, b):
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    janela = max(max(len(a), len(b)) // 2 - 1, 0)
+    usados_b = [False] * len(b)
+    comuns_a = []
+    for i, letra in enumerate(a):
+        for j in range(max(0, i - janela), min(len(b), i + janela + 1)):
+            if not usados_b[j] and b[j] == letra:
+                usados_b[j] = True
+                comuns_a.append(letra)
+                break
+    if not comuns_a:
+        return 0.0
+    comuns_b = [letra for j, letra in enumerate(b) if usados_b[j]]
+    transposicoes = sum(x != y for x, y in zip(comuns_a, comuns_b)) / 2
+    m = len(comuns_a)
+    jaro = (m / len(a) + m / len(b) + (m - transposicoes) / m) / 3
+    prefixo = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefixo += 1
+    return jaro + prefixo * 0.1 * (1 - jaro)
+
+
+def similaridade_nomes(a, b):
+    """Best of the names as written and with their words sorted ("Silva Maria" ~ "Maria Silva")."""
+    palavras_a, palavras_b = palavras_nome(a), palavras_nome(b)
+    if not palavras_a or not palavras_b:
+        return 0.0
+    # "Família 12" and "Família 13" differ in the one word that matters
+    if {palavra for palavra in palavras_a if palavra.isdigit()} != {palavra for palavra in palavras_b if palavra.isdigit()}:
+        return 0.0
+    return max(
+        jaro_winkler(' '.join(palavras_a), ' '.join(palavras_b)),
+        jaro_winkler(' '.join(sorted(palavras_a)), ' '.join(sorted(palavras_b))),
+    )
+
+
+def _pessoa(registro, linha, nome, documentos):
+    return {
+        'registro': registro,
+        'id': linha['id'],
+        'nome': linha[nome],
+        'nascimento': linha.get('data_nascimento'),
+        'familia_id': linha['familia_id'],
+        'documentos': {tipo: digitos(linha.get(tipo)) for tipo in documentos if digitos(linha.get(tipo))},
+    }
+
+
+def carregar(registro, ids=None):
+    """The records of one kind as dicts, optionally only ``ids``."""
+    from familias.models import Familia, Membro as MembroFamilia, Responsavel
+    from membros.models import Membro
+
+    def filtrar(consulta, campo='id'):
+        return consulta.filter(**{f'{campo}__in': ids}) if ids is not None else consulta
+
+    if registro == 'responsavel':
+        linhas = filtrar(Responsavel.objects.values('id', 'familia_id', 'nome_completo', 'data_nascimento', 'cpf'))
+        return [_pessoa(registro, linha, 'nome_completo', ('cpf',)) for linha in linhas.iterator()]
+    if registro == 'membro_familia':
+        linhas = filtrar(MembroFamilia.objects.values('id', 'familia_id', 'nome_completo', 'data_nascimento', 'nis', 'rg'))
+        return [_pessoa(registro, linha, 'nome_completo', ('nis', 'rg')) for linha in linhas.iterator()]
+    if registro == 'membro':
+        linhas = filtrar(Membro.objects.values('id', 'familia_id', 'nome', 'data_nascimento', 'cpf', 'nis', 'rg'))
+        return [_pessoa(registro, linha, 'nome', ('cpf', 'nis', 'rg')) for linha in linhas.iterator()]
+
+    familias = {
+        linha['id']: {
+            'registro': FAMILIA,
+            'id': linha['id'],
+            'nome': linha['nome'] or '',
+            'familia_id': linha['id'],
+            'cep': digitos(linha['cep']),
+            'logradouro': linha['logradouro'] or '',
+            'numero': normalizar(linha['numero']).replace(' ', ''),
+            'complemento': normalizar(linha['complemento']).replace(' ', ''),
+            'cpfs': set(),
+            'telefones': set(),
+        }
+        for linha in filtrar(Familia.objects.values('id', 'nome', 'cep', 'logradouro', 'numero', 'complemento')).iterator()
+    }
+    responsaveis = filtrar(Responsavel.objects.values('familia_id', 'cpf', 'telefone'), 'familia_id')
+    for linha in responsaveis.iterator():
+        familia = familias.get(linha['familia_id'])
+        if familia is None:
+            continue
+        if len(digitos(linha['cpf'])) == 11:
+            familia['cpfs'].add(digitos(linha['cpf']))
+        if len(digitos(linha['telefone'])) >= 8:
+            familia['telefones'].add(digitos(linha['telefone']))
+    return list(familias.values())
+
+
+def chaves(registro):
+    """Blocking keys of a record loaded by ``carregar``."""
+    resultado = set()
+    if registro['registro'] == FAMILIA:
+        if registro['numero']:
+            if len(registro['cep']) == 8:
+                resultado.add(f"end:{registro['cep']}:{registro['numero']}")
+            rua = ''.join(fonetica(palavra) for palavra in palavras_nome(registro['logradouro']))
+            if rua:
+                resultado.add(f"rua:{rua[:80]}:{registro['numero']}")
+        resultado.update(f'cpf:{cpf}' for cpf in registro['cpfs'])
+        resultado.update(f'tel:{telefone}' for telefone in registro['telefones'])
+        return resultado
+
+    for tipo, valor in registro['documentos'].items():
+        if len(valor) >= 5:
+            resultado.add(f'{tipo}:{valor}')
+    palavras = palavras_nome(registro['nome'])
+    if palavras:
+        primeiro, ultimo = fonetica(palavras[0]), fonetica(palavras[-1])
+        if registro['nascimento']:
+            resultado.add(f"nasc:{registro['nascimento']}:{primeiro}")
+            resultado.add(f"nasc:{registro['nascimento']}:{ultimo}")
+        else:
+            resultado.add(f'nome:{primeiro}:{ultimo}')
+    return resultado
+
+
+def _pontuar_pessoas(a, b):
+    motivos = []
+    for tipo in ('cpf', 'nis'):
+        if tipo in a['documentos'] and tipo in b['documentos']:
+            if a['documentos'][tipo] != b['documentos'][tipo]:
+                # Two different CPFs (or NIS) are two people, however alike the names
+                return 0.0, []
+            motivos.append(tipo)
+    if 'rg' in a['documentos'] and a['documentos'].get('rg') == b['documentos'].get('rg'):
+        motivos.append('rg')
+
+    similaridade = similaridade_nomes(a['nome'], b['nome'])
+    if motivos:
+        pontuacao = 0.5 + 0.5 * similaridade
+    elif a['nascimento'] and b['nascimento']:
+        pontuacao = similaridade if a['nascimento'] == b['nascimento'] else similaridade * 0.6
+    else:
+        pontuacao = similaridade * 0.85
+    if a['nascimento'] and a['nascimento'] == b['nascimento']:
+        motivos.append('nascimento')
+    if similaridade >= 0.9:
+        motivos.append('nome')
+    return pontuacao, motivos
+
+
+def _pontuar_familias(a, b):
+    # Independent pieces of evidence, combined as 1 - product of the chances each one is a coincidence
+    evidencias = []
+    if a['cpfs'] & b['cpfs']:
+        evidencias.append(('cpf_responsavel', 0.95))
+    if a['telefones'] & b['telefones']:
+        evidencias.append(('telefone', 0.7))
+    # Same building, different apartment is a neighbour
+    mesmo_complemento = not (a['complemento'] and b['complemento']) or a['complemento'] == b['complemento']
+    if a['numero'] and a['numero'] == b['numero'] and mesmo_complemento and (
+        (a['cep'] and a['cep'] == b['cep'])
+        or similaridade_nomes(a['logradouro'], b['logradouro']) >= 0.9
+    ):
+        evidencias.append(('endereco', 0.7))
+    # "Família" starts most family names and would make any two of them look alike
+    similaridade = similaridade_nomes(
+        re.sub(r'\bfamilia\b', '', normalizar(a['nome'])), re.sub(r'\bfamilia\b', '', normalizar(b['nome']))
+    )
+    if similaridade >= 0.9:
+        evidencias.append(('nome', 0.5 * similaridade))
+
+    acaso = 1.0
+    for _, peso in evidencias:
+        acaso *= 1 - peso
+    return 1 - acaso, [motivo for motivo, _ in evidencias]
+
+
+def pontuar(a, b):
+    """(pontuação from 0 to 1, motivos) for two records of the same kind of entity."""
+    if a['registro'] == FAMILIA:
+        return _pontuar_familias(a, b)
+    return _pontuar_pessoas(a, b)
+
+
+def ordenar_par(a, b):
+    return tuple(sorted([(a['registro'], a['id']), (b['registro'], b['id'])]))
+
+
+def comparar(registros, blocos):
+    """{par ordenado: (pontuação, motivos)} for the candidate pairs inside each block at or above the threshold."""
+    limiar = settings.DUPLICADOS_LIMIAR
+    maximo = settings.DUPLICADOS_TAMANHO_MAXIMO_BLOCO
+    vistos, pares = set(), {}
+    for membros in blocos.values():
+        if len(membros) < 2 or len(membros) > maximo:
+            continue
+        for chave_a, chave_b in combinations(sorted(membros), 2):
+            if (chave_a, chave_b) in vistos:
+                continue
+            vistos.add((chave_a, chave_b))
+            pontuacao, motivos = pontuar(registros[chave_a], registros[chave_b])
+            if pontuacao >= limiar:
+                pares[(chave_a, chave_b)] = (round(pontuacao, 4), motivos)
+    return pares
+
+
+def _tipos(registro):
+    return (FAMILIA,) if registro == FAMILIA else PESSOAS
+
+
+def _salvar_pares(pares, existentes):
+    """Creates new pairs and rescores pending ones; reviewed pairs keep the reviewer's decision."""
+    novos, atualizados = [], []
+    for ((registro_a, id_a), (registro_b, id_b)), (pontuacao, motivos) in pares.items():
+        par = existentes.pop((registro_a, id_a, registro_b, id_b), None)
+        if par is None:
+            novos.append(ParDuplicado(
+                registro_a=registro_a, id_a=id_a, registro_b=registro_b, id_b=id_b,
+                pontuacao=pontuacao, motivos=motivos,
+            ))
+        elif par.situacao == ParDuplicado.PENDENTE and (par.pontuacao, par.motivos) != (pontuacao, motivos):
+            # bulk_update skips auto_now
+            par.pontuacao, par.motivos, par.atualizado_em = pontuacao, motivos, timezone.now()
+            atualizados.append(par)
+    ParDuplicado.objects.bulk_create(novos, batch_size=1000)
+    ParDuplicado.objects.bulk_update(atualizados, ['pontuacao', 'motivos', 'atualizado_em'], batch_size=1000)
+    # Pending pairs that no longer score were fixed in the registry in the meantime
+    obsoletos = [par.pk for par in existentes.values() if par.situacao == ParDuplicado.PENDENTE]
+    for inicio in range(0, len(obsoletos), 1000):
+        ParDuplicado.objects.filter(pk__in=obsoletos[inicio:inicio + 1000]).delete()
+    return len(novos), len(atualizados), len(obsoletos)
+
+
+def detectar(log=None):
+    """Rebuilds the blocking index and the candidate pairs over the whole registry."""
+    registros, blocos, linhas_chave = {}, defaultdict(list), []
+    for registro in (FAMILIA, *PESSOAS):
+        for item in carregar(registro):
+            identificador = (registro, item['id'])
+            registros[identificador] = item
+            for chave in chaves(item):
+                # People of the three models share blocks; families only block with families
+                blocos[chave if registro != FAMILIA else f'familia|{chave}'].append(identificador)
+                linhas_chave.append(ChaveDuplicidade(registro=registro, objeto_id=item['id'], chave=chave))
+        if log:
+            log(f'{registro}: carregado')
+
+    pares = comparar(registros, blocos)
+    with transaction.atomic():
+        ChaveDuplicidade.objects.all().delete()
+        ChaveDuplicidade.objects.bulk_create(linhas_chave, batch_size=2000)
+        existentes = {
+            (par.registro_a, par.id_a, par.registro_b, par.id_b): par
+            for par in ParDuplicado.objects.all().iterator()
+        }
+        novos, atualizados, removidos = _salvar_pares(pares, existentes)
+    return {
+        'registros': len(registros),
+        'chaves': len(linhas_chave),
+        'pares': len(pares),
+        'novos': novos,
+        'atualizados': atualizados,
+        'removidos': removidos,
+    }
+
+
+def _pares_do_registro(registro, objeto_id):
+    return ParDuplicado.objects.filter(registro_a=registro, id_a=objeto_id) | ParDuplicado.objects.filter(
+        registro_b=registro, id_b=objeto_id
+    )
+
+
+def remover(registro, objeto_id):
+    remover_em_lote(registro, [objeto_id])
+
+
+def remover_em_lote(registro, objeto_ids):
+    """Drops the keys and pairs of records deleted in bulk, which send no post_delete."""
+    ChaveDuplicidade.objects.filter(registro=registro, objeto_id__in=objeto_ids).delete()
+    ParDuplicado.objects.filter(
+        Q(registro_a=registro, id_a__in=objeto_ids) | Q(registro_b=registro, id_b__in=objeto_ids)
+    ).delete()
+
+
+@transaction.atomic
+def verificar(registro, objeto_id):
+    """
+    Re-checks one record against the records sharing its blocking keys.
+
+    Returns the pairs at or above the threshold, as ``detectar`` would
+    have found them for this record.
+    """
+    encontrados = carregar(registro, ids=[objeto_id])
+    if not encontrados:
+        remover(registro, objeto_id)
+        return {}
+    item = encontrados[0]
+    minhas_chaves = chaves(item)
+    ChaveDuplicidade.objects.filter(registro=registro, objeto_id=objeto_id).delete()
+    ChaveDuplicidade.objects.bulk_create(
+        ChaveDuplicidade(registro=registro, objeto_id=objeto_id, chave=chave) for chave in minhas_chaves
+    )
+
+    tipos = _tipos(registro)
+    uteis = ChaveDuplicidade.objects.filter(chave__in=minhas_chaves, registro__in=tipos).values('chave').annotate(
+        total=Count('id')
+    ).filter(total__lte=settings.DUPLICADOS_TAMANHO_MAXIMO_BLOCO).values_list('chave', flat=True)
+    candidatos = defaultdict(set)
+    for outro, outro_id in ChaveDuplicidade.objects.filter(chave__in=list(uteis), registro__in=tipos).values_list(
+        'registro', 'objeto_id'
+    ):
+        if (outro, outro_id) != (registro, objeto_id):
+            candidatos[outro].add(outro_id)
+
+    limiar = settings.DUPLICADOS_LIMIAR
+    pares = {}
+    for outro, ids in candidatos.items():
+        for candidato in carregar(outro, ids=list(ids)):
+            pontuacao, motivos = pontuar(item, candidato)
+            if pontuacao >= limiar:
+                pares[ordenar_par(item, candidato)] = (round(pontuacao, 4), motivos)
+
+    existentes = {
+        (par.registro_a, par.id_a, par.registro_b, par.id_b): par
+        for par in _pares_do_registro(registro, objeto_id)
+    }
+    _salvar_pares(pares, existentes)
+    return pares
+
+
+def grupos(pares):
+    """Clusters of records linked by ``pares`` (ParDuplicado rows), largest score first."""
+    pai = {}
+
+    def raiz(no):
+        pai.setdefault(no, no)
+        while pai[no] != no:
+            pai[no] = pai[pai[no]]
+            no = pai[no]
+        return no
+
+    for par in pares:
+        a, b = raiz((par.registro_a, par.id_a)), raiz((par.registro_b, par.id_b))
+        if a != b:
+            pai[b] = a
+
+    agrupados = defaultdict(lambda: {'registros': set(), 'pares': []})
+    for par in pares:
+        grupo = agrupados[raiz((par.registro_a, par.id_a))]
+        grupo['registros'].update({(par.registro_a, par.id_a), (par.registro_b, par.id_b)})
+        grupo['pares'].append(par)
+    return sorted(agrupados.values(), key=lambda grupo: -max(par.pontuacao for par in grupo['pares']))
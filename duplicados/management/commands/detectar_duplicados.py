@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from duplicados.deteccao import detectar, grupos
+from duplicados.models import ParDuplicado
+
+
+class Command(BaseCommand):
+    help = 'Detecta pessoas e famílias cadastradas em duplicidade em todo o cadastro'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listar', action='store_true', help='Lista os grupos pendentes ao final')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        resultado = detectar(log=lambda mensagem: self.stdout.write(f'  {mensagem}'))
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['registros']} registros e {resultado['chaves']} chaves em {time.monotonic() - inicio:.1f}s: "
+            f"{resultado['pares']} pares candidatos ({resultado['novos']} novos, "
+            f"{resultado['atualizados']} atualizados, {resultado['removidos']} removidos)."
+        ))
+
+        if options['listar']:
+            for grupo in grupos(list(ParDuplicado.objects.filter(situacao=ParDuplicado.PENDENTE))):
+                registros = ', '.join(f'{registro}:{objeto_id}' for registro, objeto_id in sorted(grupo['registros']))
+                pontuacao = max(par.pontuacao for par in grupo['pares'])
+                self.stdout.write(f'  {pontuacao:.2f}  {registros}')
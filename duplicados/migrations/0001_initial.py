@@ -0,0 +1,54 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChaveDuplicidade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('registro', models.CharField(choices=[('familia', 'Família'), ('responsavel', 'Responsável'), ('membro', 'Membro'), ('membro_familia', 'Membro da família')], max_length=20, verbose_name='Registro')),
+                ('objeto_id', models.BigIntegerField(verbose_name='ID do objeto')),
+                ('chave', models.CharField(max_length=120, verbose_name='Chave')),
+            ],
+            options={
+                'verbose_name': 'Chave de duplicidade',
+                'verbose_name_plural': 'Chaves de duplicidade',
+                'indexes': [models.Index(fields=['chave'], name='duplicidade_chave_idx'), models.Index(fields=['registro', 'objeto_id'], name='duplicidade_registro_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ParDuplicado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('registro_a', models.CharField(choices=[('familia', 'Família'), ('responsavel', 'Responsável'), ('membro', 'Membro'), ('membro_familia', 'Membro da família')], max_length=20, verbose_name='Registro A')),
+                ('id_a', models.BigIntegerField(verbose_name='ID A')),
+                ('registro_b', models.CharField(choices=[('familia', 'Família'), ('responsavel', 'Responsável'), ('membro', 'Membro'), ('membro_familia', 'Membro da família')], max_length=20, verbose_name='Registro B')),
+                ('id_b', models.BigIntegerField(verbose_name='ID B')),
+                ('pontuacao', models.FloatField(verbose_name='Pontuação')),
+                ('motivos', models.JSONField(default=list, verbose_name='Motivos')),
+                ('situacao', models.CharField(choices=[('pendente', 'Pendente'), ('confirmado', 'Confirmado'), ('descartado', 'Descartado')], default='pendente', max_length=20, verbose_name='Situação')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('revisado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicados_revisados', to=settings.AUTH_USER_MODEL, verbose_name='Revisado por')),
+            ],
+            options={
+                'verbose_name': 'Par duplicado',
+                'verbose_name_plural': 'Pares duplicados',
+                'ordering': ['-pontuacao', 'id'],
+                'indexes': [models.Index(fields=['situacao', '-pontuacao'], name='par_duplicado_situacao_idx'), models.Index(fields=['registro_b', 'id_b'], name='par_duplicado_b_idx')],
+                'constraints': [models.UniqueConstraint(fields=('registro_a', 'id_a', 'registro_b', 'id_b'), name='par_duplicado_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+REGISTRO_CHOICES = [
+    ('familia', _('Família')),
+    ('responsavel', _('Responsável')),
+    ('membro', _('Membro')),
+    ('membro_familia', _('Membro da família')),
+]
+
+
+class ChaveDuplicidade(models.Model):
+    """
+    Blocking index: only records sharing a key are ever compared.
+
+    Keys are a document (``cpf:...``), a phonetic name with the birth date
+    (``nasc:2015-01-01:ana``) or an address (``end:...``); see
+    duplicados.deteccao.chaves.
+    """
+    registro = models.CharField(_('Registro'), max_length=20, choices=REGISTRO_CHOICES)
+    objeto_id = models.BigIntegerField(_('ID do objeto'))
+    chave = models.CharField(_('Chave'), max_length=120)
+
+    class Meta:
+        verbose_name = _('Chave de duplicidade')
+        verbose_name_plural = _('Chaves de duplicidade')
+        indexes = [
+            models.Index(fields=['chave'], name='duplicidade_chave_idx'),
+            models.Index(fields=['registro', 'objeto_id'], name='duplicidade_registro_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.registro}:{self.objeto_id} {self.chave}'
+
+
+class ParDuplicado(models.Model):
+    """Two records that probably are the same person or family, stored as (a, b) with a < b."""
+    PENDENTE = 'pendente'
+    CONFIRMADO = 'confirmado'
+    DESCARTADO = 'descartado'
+    SITUACAO_CHOICES = [
+        (PENDENTE, _('Pendente')),
+        (CONFIRMADO, _('Confirmado')),
+        (DESCARTADO, _('Descartado')),
+    ]
+
+    registro_a = models.CharField(_('Registro A'), max_length=20, choices=REGISTRO_CHOICES)
+    id_a = models.BigIntegerField(_('ID A'))
+    registro_b = models.CharField(_('Registro B'), max_length=20, choices=REGISTRO_CHOICES)
+    id_b = models.BigIntegerField(_('ID B'))
+    pontuacao = models.FloatField(_('Pontuação'))
+    motivos = models.JSONField(_('Motivos'), default=list)
+    situacao = models.CharField(_('Situação'), max_length=20, choices=SITUACAO_CHOICES, default=PENDENTE)
+    revisado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='duplicados_revisados', verbose_name=_('Revisado por')
+    )
+    criado_em = models.DateTimeField(_('Criado em'), auto_now_add=True)
+    atualizado_em = models.DateTimeField(_('Atualizado em'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Par duplicado')
+        verbose_name_plural = _('Pares duplicados')
+        ordering = ['-pontuacao', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['registro_a', 'id_a', 'registro_b', 'id_b'], name='par_duplicado_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['situacao', '-pontuacao'], name='par_duplicado_situacao_idx'),
+            models.Index(fields=['registro_b', 'id_b'], name='par_duplicado_b_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.registro_a}:{self.id_a} ~ {self.registro_b}:{self.id_b} ({self.pontuacao:.2f})'
@@ -0,0 +1,33 @@
+from django.db.models.signals import post_save, post_delete
+from core.tarefas import enfileirar_se_ausente
+from familias.models import Familia, Membro as MembroFamilia, Responsavel
+from membros.models import Membro
+from .deteccao import remover
+
+# Registro de duplicidade de cada modelo verificado
+REGISTROS = {
+    Familia: 'familia',
+    Responsavel: 'responsavel',
+    MembroFamilia: 'membro_familia',
+    Membro: 'membro',
+}
+
+
+def verificar_cadastro(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    enfileirar_se_ausente('duplicados.verificar', registro=REGISTROS[sender], objeto_id=instance.pk)
+    if sender is Responsavel:
+        # The guardians' CPF and phone are blocking keys of their family
+        enfileirar_se_ausente('duplicados.verificar', registro='familia', objeto_id=instance.familia_id)
+
+
+def remover_cadastro(sender, instance, **kwargs):
+    remover(REGISTROS[sender], instance.pk)
+    if sender is Responsavel:
+        enfileirar_se_ausente('duplicados.verificar', registro='familia', objeto_id=instance.familia_id)
+
+
+for modelo in REGISTROS:
+    post_save.connect(verificar_cadastro, sender=modelo, dispatch_uid=f'duplicados_{modelo._meta.label}_save')
+    post_delete.connect(remover_cadastro, sender=modelo, dispatch_uid=f'duplicados_{modelo._meta.label}_delete')
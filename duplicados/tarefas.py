@@ -0,0 +1,14 @@
+"""Incremental duplicate checks, run by ``manage.py processar_tarefas``."""
+from core.tarefas import batimento, tarefa
+from .deteccao import detectar, verificar
+
+
+@tarefa('duplicados.verificar')
+def verificar_registro(registro, objeto_id):
+    verificar(registro, objeto_id)
+
+
+@tarefa('duplicados.detectar')
+def detectar_todos():
+    """Full pass, queued after bulk writes such as a registry import."""
+    detectar(log=lambda mensagem: batimento())
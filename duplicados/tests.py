@@ -0,0 +1,88 @@
+import io
+from datetime import date
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+from core.models import Tarefa
+from core.tarefas import executar, reservar
+from familias.models import Familia, Membro as MembroFamilia, Responsavel
+from membros.models import Membro
+from usuarios.models import Usuario
+from .models import ParDuplicado
+
+
+class DuplicadosTest(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(Usuario.objects.create_user('duplicados@teste.com', 'senha', is_staff=True))
+        self.familia = Familia.objects.create(nome='Família Souza', cep='01001-000', numero='10')
+        self.outra = Familia.objects.create(nome='Família Sousa', cep='01001000', numero='10')
+        self.responsavel = Responsavel.objects.create(
+            familia=self.familia, nome_completo='Maria Souza', cpf='123.456.789-00', telefone='11988887777'
+        )
+        Responsavel.objects.create(familia=self.outra, nome_completo='Maria de Sousa', cpf='12345678900', telefone='11988887777')
+        self.crianca = MembroFamilia.objects.create(
+            familia=self.familia, nome_completo='Thaís Souza', data_nascimento=date(2015, 3, 2), sexo='F'
+        )
+        self.mesma = Membro.objects.create(
+            nome='Tais Sousa', data_nascimento=date(2015, 3, 2), sexo='F', familia=self.outra, grau_parentesco='FILHO'
+        )
+        # Same birth date and surname, different child
+        Membro.objects.create(
+            nome='Pedro Souza', data_nascimento=date(2015, 3, 2), sexo='M', familia=self.familia, grau_parentesco='FILHO'
+        )
+
+    def grupos(self, **params):
+        response = self.client.get('/api/duplicados/duplicados/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [
+            {(registro['registro'], registro['id']) for registro in grupo['registros']}
+            for grupo in response.data['results']
+        ]
+
+    def test_detecta_em_lote(self):
+        call_command('detectar_duplicados', stdout=io.StringIO())
+        self.assertEqual(self.grupos(tipo='familia'), [{('familia', self.familia.id), ('familia', self.outra.id)}])
+        pessoas = self.grupos(tipo='pessoa')
+        self.assertIn({('membro_familia', self.crianca.id), ('membro', self.mesma.id)}, pessoas)
+        self.assertEqual(len(pessoas), 2)  # the child, and Maria registered as responsável twice
+
+    def test_verifica_cada_cadastro(self):
+        while (tarefa := reservar('teste')) is not None:
+            executar(tarefa)
+        self.assertIn({('membro_familia', self.crianca.id), ('membro', self.mesma.id)}, self.grupos(tipo='pessoa'))
+        self.assertEqual(len(self.grupos(tipo='familia')), 1)
+
+        self.mesma.data_nascimento = date(2016, 7, 9)
+        self.mesma.nome = 'Joana Lima'
+        self.mesma.save()
+        while (tarefa := reservar('teste')) is not None:
+            executar(tarefa)
+        self.assertNotIn({('membro_familia', self.crianca.id), ('membro', self.mesma.id)}, self.grupos(tipo='pessoa'))
+
+    def test_par_descartado_nao_volta(self):
+        call_command('detectar_duplicados', stdout=io.StringIO())
+        par = ParDuplicado.objects.get(registro_a='familia')
+        response = self.client.post(f'/api/duplicados/duplicados/{par.id}/revisar/', {'situacao': 'descartado'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+
+        call_command('detectar_duplicados', stdout=io.StringIO())
+        self.assertEqual(self.grupos(tipo='familia'), [])
+        self.assertEqual(ParDuplicado.objects.get(pk=par.pk).situacao, ParDuplicado.DESCARTADO)
+
+    def test_nao_repete_verificacao_pendente(self):
+        Tarefa.objects.all().delete()
+        for nome in ('Tais', 'Taís', 'Thais'):
+            self.mesma.nome = nome
+            self.mesma.save()
+        self.responsavel.telefone = '11900000000'
+        self.responsavel.save()
+        pendentes = Tarefa.objects.filter(nome='duplicados.verificar', status=Tarefa.PENDENTE)
+        self.assertEqual(
+            sorted((tarefa.argumentos['registro'], tarefa.argumentos['objeto_id']) for tarefa in pendentes),
+            sorted([('membro', self.mesma.id), ('responsavel', self.responsavel.id), ('familia', self.familia.id)])
+        )
+
+        # Once the check ran, the next save enqueues a new one
+        while (tarefa := reservar('teste')) is not None:
+            executar(tarefa)
+        self.mesma.save()
+        self.assertEqual(pendentes.all().count(), 1)
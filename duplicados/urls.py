@@ -0,0 +1,10 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import DuplicadoViewSet
+
+router = DefaultRouter()
+router.register(r'duplicados', DuplicadoViewSet, basename='duplicado')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
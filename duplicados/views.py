@@ -0,0 +1,91 @@
+from collections import defaultdict
+from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from core.permissions import IsStaffOrReadOnly
+from .deteccao import FAMILIA, carregar, grupos
+from .models import ParDuplicado
+
+
+class DuplicadoViewSet(viewsets.GenericViewSet):
+    """
+    Candidate duplicate people and families, grouped into clusters.
+
+    ``list`` returns clusters of linked pairs, best score first, filtered
+    by ``tipo`` (pessoa or familia) and ``situacao`` (pendente by default).
+    ``revisar`` records a reviewer's decision on one pair; a discarded pair
+    is never suggested again.
+    """
+    queryset = ParDuplicado.objects.all()
+    permission_classes = [permissions.IsAuthenticated, IsStaffOrReadOnly]
+
+    def list(self, request):
+        situacao = request.query_params.get('situacao', ParDuplicado.PENDENTE)
+        if situacao not in dict(ParDuplicado.SITUACAO_CHOICES):
+            raise ValidationError({'error': f'Situação inválida: {situacao}', 'status_code': 400})
+        pares = self.get_queryset().filter(situacao=situacao)
+        tipo = request.query_params.get('tipo')
+        if tipo == 'familia':
+            pares = pares.filter(registro_a=FAMILIA)
+        elif tipo == 'pessoa':
+            pares = pares.exclude(registro_a=FAMILIA)
+        elif tipo:
+            raise ValidationError({'error': 'tipo deve ser pessoa ou familia', 'status_code': 400})
+
+        pagina = self.paginate_queryset(grupos(list(pares)))
+        return self.get_paginated_response(self.descrever(pagina))
+
+    def descrever(self, pagina):
+        ids = defaultdict(set)
+        for grupo in pagina:
+            for registro, objeto_id in grupo['registros']:
+                ids[registro].add(objeto_id)
+        # One query per kind of record for the whole page
+        registros = {
+            (registro, item['id']): {
+                'registro': registro,
+                'id': item['id'],
+                'nome': item['nome'],
+                'familia_id': item['familia_id'],
+            }
+            for registro, objeto_ids in ids.items()
+            for item in carregar(registro, ids=list(objeto_ids))
+        }
+        return [
+            {
+                'pontuacao': max(par.pontuacao for par in grupo['pares']),
+                'registros': [registros[chave] for chave in sorted(grupo['registros']) if chave in registros],
+                'pares': [
+                    {
+                        'id': par.id,
+                        'a': {'registro': par.registro_a, 'id': par.id_a},
+                        'b': {'registro': par.registro_b, 'id': par.id_b},
+                        'pontuacao': par.pontuacao,
+                        'motivos': par.motivos,
+                        'situacao': par.situacao,
+                    }
+                    for par in grupo['pares']
+                ],
+            }
+            for grupo in pagina
+        ]
+
+    @action(detail=True, methods=['post'])
+    def revisar(self, request, pk=None):
+        """Marks a pair as confirmado, descartado or back to pendente."""
+        par = self.get_object()
+        situacao = request.data.get('situacao')
+        if situacao not in dict(ParDuplicado.SITUACAO_CHOICES):
+            raise ValidationError({
+                'error': 'situacao deve ser pendente, confirmado ou descartado',
+                'status_code': 400,
+            })
+        par.situacao = situacao
+        par.revisado_por = request.user
+        par.save(update_fields=['situacao', 'revisado_por', 'atualizado_em'])
+        return Response({
+            'id': par.id,
+            'situacao': par.situacao,
+            'status_code': 200,
+        })
@@ -0,0 +1,13 @@
+"""Hot família querysets audited by ``manage.py auditar_indices``."""
+from core.auditoria import consulta_quente
+from .models import Familia
+
+
+@consulta_quente('familias.lista')
+def lista():
+    return Familia.objects.order_by('nome')[:10]
+
+
+@consulta_quente('familias.lista_com_entregas')
+def lista_com_entregas():
+    return Familia.objects.com_entregas().order_by('nome')[:10]
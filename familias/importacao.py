@@ -0,0 +1,359 @@
+"""
+Bulk registry import: famílias, responsáveis and membros from one spreadsheet.
+
+Each row is one person, with the columns of its family repeated or filled
+in on any one of the family's rows:
+
+- ``familia``: the family's code in the spreadsheet (natural key, required).
+  It is stored in Familia.chave_importacao, so importing the same file
+  twice finds the families instead of duplicating them.
+- family columns: ``nome_familia``, ``cep``, ``logradouro``, ``numero``,
+  ``complemento``, ``bairro``, ``cidade``, ``estado``,
+  ``recebe_programas_sociais``, ``programas_sociais``, ``observacoes``.
+- ``tipo``: ``responsavel`` or ``membro``.
+- person columns: ``nome``, ``data_nascimento``, ``sexo``, ``cpf``, ``rg``,
+  ``nis``, ``telefone``, ``email``, ``parentesco``.
+
+Rows are read as a stream and handled in batches: validated with the
+models' own field validation, the batch's families resolved with one
+query, and everything written with bulk_create in one transaction per
+batch. A rejected row is reported with its line number and skipped; the
+rest of the file goes on. People already in an existing family (same
+CPF, or same name and birth date) are skipped, so a re-run is harmless.
+
+bulk_create sends no signals, so the search index is filled here and a
+duplicate detection run is queued at the end.
+"""
+import re
+from datetime import date, datetime, timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from busca.indice import indexar_em_lote
+from busca.models import DocumentoBusca
+from core.importacao import ler_planilha
+from core.models import VersaoDados
+from core.tarefas import enfileirar
+from core.texto import normalizar
+from membros.models import Membro
+from .models import Familia, Responsavel
+
+LOTE_LINHAS = 1000
+MAXIMO_ERROS = 500
+
+COLUNAS_FAMILIA = {
+    'nome_familia': 'nome',
+    'cep': 'cep',
+    'logradouro': 'logradouro',
+    'numero': 'numero',
+    'complemento': 'complemento',
+    'bairro': 'bairro',
+    'cidade': 'cidade',
+    'estado': 'estado',
+    'recebe_programas_sociais': 'recebe_programas_sociais',
+    'programas_sociais': 'programas_sociais',
+    'observacoes': 'observacoes',
+}
+# Other names the same columns get in the spreadsheets people actually send
+SINONIMOS = {
+    'codigo_familia': 'familia',
+    'codigo': 'familia',
+    'nome_da_familia': 'nome_familia',
+    'endereco': 'logradouro',
+    'rua': 'logradouro',
+    'uf': 'estado',
+    'nascimento': 'data_nascimento',
+    'data_de_nascimento': 'data_nascimento',
+    'nome_completo': 'nome',
+    'celular': 'telefone',
+    'e_mail': 'email',
+    'grau_parentesco': 'parentesco',
+    'grau_de_parentesco': 'parentesco',
+}
+
+TIPOS = {
+    'responsavel': 'responsavel', 'r': 'responsavel', 'titular': 'responsavel',
+    'membro': 'membro', 'm': 'membro', 'dependente': 'membro',
+}
+SEXOS = {'m': 'M', 'masculino': 'M', 'f': 'F', 'feminino': 'F', 'o': 'O', 'outro': 'O'}
+PARENTESCOS = {
+    'pai': 'PAI', 'mae': 'MAE', 'filho': 'FILHO', 'filha': 'FILHO',
+    'esposo': 'ESPOSO', 'marido': 'ESPOSO', 'esposa': 'ESPOSA', 'mulher': 'ESPOSA',
+}
+VERDADEIRO = {'sim', 's', 'x', 'true', '1', 'yes'}
+FALSO = {'nao', 'n', 'false', '0', 'no', ''}
+# Day 0 of spreadsheet date serial numbers (Excel's 1900 leap year bug included)
+EPOCA_PLANILHA = date(1899, 12, 30)
+
+
+class ErroLinha(Exception):
+    def __init__(self, erros):
+        self.erros = erros
+
+
+def _data(valor):
+    if not valor:
+        return None
+    if re.fullmatch(r'\d{1,5}', valor):
+        return EPOCA_PLANILHA + timedelta(days=int(valor))
+    for formato in ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f'Data inválida: {valor}. Use DD/MM/AAAA.')
+
+
+def _booleano(valor):
+    chave = normalizar(valor)
+    if chave in VERDADEIRO:
+        return True
+    if chave in FALSO:
+        return False
+    raise ValueError(f'Use sim ou não, não "{valor}".')
+
+
+def _escolha(valor, opcoes, padrao=None):
+    if not valor:
+        return padrao
+    chave = normalizar(valor).replace(' ', '_')
+    if chave not in opcoes:
+        raise ValueError(f'Valor inválido: {valor}.')
+    return opcoes[chave]
+
+
+def _cpf(valor):
+    numeros = re.sub(r'\D', '', valor)
+    # A CPF typed as a number in a spreadsheet loses its leading zeros
+    return numeros.zfill(11) if 9 <= len(numeros) < 11 else (numeros or None)
+
+
+def _texto(valor):
+    return valor or None
+
+
+def normalizar_linha(linha):
+    return {SINONIMOS.get(coluna, coluna): valor for coluna, valor in linha.items()}
+
+
+def _converter(conversoes, linha):
+    """{campo: valor convertido}; raises ErroLinha with every problem of the row at once."""
+    valores, erros = {}, {}
+    for coluna, (campo, converter) in conversoes.items():
+        try:
+            valores[campo] = converter(linha.get(coluna, ''))
+        except ValueError as e:
+            erros[coluna] = [str(e)]
+    if erros:
+        raise ErroLinha(erros)
+    return valores
+
+
+def _validar(instancia, excluir=('familia',)):
+    try:
+        instancia.full_clean(exclude=list(excluir), validate_unique=False, validate_constraints=False)
+    except ValidationError as e:
+        raise ErroLinha(e.message_dict)
+    return instancia
+
+
+CONVERSOES_FAMILIA = {
+    coluna: (campo, _booleano if campo == 'recebe_programas_sociais' else _texto)
+    for coluna, campo in COLUNAS_FAMILIA.items()
+}
+
+
+def construir_familia(chave, linhas):
+    """The Familia described by ``linhas``, each column taken from the first row that fills it."""
+    dados = {}
+    for linha in linhas:
+        for coluna in COLUNAS_FAMILIA:
+            if linha.get(coluna) and coluna not in dados:
+                dados[coluna] = linha[coluna]
+    valores = _converter(CONVERSOES_FAMILIA, dados)
+    return _validar(Familia(chave_importacao=chave, **valores), excluir=())
+
+
+def construir_pessoa(linha):
+    tipo = _converter({'tipo': ('tipo', lambda valor: _escolha(valor, TIPOS, 'membro'))}, linha)['tipo']
+    if tipo == 'responsavel':
+        valores = _converter({
+            'nome': ('nome_completo', _texto),
+            'cpf': ('cpf', _cpf),
+            'telefone': ('telefone', lambda valor: valor),
+            'email': ('email', _texto),
+            'sexo': ('sexo', lambda valor: _escolha(valor, SEXOS)),
+            'data_nascimento': ('data_nascimento', _data),
+            'parentesco': ('parentesco', _texto),
+        }, linha)
+        return _validar(Responsavel(**valores))
+    valores = _converter({
+        'nome': ('nome', _texto),
+        'cpf': ('cpf', _cpf),
+        'rg': ('rg', _texto),
+        'nis': ('nis', _texto),
+        'sexo': ('sexo', lambda valor: _escolha(valor, {chave: sexo for chave, sexo in SEXOS.items() if sexo != 'O'})),
+        'data_nascimento': ('data_nascimento', _data),
+        # Avó, tio, enteado...: everything the model has no choice for is OUTRO
+        'parentesco': ('grau_parentesco', lambda valor: PARENTESCOS.get(normalizar(valor), 'OUTRO')),
+    }, linha)
+    return _validar(Membro(**valores))
+
+
+def _identidade(pessoa):
+    """What makes two rows the same person within one family."""
+    cpf = re.sub(r'\D', '', getattr(pessoa, 'cpf', None) or '')
+    if cpf:
+        return 'cpf', cpf
+    nome = getattr(pessoa, 'nome_completo', None) or getattr(pessoa, 'nome', '')
+    return 'nome', normalizar(nome), pessoa.data_nascimento
+
+
+def _identidades_existentes(familia_ids):
+    existentes = {familia_id: set() for familia_id in familia_ids}
+    if not familia_ids:
+        return existentes
+    for modelo in (Responsavel, Membro):
+        for pessoa in modelo.objects.filter(familia_id__in=familia_ids).only(
+            'familia_id', 'cpf', 'data_nascimento', 'nome_completo' if modelo is Responsavel else 'nome'
+        ):
+            existentes[pessoa.familia_id].add(_identidade(pessoa))
+    return existentes
+
+
+class Importador:
+    """
+    Runs one import; ``executar(linhas)`` returns the summary.
+
+    ``progresso(linhas_lidas)`` is called after every batch. With
+    ``simular`` every row is validated and counted but nothing is written.
+    """
+
+    def __init__(self, simular=False, lote=LOTE_LINHAS, progresso=None):
+        self.simular = simular
+        self.lote = lote
+        self.progresso = progresso
+        self.resumo = {
+            'linhas': 0,
+            'familias_criadas': 0,
+            'familias_existentes': 0,
+            'responsaveis': 0,
+            'membros': 0,
+            'pessoas_existentes': 0,
+            'linhas_com_erro': 0,
+        }
+        self.erros = []
+        # Simulated families are rolled back; remember their codes so later batches count them as found
+        self.simuladas = set()
+        self.inicio = timezone.now()
+
+    def erro(self, numero, erros):
+        self.resumo['linhas_com_erro'] += 1
+        if len(self.erros) < MAXIMO_ERROS:
+            self.erros.append({'linha': numero, 'erros': erros})
+
+    def executar(self, linhas):
+        lote = []
+        for numero, linha in linhas:
+            lote.append((numero, normalizar_linha(linha)))
+            if len(lote) >= self.lote:
+                self.processar_lote(lote)
+                lote = []
+        if lote:
+            self.processar_lote(lote)
+        if not self.simular and (self.resumo['familias_criadas'] or self.resumo['responsaveis'] or self.resumo['membros']):
+            self.concluir()
+        return {'resumo': self.resumo, 'erros': self.erros}
+
+    def processar_lote(self, lote):
+        self.resumo['linhas'] += len(lote)
+
+        por_familia = {}
+        for numero, linha in lote:
+            chave = linha.get('familia', '').strip()
+            if not chave:
+                self.erro(numero, {'familia': ['Informe o código da família.']})
+                continue
+            por_familia.setdefault(chave[:100], []).append((numero, linha))
+
+        with transaction.atomic():
+            familias = {
+                familia.chave_importacao: familia
+                for familia in Familia.objects.filter(chave_importacao__in=list(por_familia)).only(
+                    'id', 'nome', 'chave_importacao', 'data_criacao'
+                )
+            }
+            # Families this run created in an earlier batch are not "existing" ones
+            self.resumo['familias_existentes'] += sum(
+                1 for familia in familias.values() if familia.data_criacao < self.inicio
+            )
+            for chave in self.simuladas.intersection(por_familia):
+                familias[chave] = Familia(chave_importacao=chave)
+
+            novas = []
+            for chave, linhas in por_familia.items():
+                if chave in familias:
+                    continue
+                try:
+                    familia = construir_familia(chave, [linha for _, linha in linhas])
+                except ErroLinha as e:
+                    # Without its family no row of it can be written
+                    for numero, _ in linhas:
+                        self.erro(numero, {f'familia.{campo}': mensagens for campo, mensagens in e.erros.items()})
+                    continue
+                novas.append(familia)
+                familias[chave] = familia
+
+            existentes = _identidades_existentes([familia.id for familia in familias.values() if familia.pk])
+            responsaveis, membros = [], []
+            for chave, linhas in por_familia.items():
+                familia = familias.get(chave)
+                if familia is None:
+                    continue
+                vistos = existentes.get(familia.pk, set())
+                for numero, linha in linhas:
+                    try:
+                        pessoa = construir_pessoa(linha)
+                    except ErroLinha as e:
+                        self.erro(numero, e.erros)
+                        continue
+                    identidade = _identidade(pessoa)
+                    if identidade in vistos:
+                        self.resumo['pessoas_existentes'] += 1
+                        continue
+                    vistos.add(identidade)
+                    pessoa.familia = familia
+                    (responsaveis if isinstance(pessoa, Responsavel) else membros).append(pessoa)
+
+            self.resumo['familias_criadas'] += len(novas)
+            self.resumo['responsaveis'] += len(responsaveis)
+            self.resumo['membros'] += len(membros)
+            if self.simular:
+                self.simuladas.update(familia.chave_importacao for familia in novas)
+            else:
+                self.gravar(novas, responsaveis, membros)
+
+        if self.progresso:
+            self.progresso(self.resumo['linhas'])
+
+    def gravar(self, familias, responsaveis, membros):
+        Familia.objects.bulk_create(familias)
+        # bulk_create copies the new family keys into familia_id
+        Responsavel.objects.bulk_create(responsaveis)
+        Membro.objects.bulk_create(membros)
+
+        indexar_em_lote(DocumentoBusca.FAMILIA, familias)
+        indexar_em_lote(DocumentoBusca.RESPONSAVEL, responsaveis)
+        indexar_em_lote(DocumentoBusca.MEMBRO, membros)
+
+    def concluir(self):
+        VersaoDados.incrementar('familias', 'membros')
+        # Imported people were never checked one by one
+        enfileirar('duplicados.detectar')
+
+
+def importar(arquivo, simular=False, lote=LOTE_LINHAS, progresso=None):
+    """Imports an open CSV or XLSX binary file; returns {'resumo': {...}, 'erros': [...]}."""
+    return Importador(simular=simular, lote=lote, progresso=progresso).executar(ler_planilha(arquivo))
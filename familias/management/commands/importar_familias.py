@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importacao import ArquivoInvalido
+from familias.importacao import LOTE_LINHAS, importar
+
+
+class Command(BaseCommand):
+    help = 'Importa famílias, responsáveis e membros de uma planilha CSV ou XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo CSV ou XLSX')
+        parser.add_argument('--simular', action='store_true', help='Valida e conta sem gravar nada')
+        parser.add_argument('--lote', type=int, default=LOTE_LINHAS, help='Linhas por transação')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+
+        def progresso(linhas):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {linhas} linhas')
+
+        try:
+            with open(options['arquivo'], 'rb') as arquivo:
+                resultado = importar(arquivo, simular=options['simular'], lote=options['lote'], progresso=progresso)
+        except (OSError, ArquivoInvalido) as e:
+            raise CommandError(str(e))
+
+        for erro in resultado['erros']:
+            mensagens = '; '.join(f'{campo}: {" ".join(map(str, textos))}' for campo, textos in erro['erros'].items())
+            self.stderr.write(f"  linha {erro['linha']}: {mensagens}")
+        resumo = resultado['resumo']
+        acao = 'Simulação' if options['simular'] else 'Importação'
+        self.stdout.write(self.style.SUCCESS(
+            f"{acao} de {resumo['linhas']} linhas em {time.monotonic() - inicio:.1f}s: "
+            f"{resumo['familias_criadas']} famílias novas, {resumo['familias_existentes']} existentes, "
+            f"{resumo['responsaveis']} responsáveis, {resumo['membros']} membros, "
+            f"{resumo['pessoas_existentes']} pessoas já cadastradas, {resumo['linhas_com_erro']} linhas com erro."
+        ))
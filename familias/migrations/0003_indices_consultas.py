@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('familias', '0002_remove_membro_cpf_remove_membro_parentesco'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='familia',
+            index=models.Index(fields=['nome'], name='familia_nome_idx'),
+        ),
+    ]
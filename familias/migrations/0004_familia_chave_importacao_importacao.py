@@ -0,0 +1,42 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('familias', '0003_indices_consultas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='familia',
+            name='chave_importacao',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True, unique=True, verbose_name='chave de importação'),
+        ),
+        migrations.CreateModel(
+            name='Importacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('arquivo', models.FileField(upload_to='importacoes/', verbose_name='arquivo')),
+                ('simular', models.BooleanField(default=False, verbose_name='simular')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSANDO', 'Processando'), ('CONCLUIDO', 'Concluído'), ('ERRO', 'Erro')], default='PENDENTE', max_length=20, verbose_name='status')),
+                ('linhas', models.PositiveIntegerField(default=0, verbose_name='linhas processadas')),
+                ('resumo', models.JSONField(blank=True, default=dict, verbose_name='resumo')),
+                ('erros', models.JSONField(blank=True, default=list, verbose_name='erros por linha')),
+                ('erro', models.TextField(blank=True, null=True, verbose_name='erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='importacoes', to=settings.AUTH_USER_MODEL, verbose_name='usuário')),
+            ],
+            options={
+                'verbose_name': 'importação',
+                'verbose_name_plural': 'importações',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
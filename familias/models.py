@@ -1,8 +1,27 @@
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.core.validators import MinLengthValidator
 from django.utils.translation import gettext_lazy as _
 
 
+class FamiliaQuerySet(models.QuerySet):
+    def com_entregas(self):
+        """
+        Annotates total_entregas and ultima_entrega on each family.
+
+        Correlated subqueries over the (familia, data_entrega) unique index,
+        so only the rows actually fetched pay for them.
+        """
+        from cestas.models import EntregaDeCesta
+
+        entregas = EntregaDeCesta.objects.filter(familia=models.OuterRef('pk')).order_by().values('familia')
+        return self.annotate(
+            total_entregas=Coalesce(models.Subquery(entregas.annotate(total=models.Count('id')).values('total')), 0),
+            ultima_entrega=models.Subquery(entregas.annotate(ultima=models.Max('data_entrega')).values('ultima')),
+        )
+
+
 class Familia(models.Model):
     nome = models.CharField(max_length=200, blank=True, null=True, verbose_name=_('nome da família'))
     
@@ -24,11 +43,20 @@ class Familia(models.Model):
     data_criacao = models.DateTimeField(auto_now_add=True)
     data_atualizacao = models.DateTimeField(auto_now=True)
     ativo = models.BooleanField(default=True, verbose_name=_('ativo'))
+    # Code of the family in the spreadsheet it was imported from; importing the file again finds it
+    chave_importacao = models.CharField(
+        max_length=100, unique=True, blank=True, null=True, editable=False, verbose_name=_('chave de importação')
+    )
+
+    objects = FamiliaQuerySet.as_manager()
 
     class Meta:
         verbose_name = _('família')
         verbose_name_plural = _('famílias')
         ordering = ['nome']
+        indexes = [
+            models.Index(fields=['nome'], name='familia_nome_idx'),
+        ]
 
     def __str__(self):
         return self.nome or f'Família #{self.id}'
@@ -124,3 +152,44 @@ class Membro(models.Model):
     def __str__(self):
         return self.nome_completo
 
+
+
+class Importacao(models.Model):
+    """
+    A CSV or XLSX registry file imported in the background by the familias.importar task.
+
+    ``resumo`` counts what was (or, with ``simular``, would be) created;
+    ``erros`` lists the first rejected rows as {linha, erros}.
+    """
+    STATUS_CHOICES = [
+        ('PENDENTE', _('Pendente')),
+        ('PROCESSANDO', _('Processando')),
+        ('CONCLUIDO', _('Concluído')),
+        ('ERRO', _('Erro')),
+    ]
+
+    arquivo = models.FileField(upload_to='importacoes/', verbose_name=_('arquivo'))
+    simular = models.BooleanField(default=False, verbose_name=_('simular'))
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDENTE', verbose_name=_('status'))
+    linhas = models.PositiveIntegerField(default=0, verbose_name=_('linhas processadas'))
+    resumo = models.JSONField(default=dict, blank=True, verbose_name=_('resumo'))
+    erros = models.JSONField(default=list, blank=True, verbose_name=_('erros por linha'))
+    erro = models.TextField(blank=True, null=True, verbose_name=_('erro'))
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='importacoes',
+        verbose_name=_('usuário')
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('importação')
+        verbose_name_plural = _('importações')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'Importação #{self.pk} ({self.get_status_display()})'
@@ -1,29 +1,216 @@
+from django.db.models import Count, Max
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Familia
+from .models import Familia, Importacao, Responsavel
+from busca.indice import indexar_em_lote, remover_em_lote as remover_do_indice
+from busca.models import DocumentoBusca
+from core.models import VersaoDados
+from core.serializers import CamposDinamicosMixin
+from core.tarefas import enfileirar_em_lote
+from duplicados.deteccao import remover_em_lote as remover_duplicidades
 from membros.models import Membro
 from membros.serializers import MembroSerializer
+from presencas.models import FrequenciaMensal, Presenca
 
-class FamiliaSerializer(serializers.ModelSerializer):
-    membros = MembroSerializer(many=True, read_only=True)
+
+class ResponsavelSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Responsavel
+        fields = [
+            'id',
+            'nome_completo',
+            'cpf',
+            'telefone',
+            'email',
+            'sexo',
+            'data_nascimento',
+            'parentesco',
+            'ativo'
+        ]
+        read_only_fields = ['id']
+
+
+class MembroAninhadoSerializer(MembroSerializer):
+    """
+    A member written inside its family's payload.
+
+    The family comes from the parent and ``id`` picks the member to update;
+    items without it are new members. Documents are uploaded through
+    /api/membros/, since a JSON payload cannot carry them.
+    """
+    id = serializers.IntegerField(required=False)
+
+    class Meta(MembroSerializer.Meta):
+        read_only_fields = ['familia', 'declaracao_matricula', 'foto_3x4', 'created_at', 'updated_at']
+
+
+class FamiliaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    membros = MembroAninhadoSerializer(source='membros_membros', many=True, required=False)
+    responsaveis = ResponsavelSerializer(many=True, read_only=True)
+    total_entregas = serializers.SerializerMethodField()
+    ultima_entrega = serializers.SerializerMethodField()
+    created_at = serializers.DateTimeField(source='data_criacao', read_only=True)
+    updated_at = serializers.DateTimeField(source='data_atualizacao', read_only=True)
+    expansiveis = {'membros': None, 'responsaveis': None}
 
     class Meta:
         model = Familia
         fields = [
             'id',
             'nome',
-            'endereco',
+            'logradouro',
             'numero',
             'complemento',
             'bairro',
             'cidade',
             'estado',
             'cep',
-            'telefone',
-            'email',
+            'recebe_programas_sociais',
             'programas_sociais',
+            'observacoes',
+            'responsaveis',
             'membros',
+            'total_entregas',
+            'ultima_entrega',
             'ativo',
             'created_at',
             'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+
+    def validate_membros(self, membros):
+        existentes = set(self.instance.membros_membros.values_list('id', flat=True)) if self.instance else set()
+        obrigatorios = [
+            nome for nome, campo in MembroAninhadoSerializer().fields.items()
+            if campo.required and not campo.read_only
+        ]
+        erros, ids = [], set()
+        for dados in membros:
+            erro = {}
+            membro_id = dados.get('id')
+            if membro_id is not None:
+                if membro_id not in existentes:
+                    erro['id'] = ['Membro não pertence a esta família.']
+                elif membro_id in ids:
+                    erro['id'] = ['Membro repetido.']
+                ids.add(membro_id)
+            else:
+                # A PATCH relaxes the required fields, but a new member still needs them
+                for nome in obrigatorios:
+                    if nome not in dados:
+                        erro[nome] = ['Este campo é obrigatório.']
+            erros.append(erro)
+        if any(erros):
+            raise serializers.ValidationError(erros)
+        return membros
+
+    def create(self, validated_data):
+        membros = validated_data.pop('membros_membros', [])
+        familia = super().create(validated_data)
+        self._gravar_membros(familia, membros, existentes={})
+        return familia
+
+    def update(self, instance, validated_data):
+        membros = validated_data.pop('membros_membros', None)
+        familia = super().update(instance, validated_data)
+        # Without the key (a PATCH of the address, say) the members stay as they are
+        if membros is not None:
+            self._gravar_membros(familia, membros, {membro.id: membro for membro in familia.membros_membros.all()})
+        return familia
+
+    def _gravar_membros(self, familia, membros, existentes):
+        """
+        Applies the payload's member list as a diff against ``existentes``:
+        one INSERT for the new members, one UPDATE for the changed ones and
+        one DELETE for those the payload left out, whatever the size of the
+        household. The caller holds the transaction, so an error in any step
+        leaves the family as it was.
+
+        The bulk operations send no signals; the search index, the duplicate
+        checks and the report versions are updated here instead.
+        """
+        novos, alterados, campos = [], [], {'updated_at'}
+        agora = timezone.now()
+        for dados in membros:
+            dados = dict(dados)
+            membro_id = dados.pop('id', None)
+            if membro_id is None:
+                novos.append(Membro(familia=familia, **dados))
+                continue
+            membro = existentes.pop(membro_id)
+            for campo, valor in dados.items():
+                setattr(membro, campo, valor)
+            membro.updated_at = agora
+            campos.update(dados)
+            alterados.append(membro)
+
+        if existentes:
+            self._remover_membros(list(existentes))
+        Membro.objects.bulk_create(novos)
+        if alterados:
+            Membro.objects.bulk_update(alterados, sorted(campos))
+
+        gravados = novos + alterados
+        if gravados:
+            indexar_em_lote(DocumentoBusca.MEMBRO, gravados)
+            enfileirar_em_lote(
+                'duplicados.verificar', [{'registro': 'membro', 'objeto_id': membro.pk} for membro in gravados]
+            )
+        if gravados or existentes:
+            VersaoDados.incrementar('membros')
+
+    def _remover_membros(self, ids):
+        """
+        Deletes the members and their attendance in one DELETE per table.
+
+        A queryset delete() would send post_delete for each member and each
+        of their presences, each one updating the search index, the
+        duplicate keys, the report versions and the monthly rollup. The
+        rollup rows go with the member, so only the other three remain to be
+        done, once for the whole batch.
+        """
+        presencas = Presenca.objects.filter(membro_id__in=ids)._raw_delete(Presenca.objects.db)
+        FrequenciaMensal.objects.filter(membro_id__in=ids)._raw_delete(FrequenciaMensal.objects.db)
+        Membro.objects.filter(pk__in=ids)._raw_delete(Membro.objects.db)
+        remover_do_indice(DocumentoBusca.MEMBRO, ids)
+        remover_duplicidades('membro', ids)
+        if presencas:
+            VersaoDados.incrementar('presencas')
+
+    def _entregas(self, obj):
+        # Querysets rendered here come from Familia.objects.com_entregas(); a
+        # family just written (create/update responses) is counted on its own
+        if not hasattr(obj, 'total_entregas'):
+            totais = obj.entregas_de_cesta.aggregate(total=Count('id'), ultima=Max('data_entrega'))
+            obj.total_entregas, obj.ultima_entrega = totais['total'], totais['ultima']
+        return obj
+
+    def get_total_entregas(self, obj):
+        return self._entregas(obj).total_entregas
+
+    def get_ultima_entrega(self, obj):
+        return self._entregas(obj).ultima_entrega
+
+
+class ImportacaoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Importacao
+        fields = [
+            'id',
+            'arquivo',
+            'simular',
+            'status',
+            'linhas',
+            'resumo',
+            'erros',
+            'erro',
+            'created_at',
+            'updated_at'
+        ]
+        read_only_fields = ['id', 'status', 'linhas', 'resumo', 'erros', 'erro', 'created_at', 'updated_at']
+
+    def validate_arquivo(self, arquivo):
+        # The upload handler already checked the content; the name only has to agree with it
+        if not arquivo.name.lower().endswith(('.csv', '.xlsx')):
+            raise serializers.ValidationError('Envie um arquivo .csv ou .xlsx.')
+        return arquivo
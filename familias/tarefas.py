@@ -0,0 +1,37 @@
+"""Background registry imports, run by ``manage.py processar_tarefas``."""
+from django.utils import timezone
+
+from core.importacao import ArquivoInvalido
+from core.tarefas import batimento, tarefa
+from .importacao import importar
+from .models import Importacao
+
+
+def marcar_erro(erro, importacao_id):
+    # updated_at is set by hand: queryset updates skip auto_now, and incremental backups rely on it
+    Importacao.objects.filter(pk=importacao_id).update(status='ERRO', erro=erro, updated_at=timezone.now())
+
+
+@tarefa('familias.importar', ao_falhar=marcar_erro)
+def importar_arquivo(importacao_id):
+    importacao = Importacao.objects.get(pk=importacao_id)
+    Importacao.objects.filter(pk=importacao_id).update(status='PROCESSANDO', linhas=0, updated_at=timezone.now())
+
+    def progresso(linhas):
+        Importacao.objects.filter(pk=importacao_id).update(linhas=linhas, updated_at=timezone.now())
+        batimento()
+
+    try:
+        with importacao.arquivo.open('rb') as arquivo:
+            resultado = importar(arquivo, simular=importacao.simular, progresso=progresso)
+    except ArquivoInvalido as e:
+        # Retrying cannot fix the file
+        marcar_erro(str(e), importacao_id)
+        return
+
+    importacao.status = 'CONCLUIDO'
+    importacao.linhas = resultado['resumo']['linhas']
+    importacao.resumo = resultado['resumo']
+    importacao.erros = resultado['erros']
+    importacao.erro = None
+    importacao.save(update_fields=['status', 'linhas', 'resumo', 'erros', 'erro', 'updated_at'])
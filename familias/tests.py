@@ -1,3 +1,239 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import date
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from busca.models import DocumentoBusca
+from cestas.models import EntregaDeCesta
+from core.models import Tarefa
+from core.tarefas import executar, reservar
+from core.testing import QueryCountTestCase
+from duplicados.deteccao import verificar
+from duplicados.models import ChaveDuplicidade
+from membros.models import Membro
+from presencas.models import FrequenciaMensal, Presenca
+from usuarios.models import Usuario
+from .models import Familia, Responsavel
 
-# Create your tests here.
+
+class FamiliaQueryCountTest(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.familia = Familia.objects.create(nome='Família Detalhe')
+
+    def criar_membros(self, familia, quantidade):
+        for i in range(quantidade):
+            Membro.objects.create(
+                nome=f'Membro {i}', data_nascimento=date(2015, 1, 1), sexo='M',
+                familia=familia, grau_parentesco='FILHO'
+            )
+            Responsavel.objects.create(familia=familia, nome_completo=f'Responsável {i}', telefone='11999999999')
+
+    def criar_familias(self, quantidade):
+        for _ in range(quantidade):
+            self.criar_membros(Familia.objects.create(nome='Família Teste'), quantidade)
+
+    def test_list(self):
+        self.assertConstantQueries('/api/familias/familias/', self.criar_familias)
+
+    def test_retrieve(self):
+        self.assertConstantQueries(
+            f'/api/familias/familias/{self.familia.id}/',
+            lambda quantidade: self.criar_membros(self.familia, quantidade)
+        )
+
+    def test_entregas_por_linha(self):
+        outra = Familia.objects.create(nome='Família Sem Entregas')
+        EntregaDeCesta.objects.create(familia=self.familia, data_entrega=date(2026, 1, 10))
+        EntregaDeCesta.objects.create(familia=self.familia, data_entrega=date(2026, 2, 10))
+        response = self.client.get('/api/familias/familias/')
+        familias = {familia['id']: familia for familia in response.data['results']}
+        self.assertEqual(familias[self.familia.id]['total_entregas'], 2)
+        self.assertEqual(familias[self.familia.id]['ultima_entrega'], date(2026, 2, 10))
+        self.assertEqual(familias[outra.id]['total_entregas'], 0)
+        self.assertIsNone(familias[outra.id]['ultima_entrega'])
+        response = self.client.patch(f'/api/familias/familias/{self.familia.id}/', {'bairro': 'Centro'}, format='json')
+        self.assertEqual(response.data['total_entregas'], 2)
+
+    def membros_payload(self, quantidade, ids=()):
+        membros = [{'id': membro_id, 'nome': f'Alterado {membro_id}'} for membro_id in ids]
+        return membros + [
+            {'nome': f'Novo {i}', 'data_nascimento': '2015-01-01', 'sexo': 'F', 'grau_parentesco': 'FILHO'}
+            for i in range(quantidade)
+        ]
+
+    def test_create_com_membros(self):
+        # The first write also creates the report version rows
+        self.client.post(
+            '/api/familias/familias/', {'nome': 'Família Inicial', 'membros': self.membros_payload(1)}, format='json'
+        )
+        contagens = {
+            quantidade: self.contar_consultas(
+                '/api/familias/familias/', 'post',
+                {'nome': 'Família Nova', 'membros': self.membros_payload(quantidade)}
+            )
+            for quantidade in self.quantidades
+        }
+        self.assertEqual(len(set(contagens.values())), 1, f'create grows with the household: {contagens}')
+
+    def test_update_com_membros(self):
+        url = f'/api/familias/familias/{self.familia.id}/'
+        contagens = {}
+        for quantidade in self.quantidades:
+            self.criar_membros(self.familia, 2 * quantidade)
+            ids = list(self.familia.membros_membros.values_list('id', flat=True))
+            for membro_id in ids:
+                Presenca.objects.get_or_create(membro_id=membro_id, data=date(2026, 3, 2))
+            # Removes as many members as it keeps and changes, and adds as many new ones
+            contagens[quantidade] = self.contar_consultas(
+                url, 'put', {'membros': self.membros_payload(quantidade, ids[quantidade:])}
+            )
+        self.assertEqual(len(set(contagens.values())), 1, f'update grows with the household: {contagens}')
+
+
+class EscritaAninhadaTest(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(Usuario.objects.create_user('aninhada@teste.com', 'senha'))
+        self.familia = Familia.objects.create(nome='Família Silva')
+        self.mantido = Membro.objects.create(
+            nome='Ana Silva', data_nascimento=date(2015, 1, 1), sexo='F', familia=self.familia, grau_parentesco='FILHO'
+        )
+        self.removido = Membro.objects.create(
+            nome='Rui Silva', data_nascimento=date(2012, 1, 1), sexo='M', familia=self.familia, grau_parentesco='FILHO'
+        )
+        self.url = f'/api/familias/familias/{self.familia.id}/'
+
+    def test_aplica_diferenca(self):
+        response = self.client.put(self.url, {'membros': [
+            {'id': self.mantido.id, 'nome': 'Ana Silva Souza'},
+            {'nome': 'Bia Silva', 'data_nascimento': '2019-05-01', 'sexo': 'F', 'grau_parentesco': 'FILHO'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([membro['nome'] for membro in response.data['membros']], ['Ana Silva Souza', 'Bia Silva'])
+        self.assertFalse(Membro.objects.filter(pk=self.removido.id).exists())
+        self.assertEqual(
+            set(DocumentoBusca.objects.filter(tipo=DocumentoBusca.MEMBRO).values_list('titulo', flat=True)),
+            {'Ana Silva Souza', 'Bia Silva'}
+        )
+
+    def test_remove_presencas_e_duplicidades(self):
+        Presenca.objects.create(membro=self.removido, data=date(2026, 3, 2))
+        self.assertTrue(FrequenciaMensal.objects.filter(membro=self.removido).exists())
+        verificar('membro', self.removido.id)
+        self.assertTrue(ChaveDuplicidade.objects.filter(registro='membro', objeto_id=self.removido.id).exists())
+
+        response = self.client.put(self.url, {'membros': [{'id': self.mantido.id}]}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertFalse(Presenca.objects.filter(membro_id=self.removido.id).exists())
+        self.assertFalse(FrequenciaMensal.objects.filter(membro_id=self.removido.id).exists())
+        self.assertFalse(ChaveDuplicidade.objects.filter(registro='membro', objeto_id=self.removido.id).exists())
+        self.assertFalse(DocumentoBusca.objects.filter(tipo=DocumentoBusca.MEMBRO, objeto_id=self.removido.id).exists())
+
+    def test_sem_membros_nao_altera(self):
+        response = self.client.patch(self.url, {'bairro': 'Centro'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.familia.membros_membros.count(), 2)
+
+    def test_erro_desfaz_tudo(self):
+        response = self.client.put(self.url, {'nome': 'Outro Nome', 'membros': [
+            {'id': self.mantido.id, 'nome': 'Ana Alterada'},
+            {'nome': 'Sem Dados'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('data_nascimento', response.data['membros'][1])
+        self.familia.refresh_from_db()
+        self.assertEqual(self.familia.nome, 'Família Silva')
+        self.assertEqual(self.familia.membros_membros.count(), 2)
+        self.assertTrue(Membro.objects.filter(nome='Ana Silva').exists())
+
+    def test_membro_de_outra_familia(self):
+        outro = Membro.objects.create(
+            nome='Caio Lima', data_nascimento=date(2010, 1, 1), sexo='M',
+            familia=Familia.objects.create(nome='Família Lima'), grau_parentesco='FILHO'
+        )
+        response = self.client.put(self.url, {'membros': [{'id': outro.id, 'nome': 'Caio Silva'}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('id', response.data['membros'][0])
+        outro.refresh_from_db()
+        self.assertEqual(outro.nome, 'Caio Lima')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='importacao_teste_'))
+class ImportacaoTest(APITestCase):
+    CABECALHO = ['Família', 'Nome da família', 'CEP', 'Número', 'Tipo', 'Nome', 'Data de nascimento', 'Sexo', 'CPF', 'Telefone', 'Parentesco']
+    LINHAS = [
+        ['F1', 'Família Lima', '01001-000', '10', 'responsável', 'Carla Lima', '02/05/1985', 'F', '111.222.333-44', '11988887777', 'mãe'],
+        ['F1', '', '', '', 'membro', 'Davi Lima', '10/01/2016', 'M', '', '', 'filho'],
+        ['F2', 'Família Rocha', '', '', 'responsavel', 'Rui Rocha', '', 'M', '', '', ''],
+        ['F2', '', '', '', 'membro', 'Bia Rocha', '31/02/2017', 'F', '', '', 'filha'],
+        ['', '', '', '', 'membro', 'Sem Família', '01/01/2015', 'F', '', '', ''],
+    ]
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def csv(self):
+        return ''.join(
+            ';'.join(valores) + '\r\n' for valores in [self.CABECALHO, *self.LINHAS]
+        ).encode('cp1252')
+
+    def importar(self, conteudo, simular=False):
+        with tempfile.NamedTemporaryFile(suffix='.csv') as arquivo:
+            arquivo.write(conteudo)
+            arquivo.flush()
+            saida, erros = io.StringIO(), io.StringIO()
+            call_command('importar_familias', arquivo.name, simular=simular, stdout=saida, stderr=erros)
+        return saida.getvalue(), erros.getvalue()
+
+    def test_importa_csv_e_reporta_linhas_com_erro(self):
+        saida, erros = self.importar(self.csv())
+        self.assertIn('2 famílias novas', saida)
+        self.assertIn('linha 5: data_nascimento', erros)  # 31/02 does not exist
+        self.assertIn('linha 6: familia', erros)
+        # Rui has no phone, which responsáveis require
+        self.assertIn('linha 4: telefone', erros)
+
+        familia = Familia.objects.get(chave_importacao='F1')
+        self.assertEqual((familia.nome, familia.cep, familia.numero), ('Família Lima', '01001-000', '10'))
+        self.assertEqual(familia.responsaveis.get().cpf, '11122233344')
+        self.assertEqual(familia.membros_membros.get().grau_parentesco, 'FILHO')
+        self.assertEqual(Membro.objects.count(), 1)
+        self.assertTrue(DocumentoBusca.objects.filter(tipo='membro', titulo='Davi Lima').exists())
+
+        # A second run finds the families and people it already created
+        saida, _ = self.importar(self.csv())
+        self.assertIn('0 famílias novas, 2 existentes', saida)
+        self.assertIn('2 pessoas já cadastradas', saida)
+        self.assertEqual(Familia.objects.count(), 2)
+
+    def test_simular_nao_grava(self):
+        saida, _ = self.importar(self.csv(), simular=True)
+        self.assertIn('Simulação de 5 linhas', saida)
+        self.assertIn('2 famílias novas', saida)
+        self.assertFalse(Familia.objects.exists())
+
+    def test_upload_xlsx_pela_api(self):
+        from core.exportacao import gerar_xlsx
+        self.client.force_authenticate(Usuario.objects.create_user('importacao@teste.com', 'senha', is_staff=True))
+        conteudo = b''.join(gerar_xlsx(self.CABECALHO, self.LINHAS[:2]))
+        arquivo = SimpleUploadedFile('cadastro.xlsx', conteudo)
+
+        response = self.client.post('/api/familias/importacoes/', {'arquivo': arquivo}, format='multipart')
+        self.assertEqual(response.status_code, 202, response.data)
+        executar(reservar('teste', nomes=['familias.importar']))
+
+        response = self.client.get(f"/api/familias/importacoes/{response.data['id']}/")
+        self.assertEqual(response.data['status'], 'CONCLUIDO', response.data)
+        self.assertEqual(response.data['resumo']['familias_criadas'], 1)
+        self.assertEqual(response.data['resumo']['membros'], 1)
+        self.assertTrue(Tarefa.objects.filter(nome='duplicados.detectar').exists())
+
+    def test_upload_recusa_binario(self):
+        self.client.force_authenticate(Usuario.objects.create_user('importacao@teste.com', 'senha', is_staff=True))
+        arquivo = SimpleUploadedFile('cadastro.csv', b'\x00\x01\x02' * 20)
+        response = self.client.post('/api/familias/importacoes/', {'arquivo': arquivo}, format='multipart')
+        self.assertEqual(response.status_code, 415)
@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import FamiliaViewSet
+from .views import FamiliaViewSet, ImportacaoViewSet
 
 router = DefaultRouter()
 router.register(r'familias', FamiliaViewSet, basename='familia')
+router.register(r'importacoes', ImportacaoViewSet, basename='importacao')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,68 +1,88 @@
-from rest_framework import viewsets, permissions, status
+from django.db import transaction
+from rest_framework import mixins, viewsets, permissions, status
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-from .models import Familia
-from .serializers import FamiliaSerializer
-from membros.models import Membro
-from membros.serializers import MembroSerializer
+from .models import Familia, Importacao
+from .serializers import FamiliaSerializer, ImportacaoSerializer
+from core.mixins import EagerLoadingMixin, ExportacaoMixin
+from core.permissions import IsStaffOrReadOnly
+from core.tarefas import enfileirar
 
-class FamiliaViewSet(viewsets.ModelViewSet):
+class FamiliaViewSet(ExportacaoMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Familia.objects.all()
     serializer_class = FamiliaSerializer
     permission_classes = [permissions.IsAuthenticated]
+    eager_loading = {
+        'membros': ('membros_membros',),
+        'responsaveis': ('responsaveis',),
+        'total_entregas': (),
+        'ultima_entrega': (),
+    }
+    eager_loading_actions = {
+        'destroy': (),
+    }
+    exportacao_nome = 'familias'
+    exportacao_campos = (
+        ('ID', 'id'),
+        ('Nome', 'nome'),
+        ('CEP', 'cep'),
+        ('Logradouro', 'logradouro'),
+        ('Número', 'numero'),
+        ('Complemento', 'complemento'),
+        ('Bairro', 'bairro'),
+        ('Cidade', 'cidade'),
+        ('Estado', 'estado'),
+        ('Recebe programas sociais', 'recebe_programas_sociais'),
+        ('Programas sociais', 'programas_sociais'),
+        ('Ativo', 'ativo'),
+    )
 
-    def create(self, request, *args, **kwargs):
-        membros_data = request.data.pop('membros', [])
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        familia = serializer.save()
-        
-        # Create membros for the familia
-        for membro_data in membros_data:
-            membro_data['familia'] = familia.id
-            membro_serializer = MembroSerializer(data=membro_data)
-            if membro_serializer.is_valid():
-                membro_serializer.save()
-            else:
-                return Response(membro_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Delivery totals only for the families on this page, when they are rendered
+        if {'total_entregas', 'ultima_entrega'}.intersection(self.get_eager_loading_fields()):
+            queryset = queryset.com_entregas()
+        return queryset
 
     def update(self, request, *args, **kwargs):
-        instance = self.get_object()
-        membros_data = request.data.pop('membros', [])
-        
-        # Update existing membros
-        for membro_data in membros_data:
-            membro_id = membro_data.get('id')
-            if membro_id:
-                try:
-                    membro = Membro.objects.get(id=membro_id, familia=instance)
-                    membro_serializer = MembroSerializer(membro, data=membro_data)
-                    if membro_serializer.is_valid():
-                        membro_serializer.save()
-                    else:
-                        return Response(membro_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-                except Membro.DoesNotExist:
-                    continue
-            else:
-                membro_data['familia'] = instance.id
-                membro_serializer = MembroSerializer(data=membro_data)
-                if membro_serializer.is_valid():
-                    membro_serializer.save()
-                else:
-                    return Response(membro_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        
-        serializer = self.get_serializer(instance, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
-        return Response(serializer.data)
+        # PUT has always been a partial update here; clients send only what changed
+        kwargs['partial'] = True
+        return super().update(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        # The family and its members are written together or not at all
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
 
     def retrieve(self, request, *args, **kwargs):
+        # membros are prefetched by get_queryset and rendered by the serializer
         instance = self.get_object()
         serializer = self.get_serializer(instance)
-        membros = Membro.objects.filter(familia=instance)
-        membro_serializer = MembroSerializer(membros, many=True)
-        
-        response_data = serializer.data
-        response_data['membros'] = membro_serializer.data
-        return Response(response_data)
+        return Response(serializer.data)
+
+
+class ImportacaoViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                        viewsets.GenericViewSet):
+    """
+    Bulk registry imports from CSV or XLSX (see familias.importacao for the columns).
+
+    POST a multipart ``arquivo`` (and ``simular=true`` for a dry run), then
+    poll the import until its status is CONCLUIDO to read its summary and
+    the errors of each rejected row.
+    """
+    queryset = Importacao.objects.all()
+    serializer_class = ImportacaoSerializer
+    permission_classes = [permissions.IsAuthenticated, IsStaffOrReadOnly]
+    parser_classes = [MultiPartParser]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            importacao = serializer.save(status='PENDENTE', usuario=request.user)
+            enfileirar('familias.importar', importacao_id=importacao.id)
+        return Response(self.get_serializer(importacao).data, status=status.HTTP_202_ACCEPTED)
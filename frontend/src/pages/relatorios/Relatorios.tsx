@@ -5,7 +5,7 @@ import { relatoriosApi } from '../../services/api';
 import { 
   FrequenciaReport, 
   CestasReport, 
-  TamanhosReport, 
+  DemografiaReport, 
   ProgramasReport 
 } from '../../types';
 
@@ -15,7 +15,7 @@ const Relatorios: React.FC = () => {
   const [reports, setReports] = useState({
     frequencia: null as FrequenciaReport | null,
     cestas: null as CestasReport | null,
-    tamanhos: null as TamanhosReport | null,
+    demografia: null as DemografiaReport | null,
     programas: null as ProgramasReport | null
   });
   const [loading, setLoading] = useState(true);
@@ -35,9 +35,9 @@ const Relatorios: React.FC = () => {
           response = await relatoriosApi.getCestas();
           setReports(prev => ({ ...prev, cestas: response.data }));
           break;
-        case 'tamanhos':
-          response = await relatoriosApi.getTamanhos();
-          setReports(prev => ({ ...prev, tamanhos: response.data }));
+        case 'demografia':
+          response = await relatoriosApi.getDemografia();
+          setReports(prev => ({ ...prev, demografia: response.data }));
           break;
         case 'programas':
           response = await relatoriosApi.getProgramas();
@@ -54,16 +54,16 @@ const Relatorios: React.FC = () => {
 
   const handleChangeTab = (event: React.SyntheticEvent, newValue: number) => {
     setTab(newValue);
-    fetchReport(['frequencia', 'cestas', 'tamanhos', 'programas'][newValue]);
+    fetchReport(['frequencia', 'cestas', 'demografia', 'programas'][newValue]);
   };
 
   useEffect(() => {
-    fetchReport(['frequencia', 'cestas', 'tamanhos', 'programas'][tab]);
+    fetchReport(['frequencia', 'cestas', 'demografia', 'programas'][tab]);
   }, [tab]);
 
   const renderReport = () => {
     // Corrigindo o acesso ao array
-    const report = reports[['frequencia', 'cestas', 'tamanhos', 'programas'][tab]];
+    const report = reports[['frequencia', 'cestas', 'demografia', 'programas'][tab]];
   
     if (loading) {
       return (
@@ -163,38 +163,40 @@ const Relatorios: React.FC = () => {
           </Box>
         );
 
-      case 2: // Tamanhos
+      case 2: // Demografia
         return (
           <Box>
             <Typography variant="h6" sx={{ mt: 2 }}>
-              Distribuição de Tamanhos
+              Perfil dos Membros
             </Typography>
             <TableContainer component={Paper}>
               <Table>
                 <TableHead>
                   <TableRow>
-                    <TableCell>Tamanho</TableCell>
+                    <TableCell>Grupo</TableCell>
                     <TableCell>Quantidade</TableCell>
                     <TableCell>% Total</TableCell>
                   </TableRow>
                 </TableHead>
                 <TableBody>
-                  {Object.entries(report.distribuicao).map(([tipo, items]) => (
-                    <React.Fragment key={tipo}>
+                  {([
+                    ['Sexo', report.distribuicao.sexo],
+                    ['Faixa etária', report.distribuicao.faixa_etaria],
+                    ['Grau de parentesco', report.distribuicao.grau_parentesco],
+                  ] as [string, any[]][]).map(([titulo, items]) => (
+                    <React.Fragment key={titulo}>
                       <TableRow>
                         <TableCell colSpan={3}>
                           <Typography variant="subtitle2" sx={{ fontWeight: 'bold' }}>
-                            {tipo.charAt(0).toUpperCase() + tipo.slice(1)}
+                            {titulo}
                           </Typography>
                         </TableCell>
                       </TableRow>
                       {items.map((item: any) => (
-                        <TableRow key={`${tipo}-${item.tamanho}`}>
-                          <TableCell>{item.tamanho}</TableCell>
+                        <TableRow key={`${titulo}-${item.valor ?? item.faixa}`}>
+                          <TableCell>{item.rotulo ?? item.faixa}</TableCell>
                           <TableCell>{item.quantidade}</TableCell>
-                          <TableCell>
-                            {((item.quantidade / report.statistics[`total_${tipo}`]) * 100).toFixed(2)}%
-                          </TableCell>
+                          <TableCell>{item.percentual.toFixed(2)}%</TableCell>
                         </TableRow>
                       ))}
                     </React.Fragment>
@@ -204,10 +206,8 @@ const Relatorios: React.FC = () => {
             </TableContainer>
             <Box sx={{ mt: 2, display: 'flex', justifyContent: 'flex-end' }}>
               <Typography>
-                Total: {report.statistics.total_membros} membros - 
-                Calçados: {report.statistics.total_calcoes} - 
-                Calças: {report.statistics.total_calcas} - 
-                Blusas: {report.statistics.total_blusas}
+                Total: {report.statistics.total_membros} membros em {report.statistics.total_familias} famílias - 
+                Menores de 18: {report.statistics.total_menores} ({report.statistics.percentual_menores.toFixed(2)}%)
               </Typography>
             </Box>
           </Box>
@@ -264,7 +264,7 @@ const Relatorios: React.FC = () => {
         <Tabs value={tab} onChange={handleChangeTab} sx={{ mt: 2 }}>
           <Tab label="Frequência" />
           <Tab label="Cestas" />
-          <Tab label="Tamanhos" />
+          <Tab label="Demografia" />
           <Tab label="Programas" />
         </Tabs>
 
@@ -19,10 +19,10 @@ export interface CestasReport {
   media_por_familia: number;
 }
 
-export interface TamanhosReport {
-  tamanho: string;
+export interface DemografiaReport {
+  faixa: string;
   quantidade: number;
-  tipo: 'calcao' | 'calca' | 'blusa';
+  percentual: number;
 }
 
 export interface ProgramasReport {
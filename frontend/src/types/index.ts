@@ -74,26 +74,31 @@ export interface CestasReport {
   };
 }
 
-export interface TamanhosReport {
+export interface DemografiaReport {
   distribuicao: {
-    calcoes: Array<{
-      tamanho: string;
+    sexo: Array<{
+      valor: string;
+      rotulo: string;
       quantidade: number;
+      percentual: number;
     }>;
-    calcas: Array<{
-      tamanho: string;
+    faixa_etaria: Array<{
+      faixa: string;
       quantidade: number;
+      percentual: number;
     }>;
-    blusas: Array<{
-      tamanho: string;
+    grau_parentesco: Array<{
+      valor: string;
+      rotulo: string;
       quantidade: number;
+      percentual: number;
     }>;
   };
   statistics: {
     total_membros: number;
-    total_calcoes: number;
-    total_calcas: number;
-    total_blusas: number;
+    total_menores: number;
+    percentual_menores: number;
+    total_familias: number;
   };
 }
 
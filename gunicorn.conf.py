@@ -0,0 +1,85 @@
+# Configuração lida automaticamente pelo gunicorn a partir do diretório do projeto
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+MANAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'manage.py')
+# Segundos que o processo da fila tem para terminar a tarefa atual ao desligar
+FILA_ESPERA_PARADA = 25
+
+fila = {'processo': None, 'parar': threading.Event()}
+
+
+def supervisionar_fila(server):
+    """Keeps one ``processar_tarefas`` process running until gunicorn exits."""
+    while not fila['parar'].is_set():
+        fila['processo'] = subprocess.Popen([sys.executable, MANAGE, 'processar_tarefas'])
+        codigo = fila['processo'].wait()
+        if fila['parar'].is_set():
+            break
+        server.log.warning('Fila de tarefas terminou com código %s; reiniciando', codigo)
+        fila['parar'].wait(5)
+
+
+def on_starting(server):
+    """
+    Gives this run's workers a fresh METRICS_DIR to publish their metrics in.
+
+    /metrics adds up every file there (see core.metrics); starting empty
+    makes a gunicorn restart read as the counter reset it is.
+    """
+    from decouple import config
+
+    pasta = config('METRICS_DIR', default='')
+    if pasta:
+        shutil.rmtree(pasta, ignore_errors=True)
+    else:
+        pasta = tempfile.mkdtemp(prefix='metrics-')
+    # Inherited by the workers, which are forked after this hook
+    os.environ['METRICS_DIR'] = pasta
+
+
+def when_ready(server):
+    """
+    Starts the job queue next to the web workers when TAREFAS_NO_WEB is set.
+
+    Running in the same service is what lets the queue see the web's
+    SQLite database and MEDIA_ROOT; a separate service would get its own.
+    """
+    # Not imported at module level: gunicorn would take ``config`` for its own setting
+    from decouple import config
+
+    if config('TAREFAS_NO_WEB', default=False, cast=bool):
+        threading.Thread(target=supervisionar_fila, args=(server,), daemon=True).start()
+
+
+def on_exit(server):
+    shutil.rmtree(os.environ.get('METRICS_DIR', ''), ignore_errors=True)
+    fila['parar'].set()
+    processo = fila['processo']
+    if processo is None or processo.poll() is not None:
+        return
+    # SIGTERM lets the current job finish (see processar_tarefas)
+    processo.terminate()
+    try:
+        processo.wait(FILA_ESPERA_PARADA)
+    except subprocess.TimeoutExpired:
+        processo.kill()
+
+
+def post_worker_init(worker):
+    """Warms the per-process cache of each worker when CACHE_WARM_ON_STARTUP is set."""
+    from django.conf import settings
+    from django.db import connections
+
+    if not settings.CACHE_WARM_ON_STARTUP:
+        return
+    from core.aquecimento import aquecer
+    try:
+        resultados = aquecer()
+        worker.log.info('Cache aquecido: %s', resultados)
+    finally:
+        connections.close_all()
@@ -0,0 +1,13 @@
+"""Hot membro querysets audited by ``manage.py auditar_indices``."""
+from core.auditoria import consulta_quente
+from .models import Membro
+
+
+@consulta_quente('membros.lista')
+def lista():
+    return Membro.objects.select_related('familia').order_by('nome')[:10]
+
+
+@consulta_quente('membros.ativos')
+def ativos():
+    return Membro.objects.filter(ativo=True).order_by('nome').values_list('id', 'nome', 'data_nascimento')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from core.tarefas import enfileirar
+from membros.models import Membro
+
+
+class Command(BaseCommand):
+    help = 'Enfileira o processamento das fotos e declarações enviadas antes do pipeline de imagens'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todos', action='store_true', help='Reprocessa também os membros que já têm variantes')
+
+    def handle(self, *args, **options):
+        total = 0
+        for campo in Membro.CAMPOS_IMAGEM:
+            membros = Membro.objects.exclude(**{f'{campo}__isnull': True}).exclude(**{campo: ''})
+            if not options['todos']:
+                membros = membros.filter(**{f'{campo}_variantes': {}})
+            for membro_id in membros.values_list('id', flat=True).iterator():
+                enfileirar('membros.processar_imagens', membro_id=membro_id, campos=[campo])
+                total += 1
+        self.stdout.write(self.style.SUCCESS(f'{total} processamento(s) enfileirado(s)'))
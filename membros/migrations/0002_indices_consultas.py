@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('familias', '0003_indices_consultas'),
+        ('membros', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='membro',
+            index=models.Index(fields=['nome'], name='membro_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membro',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['nome'], name='membro_ativo_nome_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membros', '0002_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='membro',
+            name='declaracao_matricula_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Variantes da declaração de matrícula'),
+        ),
+        migrations.AddField(
+            model_name='membro',
+            name='foto_3x4_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Variantes da foto 3x4'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:09
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membros', '0003_variantes_imagens'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='membro',
+            name='membro_ativo_nome_idx',
+        ),
+    ]
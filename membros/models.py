@@ -43,6 +43,11 @@ class Membro(models.Model):
         blank=True,
         null=True
     )
+    # Resized JPEG/WebP copies written by the membros.processar_imagens task: {variante: {extensao: nome}}
+    foto_3x4_variantes = models.JSONField(_('Variantes da foto 3x4'), default=dict, blank=True, editable=False)
+    declaracao_matricula_variantes = models.JSONField(
+        _('Variantes da declaração de matrícula'), default=dict, blank=True, editable=False
+    )
     ativo = models.BooleanField(_('Ativo'), default=True)
     created_at = models.DateTimeField(_('Criado em'), auto_now_add=True)
     updated_at = models.DateTimeField(_('Atualizado em'), auto_now=True)
@@ -51,6 +56,15 @@ class Membro(models.Model):
         verbose_name = _('Membro')
         verbose_name_plural = _('Membros')
         ordering = ['nome']
+        indexes = [
+            models.Index(fields=['nome'], name='membro_nome_idx'),
+        ]
+
+    # Image field -> processing profile in core.imagens.PERFIS
+    CAMPOS_IMAGEM = {
+        'foto_3x4': 'foto',
+        'declaracao_matricula': 'documento',
+    }
 
     def __str__(self):
         return self.nome
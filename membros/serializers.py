@@ -1,9 +1,35 @@
 from rest_framework import serializers
 from .models import Membro
+from core.serializers import CamposDinamicosMixin
 from familias.models import Familia
 
-class MembroSerializer(serializers.ModelSerializer):
+
+class VariantesField(serializers.ReadOnlyField):
+    """URLs of the resized copies of an image field; empty until the upload has been processed."""
+
+    def __init__(self, campo, **kwargs):
+        self.campo = campo
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        arquivo = getattr(instance, self.campo)
+        if not arquivo:
+            return {}
+        request = self.context.get('request')
+        variantes = {}
+        for variante, formatos in getattr(instance, f'{self.campo}_variantes').items():
+            variantes[variante] = {}
+            for extensao, nome in formatos.items():
+                url = arquivo.storage.url(nome)
+                variantes[variante][extensao] = request.build_absolute_uri(url) if request else url
+        return variantes
+
+
+class MembroSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     familia_nome = serializers.CharField(source='familia.nome', read_only=True)
+    foto_3x4_variantes = VariantesField('foto_3x4')
+    declaracao_matricula_variantes = VariantesField('declaracao_matricula')
 
     class Meta:
         model = Membro
@@ -19,7 +45,9 @@ class MembroSerializer(serializers.ModelSerializer):
             'nis',
             'grau_parentesco',
             'declaracao_matricula',
+            'declaracao_matricula_variantes',
             'foto_3x4',
+            'foto_3x4_variantes',
             'ativo',
             'created_at',
             'updated_at'
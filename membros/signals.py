@@ -0,0 +1,22 @@
+from django.db.models.signals import post_save, pre_save
+from core.tarefas import enfileirar
+from .models import Membro
+
+
+def detectar_uploads(sender, instance, raw=False, **kwargs):
+    # A freshly uploaded file is not committed to storage until the field's pre_save runs
+    instance._imagens_enviadas = [] if raw else [
+        campo for campo in Membro.CAMPOS_IMAGEM
+        if getattr(instance, campo) and not getattr(instance, campo)._committed
+    ]
+
+
+def processar_uploads(sender, instance, raw=False, **kwargs):
+    campos = getattr(instance, '_imagens_enviadas', None)
+    if campos:
+        # Enqueued in the same transaction as the row, so the job never sees a file that was rolled back
+        enfileirar('membros.processar_imagens', membro_id=instance.pk, campos=campos)
+
+
+pre_save.connect(detectar_uploads, sender=Membro, dispatch_uid='membros_detectar_uploads')
+post_save.connect(processar_uploads, sender=Membro, dispatch_uid='membros_processar_uploads')
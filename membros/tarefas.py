@@ -0,0 +1,37 @@
+"""Background processing of member uploads, run by ``manage.py processar_tarefas``."""
+from django.utils import timezone
+
+from core.imagens import ImagemInvalida, processar_imagem, remover_variantes
+from core.tarefas import tarefa
+from .models import Membro
+
+
+@tarefa('membros.processar_imagens')
+def processar_imagens(membro_id, campos):
+    membro = Membro.objects.filter(pk=membro_id).first()
+    if membro is None:
+        return
+    for campo in campos:
+        arquivo = getattr(membro, campo)
+        if not arquivo:
+            continue
+        enviado, storage = arquivo.name, arquivo.storage
+        try:
+            novo_nome, variantes = processar_imagem(arquivo, Membro.CAMPOS_IMAGEM[campo])
+        except ImagemInvalida:
+            # PDF declarations and other documents are kept as uploaded
+            novo_nome, variantes = None, {}
+
+        atualizacao = {f'{campo}_variantes': variantes, 'updated_at': timezone.now()}
+        if novo_nome:
+            atualizacao[campo] = novo_nome
+        # Only if the file is still the one processed: a newer upload has its own job queued
+        atualizado = Membro.objects.filter(pk=membro_id, **{campo: enviado}).update(**atualizacao)
+        if not atualizado:
+            remover_variantes(storage, variantes)
+            if novo_nome:
+                storage.delete(novo_nome)
+            continue
+        remover_variantes(storage, getattr(membro, f'{campo}_variantes'))
+        if novo_nome:
+            storage.delete(enviado)
@@ -1,3 +1,107 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import date
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from PIL import Image
+from core.models import Tarefa
+from core.tarefas import executar, reservar
+from core.testing import QueryCountTestCase
+from familias.models import Familia
+from .models import Membro
 
-# Create your tests here.
+
+class MembroQueryCountTest(QueryCountTestCase):
+    def criar_membros(self, quantidade):
+        for i in range(quantidade):
+            Membro.objects.create(
+                nome=f'Membro {i}', data_nascimento=date(2015, 1, 1), sexo='M',
+                familia=Familia.objects.create(nome=f'Família {i}'), grau_parentesco='FILHO'
+            )
+
+    def test_list(self):
+        self.assertConstantQueries('/api/membros/membros/', self.criar_membros)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='midia_teste_'))
+class ProcessamentoImagensTest(QueryCountTestCase):
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def foto_de_celular(self):
+        # 3000x2000 landscape sensor image tagged "rotate 90° clockwise", as phones save portraits
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        saida = io.BytesIO()
+        Image.new('RGB', (3000, 2000), 'red').save(saida, 'JPEG', quality=95, exif=exif)
+        return SimpleUploadedFile('foto.jpg', saida.getvalue(), content_type='image/jpeg')
+
+    def test_upload_processado_na_fila(self):
+        membro = Membro.objects.create(
+            nome='Membro', data_nascimento=date(2015, 1, 1), sexo='M', grau_parentesco='FILHO',
+            familia=Familia.objects.create(nome='Família'), foto_3x4=self.foto_de_celular(),
+        )
+        enviado = membro.foto_3x4.name
+        self.assertEqual(Tarefa.objects.filter(nome='membros.processar_imagens').count(), 1)
+
+        executar(reservar('teste', nomes=['membros.processar_imagens']))
+        membro.refresh_from_db()
+
+        self.assertNotEqual(membro.foto_3x4.name, enviado)
+        self.assertFalse(membro.foto_3x4.storage.exists(enviado))
+        with Image.open(membro.foto_3x4.path) as foto:
+            self.assertEqual(foto.size, (800, 1200))
+            self.assertFalse(foto.getexif())
+        with Image.open(membro.foto_3x4.storage.path(membro.foto_3x4_variantes['miniatura']['webp'])) as miniatura:
+            self.assertEqual(miniatura.format, 'WEBP')
+            self.assertEqual(max(miniatura.size), 160)
+
+        response = self.client.get(f'/api/membros/membros/{membro.pk}/')
+        self.assertTrue(response.data['foto_3x4_variantes']['miniatura']['jpg'].startswith('http://testserver/'))
+        self.assertEqual(response.data['declaracao_matricula_variantes'], {})
+
+        # Served by the media view: content-hashed names are immutable, and ranges and revalidation work
+        url = response.data['foto_3x4_variantes']['miniatura']['jpg']
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        conteudo = b''.join(response.streaming_content)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        parcial = self.client.get(url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(parcial.status_code, 206)
+        self.assertEqual(b''.join(parcial.streaming_content), conteudo[:10])
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+
+class LimitesUploadTest(QueryCountTestCase):
+    def enviar(self, conteudo, nome='foto.jpg'):
+        dados = {
+            'nome': 'Membro', 'data_nascimento': '2015-01-01', 'sexo': 'M', 'grau_parentesco': 'FILHO',
+            'familia': Familia.objects.create(nome='Família').pk,
+            'foto_3x4': SimpleUploadedFile(nome, conteudo, content_type='image/jpeg'),
+        }
+        return self.client.post('/api/membros/membros/', dados, format='multipart')
+
+    def test_tipo_verificado_pelo_conteudo(self):
+        response = self.enviar(b'%PDF-1.7\n' + b'0' * 1024)
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(Membro.objects.exists())
+
+        # The bytes held back for sniffing still reach the stored file
+        jpeg = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(jpeg, 'JPEG')
+        with override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='midia_teste_')):
+            response = self.enviar(jpeg.getvalue(), nome='documento.pdf')
+            self.assertEqual(response.status_code, 201, response.data)
+            with Membro.objects.get().foto_3x4.open('rb') as foto:
+                self.assertEqual(foto.read(), jpeg.getvalue())
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    @override_settings(UPLOAD_LIMITES={'foto_3x4': {'tamanho_maximo': 1024, 'tipos': ('jpeg',)}})
+    def test_tamanho_por_campo(self):
+        response = self.enviar(b'\xff\xd8\xff\xe0' + b'0' * 4096)
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.data['status_code'], 413)
@@ -3,11 +3,18 @@ from rest_framework.response import Response
 from .models import Membro
 from .serializers import MembroSerializer
 from familias.models import Familia
+from core.mixins import EagerLoadingMixin
 
-class MembroViewSet(viewsets.ModelViewSet):
+class MembroViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Membro.objects.all()
     serializer_class = MembroSerializer
     permission_classes = [permissions.IsAuthenticated]
+    eager_loading = {
+        'familia_nome': ('familia',),
+    }
+    eager_loading_actions = {
+        'destroy': (),
+    }
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
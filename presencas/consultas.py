@@ -0,0 +1,64 @@
+"""Hot presença querysets audited by ``manage.py auditar_indices``."""
+from datetime import date
+
+from django.db.models import Count, Q, Sum
+
+from core.auditoria import consulta_quente
+from core.pagination import KeysetPagination
+from .models import Presenca, FrequenciaMensal, primeiro_dia_do_mes
+
+
+def _pagina(ordering=('-data', '-id')):
+    return Presenca.objects.select_related('membro__familia', 'turma').order_by(*ordering)
+
+
+@consulta_quente('presencas.lista')
+def lista():
+    return _pagina()[:KeysetPagination.page_size + 1]
+
+
+@consulta_quente('presencas.lista_cursor')
+def lista_cursor():
+    paginacao = KeysetPagination()
+    paginacao.campos = ['data', 'id']
+    return _pagina().filter(paginacao.filtro_apos([date.today(), 1], ['-data', '-id']))[:KeysetPagination.page_size + 1]
+
+
+@consulta_quente('presencas.chamada_turma')
+def chamada_turma():
+    return Presenca.objects.filter(turma_id=1, data=date.today())
+
+
+@consulta_quente('presencas.historico_membro')
+def historico_membro():
+    return Presenca.objects.filter(membro_id=1).order_by('-data')
+
+
+@consulta_quente('presencas.recalculo_frequencia')
+def recalculo_frequencia():
+    hoje = date.today()
+    return FrequenciaMensal.objects.totais_por_mes([1, 2, 3], primeiro_dia_do_mes(hoje), hoje)
+
+
+@consulta_quente('presencas.frequencia_periodo')
+def frequencia_periodo():
+    hoje = date.today()
+    return Presenca.objects.filter(data__range=[primeiro_dia_do_mes(hoje), hoje]).values('membro_id').annotate(
+        presencas=Count('id', filter=Q(presente=True)),
+        encontros=Count('id')
+    ).order_by()
+
+
+@consulta_quente('presencas.frequencia_mensal')
+def frequencia_mensal():
+    hoje = date.today()
+    return FrequenciaMensal.objects.filter(mes__range=[date(hoje.year, 1, 1), hoje]).values('membro_id').annotate(
+        presencas=Sum('total_presencas'),
+        encontros=Sum('total_encontros')
+    ).order_by()
+
+
+@consulta_quente('presencas.frequencia_mensal_turma')
+def frequencia_mensal_turma():
+    hoje = date.today()
+    return FrequenciaMensal.objects.filter(turma_id=1, mes__range=[date(hoje.year, 1, 1), hoje])
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db.models.functions import TruncMonth
+from presencas.models import Presenca, FrequenciaMensal
+
+
+class Command(BaseCommand):
+    help = 'Recalcula a tabela de frequência mensal a partir das presenças'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--membro', type=int, help='Recalcula apenas um membro')
+
+    def handle(self, *args, **options):
+        presencas = Presenca.objects.all()
+        if options['membro']:
+            presencas = presencas.filter(membro_id=options['membro'])
+            FrequenciaMensal.objects.filter(membro_id=options['membro']).delete()
+        else:
+            FrequenciaMensal.objects.all().delete()
+
+        chaves = presencas.annotate(
+            mes=TruncMonth('data')
+        ).values_list('membro_id', 'mes').distinct().order_by()
+        FrequenciaMensal.objects.recalcular(chaves)
+        self.stdout.write(self.style.SUCCESS(
+            f'Frequência mensal recalculada: {FrequenciaMensal.objects.count()} registros'
+        ))
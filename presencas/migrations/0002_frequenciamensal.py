@@ -0,0 +1,55 @@
+# Generated by Django 5.2.1 on 2026-10-17 23:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+
+
+def popular_frequencia_mensal(apps, schema_editor):
+    Presenca = apps.get_model('presencas', 'Presenca')
+    FrequenciaMensal = apps.get_model('presencas', 'FrequenciaMensal')
+    linhas = Presenca.objects.annotate(
+        mes=TruncMonth('data')
+    ).values(
+        'membro_id', 'turma_id', 'mes'
+    ).annotate(
+        total_encontros=Count('id'),
+        total_presencas=Count('id', filter=Q(presente=True))
+    ).order_by()
+    FrequenciaMensal.objects.bulk_create(
+        (FrequenciaMensal(**linha) for linha in linhas.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membros', '0001_initial'),
+        ('presencas', '0001_initial'),
+        ('turmas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FrequenciaMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(verbose_name='mês')),
+                ('total_encontros', models.PositiveIntegerField(default=0, verbose_name='total de encontros')),
+                ('total_presencas', models.PositiveIntegerField(default=0, verbose_name='total de presenças')),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+                ('membro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='frequencias_mensais', to='membros.membro', verbose_name='membro')),
+                ('turma', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='turmas.turma', verbose_name='turma')),
+            ],
+            options={
+                'verbose_name': 'frequência mensal',
+                'verbose_name_plural': 'frequências mensais',
+                'ordering': ['-mes'],
+                'indexes': [models.Index(fields=['mes', 'membro'], name='freq_mensal_mes_membro_idx'), models.Index(fields=['turma', 'mes'], name='freq_mensal_turma_mes_idx')],
+                'constraints': [models.UniqueConstraint(fields=('membro', 'turma', 'mes'), name='unique_membro_turma_mes')],
+            },
+        ),
+        migrations.RunPython(popular_frequencia_mensal, migrations.RunPython.noop),
+    ]
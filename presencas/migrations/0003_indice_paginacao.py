@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membros', '0001_initial'),
+        ('presencas', '0002_frequenciamensal'),
+        ('turmas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='presenca',
+            index=models.Index(fields=['data', 'id'], name='presenca_data_id_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membros', '0002_indices_consultas'),
+        ('presencas', '0003_indice_paginacao'),
+        ('turmas', '0002_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='frequenciamensal',
+            name='freq_mensal_mes_membro_idx',
+        ),
+        migrations.AddIndex(
+            model_name='frequenciamensal',
+            index=models.Index(fields=['mes', 'membro', 'total_presencas', 'total_encontros'], name='freq_mensal_cobertura_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presenca',
+            index=models.Index(fields=['turma', 'data'], name='presenca_turma_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presenca',
+            index=models.Index(fields=['membro', 'data', 'turma', 'presente'], name='presenca_membro_freq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presenca',
+            index=models.Index(fields=['data', 'membro', 'presente'], name='presenca_data_freq_idx'),
+        ),
+    ]
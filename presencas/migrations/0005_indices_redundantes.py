@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membros', '0004_indices_redundantes'),
+        ('presencas', '0004_indices_consultas'),
+        ('turmas', '0002_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='presenca',
+            name='membro',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='presencas', to='membros.membro', verbose_name='membro'),
+        ),
+        migrations.AlterField(
+            model_name='presenca',
+            name='turma',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='turmas.turma', verbose_name='turma'),
+        ),
+    ]
@@ -1,15 +1,28 @@
-from django.db import models
+import calendar
+from django.db import models, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
 from django.utils.translation import gettext_lazy as _
-from datetime import date
+from datetime import date, timedelta
 from membros.models import Membro
 
 
+def primeiro_dia_do_mes(dia):
+    return dia.replace(day=1)
+
+
+def ultimo_dia_do_mes(dia):
+    return dia.replace(day=calendar.monthrange(dia.year, dia.month)[1])
+
+
 class Presenca(models.Model):
     membro = models.ForeignKey(
         Membro,
         on_delete=models.CASCADE,
         related_name='presencas',
-        verbose_name=_('membro')
+        verbose_name=_('membro'),
+        # unique_membro_data starts with membro and serves its lookups
+        db_index=False
     )
     data = models.DateField(default=date.today, verbose_name=_('data do encontro'))
     presente = models.BooleanField(default=True, verbose_name=_('presente'))
@@ -18,7 +31,9 @@ class Presenca(models.Model):
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
-        verbose_name=_('turma')
+        verbose_name=_('turma'),
+        # Served by presenca_turma_data_idx
+        db_index=False
     )
     data_criacao = models.DateTimeField(auto_now_add=True)
     data_atualizacao = models.DateTimeField(auto_now=True)
@@ -34,6 +49,16 @@ class Presenca(models.Model):
                 name='unique_membro_data'
             )
         ]
+        indexes = [
+            # Backs the keyset pagination of the list endpoint
+            models.Index(fields=['data', 'id'], name='presenca_data_id_idx'),
+            # Roll call of a turma on a date and per-turma reports
+            models.Index(fields=['turma', 'data'], name='presenca_turma_data_idx'),
+            # Covering indexes for the frequency aggregates: the rollup
+            # recalculation (by membro) and date-range totals (by data)
+            models.Index(fields=['membro', 'data', 'turma', 'presente'], name='presenca_membro_freq_idx'),
+            models.Index(fields=['data', 'membro', 'presente'], name='presenca_data_freq_idx'),
+        ]
 
     def __str__(self):
         return f"{self.membro.nome_completo} - {self.data}"
@@ -41,26 +66,181 @@ class Presenca(models.Model):
     @property
     def idade_do_membro(self):
         """Returns the member's age at the time of this presence."""
-        if self.data:
-            today = self.data
-        else:
-            today = date.today()
-        
-        born = self.membro.data_nascimento
-        if born:
-            return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
-        return None
+        from turmas.indice import idade_em
+        return idade_em(self.membro.data_nascimento, self.data or date.today())
 
     def turma_sugerida(self):
         """Suggests a turma based on member's age."""
-        from turmas.models import Turma
-        idade = self.idade_do_membro
-        if idade is not None:
-            return Turma.objects.filter(
-                idade_minima__lte=idade,
-                idade_maxima__gte=idade,
-                ativo=True
-            ).first()
-        return None
-
-# Create your models here.
+        from turmas.indice import indice_turmas
+        return indice_turmas().turma_para_idade(self.idade_do_membro)
+
+
+class FrequenciaMensalManager(models.Manager):
+    # Tamanho do lote de chaves recalculadas por consulta
+    LOTE_RECALCULO = 500
+
+    def recalcular(self, chaves):
+        """
+        Rebuilds the rollup rows for the given (membro_id, data) keys from Presenca.
+
+        Each key is normalized to its month, so recalculating is idempotent and
+        only touches the presences of the affected members and months.
+        """
+        chaves = sorted({(membro_id, primeiro_dia_do_mes(dia)) for membro_id, dia in chaves})
+        for i in range(0, len(chaves), self.LOTE_RECALCULO):
+            self._recalcular_lote(chaves[i:i + self.LOTE_RECALCULO])
+
+    def totais_por_mes(self, membro_ids, inicio, fim):
+        """Aggregates the presence rows of the given members per (membro, turma, month)."""
+        return Presenca.objects.filter(
+            membro_id__in=membro_ids,
+            data__range=[inicio, fim]
+        ).annotate(
+            mes=TruncMonth('data')
+        ).values(
+            'membro_id', 'turma_id', 'mes'
+        ).annotate(
+            total_encontros=Count('id'),
+            total_presencas=Count('id', filter=Q(presente=True))
+        ).order_by()
+
+    def _recalcular_lote(self, chaves):
+        wanted = set(chaves)
+        meses = [mes for _, mes in chaves]
+        linhas = self.totais_por_mes(
+            {membro_id for membro_id, _ in chaves},
+            min(meses), ultimo_dia_do_mes(max(meses))
+        )
+
+        filtro = Q()
+        for membro_id, mes in chaves:
+            filtro |= Q(membro_id=membro_id, mes=mes)
+
+        with transaction.atomic():
+            self.filter(filtro).delete()
+            self.bulk_create([
+                self.model(
+                    membro_id=linha['membro_id'],
+                    turma_id=linha['turma_id'],
+                    mes=linha['mes'],
+                    total_encontros=linha['total_encontros'],
+                    total_presencas=linha['total_presencas'],
+                )
+                for linha in linhas
+                if (linha['membro_id'], linha['mes']) in wanted
+            ])
+
+    def por_membro(self, data_inicio, data_fim, turma_id=None):
+        """
+        Returns attendance totals per member for a date range.
+
+        Whole months are read from the rollup. A partially covered month at
+        either edge only falls back to the presence rows when the uncovered
+        part of that month actually has presences.
+        """
+        presencas = Presenca.objects.all()
+        rollup = self.all()
+        if turma_id:
+            presencas = presencas.filter(turma_id=turma_id)
+            rollup = rollup.filter(turma_id=turma_id)
+
+        inicio_rollup = primeiro_dia_do_mes(data_inicio)
+        fim_rollup = primeiro_dia_do_mes(data_fim)
+        parciais = []
+        if data_inicio > inicio_rollup and presencas.filter(
+            data__gte=inicio_rollup, data__lt=data_inicio
+        ).exists():
+            parciais.append((data_inicio, min(data_fim, ultimo_dia_do_mes(data_inicio))))
+            inicio_rollup = ultimo_dia_do_mes(data_inicio) + timedelta(days=1)
+        if data_fim < ultimo_dia_do_mes(data_fim) and fim_rollup >= inicio_rollup and presencas.filter(
+            data__gt=data_fim, data__lte=ultimo_dia_do_mes(data_fim)
+        ).exists():
+            parciais.append((fim_rollup, data_fim))
+            fim_rollup = fim_rollup - timedelta(days=1)
+
+        campos = ('membro_id', 'membro__nome', 'membro__familia__nome')
+        consultas = []
+        if inicio_rollup <= fim_rollup:
+            consultas.append(
+                rollup.filter(mes__range=[inicio_rollup, fim_rollup]).values(*campos).annotate(
+                    presencas=Sum('total_presencas'),
+                    encontros=Sum('total_encontros')
+                ).order_by()
+            )
+        for inicio, fim in parciais:
+            consultas.append(
+                presencas.filter(data__range=[inicio, fim]).values(*campos).annotate(
+                    presencas=Count('id', filter=Q(presente=True)),
+                    encontros=Count('id')
+                ).order_by()
+            )
+
+        por_membro = {}
+        for consulta in consultas:
+            for linha in consulta:
+                item = por_membro.setdefault(linha['membro_id'], {
+                    'membro_id': linha['membro_id'],
+                    'membro__nome': linha['membro__nome'],
+                    'membro__familia__nome': linha['membro__familia__nome'],
+                    'total_presencas': 0,
+                    'total_encontros': 0,
+                })
+                item['total_presencas'] += linha['presencas']
+                item['total_encontros'] += linha['encontros']
+
+        frequencia = [item for item in por_membro.values() if item['total_encontros']]
+        for item in frequencia:
+            item['percentual_presenca'] = item['total_presencas'] / item['total_encontros'] * 100
+        frequencia.sort(key=lambda item: item['percentual_presenca'], reverse=True)
+        return frequencia
+
+
+class FrequenciaMensal(models.Model):
+    """Attendance rollup per member, turma and month, maintained from Presenca writes."""
+    membro = models.ForeignKey(
+        Membro,
+        on_delete=models.CASCADE,
+        related_name='frequencias_mensais',
+        verbose_name=_('membro')
+    )
+    turma = models.ForeignKey(
+        'turmas.Turma',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name=_('turma')
+    )
+    mes = models.DateField(verbose_name=_('mês'))
+    total_encontros = models.PositiveIntegerField(default=0, verbose_name=_('total de encontros'))
+    total_presencas = models.PositiveIntegerField(default=0, verbose_name=_('total de presenças'))
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    objects = FrequenciaMensalManager()
+
+    class Meta:
+        verbose_name = _('frequência mensal')
+        verbose_name_plural = _('frequências mensais')
+        ordering = ['-mes']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['membro', 'turma', 'mes'],
+                name='unique_membro_turma_mes'
+            )
+        ]
+        indexes = [
+            # Covers the per-member sums so they never touch the table
+            models.Index(
+                fields=['mes', 'membro', 'total_presencas', 'total_encontros'],
+                name='freq_mensal_cobertura_idx'
+            ),
+            models.Index(fields=['turma', 'mes'], name='freq_mensal_turma_mes_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.membro} - {self.mes.strftime('%m/%Y')}"
+
+    @property
+    def percentual_presenca(self):
+        if not self.total_encontros:
+            return 0
+        return self.total_presencas / self.total_encontros * 100
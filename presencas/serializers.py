@@ -1,13 +1,19 @@
 from rest_framework import serializers
 from .models import Presenca
+from core.serializers import CamposDinamicosMixin
+from membros.models import Membro
 from membros.serializers import MembroSerializer
+from turmas.models import Turma
 from turmas.serializers import TurmaSerializer
 
-class PresencaSerializer(serializers.ModelSerializer):
+class PresencaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     membro = MembroSerializer(read_only=True)
     turma = TurmaSerializer(read_only=True)
     membro_id = serializers.IntegerField(write_only=True)
     turma_id = serializers.IntegerField(write_only=True, required=False)
+    created_at = serializers.DateTimeField(source='data_criacao', read_only=True)
+    updated_at = serializers.DateTimeField(source='data_atualizacao', read_only=True)
+    expansiveis = {'membro': 'membro_id', 'turma': 'turma_id'}
 
     class Meta:
         model = Presenca
@@ -23,3 +29,32 @@ class PresencaSerializer(serializers.ModelSerializer):
             'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+
+
+class ChamadaItemSerializer(serializers.Serializer):
+    membro_id = serializers.IntegerField()
+    presente = serializers.BooleanField()
+
+
+class ChamadaSerializer(serializers.Serializer):
+    """Roll call for a whole turma on a single date.
+
+    Without ``turma_id`` each member is assigned the turma matching their age.
+    """
+    turma_id = serializers.IntegerField(required=False, allow_null=True)
+    data = serializers.DateField()
+    presencas = ChamadaItemSerializer(many=True, allow_empty=False, max_length=500)
+
+    def validate_turma_id(self, value):
+        if value is not None and not Turma.objects.filter(pk=value).exists():
+            raise serializers.ValidationError('Turma não encontrada.')
+        return value
+
+    def validate_presencas(self, value):
+        # The last mark for a member wins, so retried submissions stay idempotent
+        marcacoes = {item['membro_id']: item['presente'] for item in value}
+        existentes = set(Membro.objects.filter(id__in=marcacoes).values_list('id', flat=True))
+        faltando = sorted(set(marcacoes) - existentes)
+        if faltando:
+            raise serializers.ValidationError(f'Membros não encontrados: {faltando}')
+        return marcacoes
@@ -0,0 +1,28 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Presenca, FrequenciaMensal
+
+
+@receiver(pre_save, sender=Presenca)
+def guardar_chave_anterior(sender, instance, **kwargs):
+    """Remembers the (membro, data) the row had before an update moved it."""
+    instance._chave_frequencia_anterior = None
+    if instance.pk:
+        anterior = sender.objects.filter(pk=instance.pk).values_list('membro_id', 'data').first()
+        instance._chave_frequencia_anterior = anterior
+
+
+@receiver(post_save, sender=Presenca)
+def atualizar_frequencia_mensal(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    chaves = {(instance.membro_id, instance.data)}
+    anterior = getattr(instance, '_chave_frequencia_anterior', None)
+    if anterior:
+        chaves.add(anterior)
+    FrequenciaMensal.objects.recalcular(chaves)
+
+
+@receiver(post_delete, sender=Presenca)
+def remover_frequencia_mensal(sender, instance, **kwargs):
+    FrequenciaMensal.objects.recalcular({(instance.membro_id, instance.data)})
@@ -1,3 +1,302 @@
+import gzip
+import json
+from datetime import date, timedelta
+import brotli
+from django.db import connection
+from django.db.models import Count, Q
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from core.models import VersaoDados
+from core.testing import QueryCountTestCase
+from familias.models import Familia
+from membros.models import Membro
+from turmas.models import Turma
+from .models import FrequenciaMensal, Presenca
 
-# Create your tests here.
+
+class PresencaQueryCountTest(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.turma = Turma.objects.create(nome='Turma A', idade_minima=6, idade_maxima=10)
+        self.membro = self.criar_membro()
+        self.dias = 0
+
+    def criar_membro(self):
+        familia = Familia.objects.create(nome='Família Teste')
+        return Membro.objects.create(
+            nome='Criança', data_nascimento=date(2016, 3, 1), sexo='F',
+            familia=familia, grau_parentesco='FILHO'
+        )
+
+    def criar_presencas(self, quantidade):
+        for _ in range(quantidade):
+            self.dias += 1
+            Presenca.objects.create(
+                membro=self.criar_membro(), turma=self.turma,
+                data=date(2026, 1, 1) + timedelta(days=self.dias)
+            )
+
+    def criar_historico(self, quantidade):
+        for _ in range(quantidade):
+            self.dias += 1
+            Presenca.objects.create(
+                membro=self.membro, turma=self.turma,
+                data=date(2026, 1, 1) + timedelta(days=self.dias)
+            )
+
+    def test_list(self):
+        self.assertConstantQueries('/api/presencas/presencas/', self.criar_presencas)
+
+    def test_expand(self):
+        self.criar_presencas(2)
+        url = '/api/presencas/presencas/?fields=id,membro,turma.nome&expand=turma'
+        self.assertConstantQueries(url, self.criar_presencas)
+        with CaptureQueriesContext(connection) as contexto:
+            resultado = self.client.get(url).data['results'][0]
+        # The collapsed membro comes from the presence row itself, without joining membros
+        self.assertFalse(any('membros_membro' in consulta['sql'] for consulta in contexto.captured_queries))
+        self.assertEqual(resultado['turma'], {'nome': 'Turma A'})
+        self.assertEqual(resultado['membro'], Presenca.objects.get(pk=resultado['id']).membro_id)
+
+    def test_report(self):
+        self.assertConstantQueries('/api/presencas/presencas/report/', self.criar_presencas)
+
+    def test_historico(self):
+        self.assertConstantQueries(
+            f'/api/presencas/presencas/historico/?membro_id={self.membro.id}',
+            self.criar_historico
+        )
+
+    def test_paginacao_keyset(self):
+        # Several rows share each date, so the id tie-breaker must keep pages disjoint
+        for membro in [self.criar_membro() for _ in range(4)]:
+            for dia in range(3):
+                Presenca.objects.create(membro=membro, turma=self.turma, data=date(2026, 2, 1) + timedelta(days=dia))
+        esperado = list(Presenca.objects.order_by('-data', '-id').values_list('id', flat=True))
+
+        vistos = []
+        url = '/api/presencas/presencas/?page_size=5&count=false'
+        while url:
+            response = self.client.get(url)
+            self.assertNotIn('count', response.data)
+            vistos += [presenca['id'] for presenca in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(vistos, esperado)
+
+    def test_exportacao_csv(self):
+        self.criar_presencas(3)
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get('/api/presencas/presencas/', {'format': 'csv'})
+            linhas = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(linhas[0], 'ID,Data,Membro ID,Membro,Família,Turma,Presente')
+        self.assertEqual(len(linhas), 4)
+        # A single values_list query streams every row, whatever the serializer nests
+        self.assertEqual(len(contexto), 1)
+
+    def test_compressao(self):
+        self.criar_presencas(5)
+        url = '/api/presencas/presencas/'
+        original = self.client.get(url, HTTP_ACCEPT_ENCODING='identity')
+        self.assertFalse(original.has_header('Content-Encoding'))
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(json.loads(brotli.decompress(response.content)), json.loads(original.content))
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), json.loads(original.content))
+
+        # Streamed exports are compressed on the fly
+        response = self.client.get(url, {'format': 'csv'}, HTTP_ACCEPT_ENCODING='br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        linhas = brotli.decompress(b''.join(response.streaming_content)).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(linhas), 6)
+
+        # Small bodies are not worth it
+        response = self.client.get(f'{url}?fields=id&page_size=1', HTTP_ACCEPT_ENCODING='br')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class FrequenciaMensalTest(TestCase):
+    def setUp(self):
+        self.turma = Turma.objects.create(nome='Turma A', idade_minima=6, idade_maxima=10)
+        self.outra_turma = Turma.objects.create(nome='Turma B', idade_minima=11, idade_maxima=14)
+        familia = Familia.objects.create(nome='Família Teste')
+        self.membros = [
+            Membro.objects.create(
+                nome=f'Criança {i}', data_nascimento=date(2016, 3, 1), sexo='F',
+                familia=familia, grau_parentesco='FILHO'
+            )
+            for i in range(2)
+        ]
+        self.membro = self.membros[0]
+
+    def rollup(self):
+        return set(FrequenciaMensal.objects.values_list(
+            'membro_id', 'turma_id', 'mes', 'total_encontros', 'total_presencas'
+        ))
+
+    def test_criacao(self):
+        Presenca.objects.create(membro=self.membro, turma=self.turma, data=date(2026, 1, 5))
+        Presenca.objects.create(membro=self.membro, turma=self.turma, data=date(2026, 1, 12), presente=False)
+        Presenca.objects.create(membro=self.membro, turma=self.turma, data=date(2026, 2, 2))
+        self.assertEqual(self.rollup(), {
+            (self.membro.id, self.turma.id, date(2026, 1, 1), 2, 1),
+            (self.membro.id, self.turma.id, date(2026, 2, 1), 1, 1),
+        })
+
+    def test_atualizacao(self):
+        presenca = Presenca.objects.create(membro=self.membro, turma=self.turma, data=date(2026, 1, 5))
+        Presenca.objects.create(membro=self.membro, turma=self.turma, data=date(2026, 1, 12))
+
+        presenca.presente = False
+        presenca.save()
+        self.assertEqual(self.rollup(), {(self.membro.id, self.turma.id, date(2026, 1, 1), 2, 1)})
+
+        presenca.turma = self.outra_turma
+        presenca.save()
+        self.assertEqual(self.rollup(), {
+            (self.membro.id, self.turma.id, date(2026, 1, 1), 1, 1),
+            (self.membro.id, self.outra_turma.id, date(2026, 1, 1), 1, 0),
+        })
+
+        # Moving the row to another month and member recalculates both sides
+        presenca.membro = self.membros[1]
+        presenca.data = date(2026, 3, 2)
+        presenca.save()
+        self.assertEqual(self.rollup(), {
+            (self.membro.id, self.turma.id, date(2026, 1, 1), 1, 1),
+            (self.membros[1].id, self.outra_turma.id, date(2026, 3, 1), 1, 0),
+        })
+
+    def test_remocao(self):
+        presenca = Presenca.objects.create(membro=self.membro, turma=self.turma, data=date(2026, 1, 5))
+        outra = Presenca.objects.create(membro=self.membro, turma=self.turma, data=date(2026, 1, 12), presente=False)
+        outra.delete()
+        self.assertEqual(self.rollup(), {(self.membro.id, self.turma.id, date(2026, 1, 1), 1, 1)})
+        presenca.delete()
+        self.assertEqual(self.rollup(), set())
+
+    def test_por_membro_meses_parciais(self):
+        dia = date(2026, 1, 3)
+        while dia <= date(2026, 4, 27):
+            for i, membro in enumerate(self.membros):
+                Presenca.objects.create(
+                    membro=membro, data=dia,
+                    turma=self.turma if dia.day % 3 else self.outra_turma,
+                    presente=(dia.day + i) % 4 != 0,
+                )
+            dia += timedelta(days=4)
+
+        periodos = [
+            (date(2026, 1, 1), date(2026, 4, 30)),
+            (date(2026, 1, 10), date(2026, 4, 30)),
+            (date(2026, 1, 1), date(2026, 4, 15)),
+            (date(2026, 1, 20), date(2026, 3, 10)),
+            (date(2026, 2, 8), date(2026, 2, 20)),
+            (date(2026, 1, 10), date(2026, 2, 10)),
+            # Edge months with no presences before the start or after the end
+            (date(2026, 1, 2), date(2026, 4, 28)),
+        ]
+        for inicio, fim in periodos:
+            for turma_id in (None, self.outra_turma.id):
+                with self.subTest(inicio=inicio, fim=fim, turma_id=turma_id):
+                    presencas = Presenca.objects.filter(data__range=[inicio, fim])
+                    if turma_id:
+                        presencas = presencas.filter(turma_id=turma_id)
+                    esperado = {
+                        linha['membro_id']: (linha['presencas'], linha['encontros'])
+                        for linha in presencas.values('membro_id').annotate(
+                            presencas=Count('id', filter=Q(presente=True)), encontros=Count('id')
+                        ).order_by()
+                    }
+                    obtido = {
+                        item['membro_id']: (item['total_presencas'], item['total_encontros'])
+                        for item in FrequenciaMensal.objects.por_membro(inicio, fim, turma_id)
+                    }
+                    self.assertEqual(obtido, esperado)
+
+
+class ChamadaTest(QueryCountTestCase):
+    url = '/api/presencas/presencas/chamada/'
+
+    def setUp(self):
+        super().setUp()
+        self.turma = Turma.objects.create(nome='Turma A', idade_minima=6, idade_maxima=10)
+        self.outra_turma = Turma.objects.create(nome='Turma B', idade_minima=11, idade_maxima=14)
+        self.familia = Familia.objects.create(nome='Família Teste')
+        self.dia = date(2026, 3, 10)
+
+    def criar_membro(self, nascimento):
+        return Membro.objects.create(
+            nome='Pessoa', data_nascimento=nascimento, sexo='F',
+            familia=self.familia, grau_parentesco='FILHO'
+        )
+
+    def versao_presencas(self):
+        return VersaoDados.objects.filter(chave='presencas').values_list('versao', flat=True).first() or 0
+
+    def test_upsert(self):
+        marcado, novo = self.criar_membro(date(2017, 1, 1)), self.criar_membro(date(2017, 1, 1))
+        Presenca.objects.create(membro=marcado, turma=self.turma, data=self.dia, presente=True)
+        versao = self.versao_presencas()
+
+        response = self.client.post(self.url, {
+            'turma_id': self.turma.id,
+            'data': self.dia,
+            'presencas': [
+                {'membro_id': marcado.id, 'presente': True},
+                {'membro_id': novo.id, 'presente': True},
+                # The last mark for a member wins
+                {'membro_id': marcado.id, 'presente': False},
+            ],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(
+            {chave: response.data[chave] for chave in ('total', 'criados', 'atualizados', 'presentes', 'ausentes')},
+            {'total': 2, 'criados': 1, 'atualizados': 1, 'presentes': 1, 'ausentes': 1}
+        )
+        self.assertEqual(
+            dict(Presenca.objects.filter(data=self.dia).values_list('membro_id', 'presente')),
+            {marcado.id: False, novo.id: True}
+        )
+        # bulk_create sends no signals: the view refreshes the rollup and the report version itself
+        self.assertEqual(
+            set(FrequenciaMensal.objects.values_list('membro_id', 'turma_id', 'mes', 'total_encontros', 'total_presencas')),
+            {(marcado.id, self.turma.id, date(2026, 3, 1), 1, 0), (novo.id, self.turma.id, date(2026, 3, 1), 1, 1)}
+        )
+        self.assertEqual(self.versao_presencas(), versao + 1)
+
+    def test_turma_automatica(self):
+        crianca = self.criar_membro(date(2017, 1, 1))
+        adolescente = self.criar_membro(date(2013, 1, 1))
+        adulto = self.criar_membro(date(1990, 1, 1))
+
+        response = self.client.post(self.url, {
+            'data': self.dia,
+            'presencas': [{'membro_id': membro.id, 'presente': True} for membro in (crianca, adolescente, adulto)],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertIsNone(response.data['turma_id'])
+        self.assertEqual(dict(Presenca.objects.values_list('membro_id', 'turma_id')), {
+            crianca.id: self.turma.id,
+            adolescente.id: self.outra_turma.id,
+            adulto.id: None,
+        })
+
+    def test_membro_desconhecido(self):
+        membro = self.criar_membro(date(2017, 1, 1))
+        response = self.client.post(self.url, {
+            'turma_id': self.turma.id,
+            'data': self.dia,
+            'presencas': [{'membro_id': membro.id, 'presente': True}, {'membro_id': 999999, 'presente': True}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('999999', str(response.data['presencas']))
+        self.assertFalse(Presenca.objects.exists())
@@ -2,16 +2,43 @@ from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Presenca
-from .serializers import PresencaSerializer
+from rest_framework.exceptions import ValidationError, PermissionDenied
+from django.db import transaction
+from datetime import date
+from .models import Presenca, FrequenciaMensal
+from .serializers import PresencaSerializer, ChamadaSerializer
 from membros.models import Membro
 from turmas.models import Turma
+from core.mixins import EagerLoadingMixin, ExportacaoMixin
+from core.pagination import KeysetPagination
+from core.models import VersaoDados
 from core.permissions import IsStaffOrReadOnly
+from turmas.indice import indice_turmas
 
-class PresencaViewSet(viewsets.ModelViewSet):
+class PresencaViewSet(ExportacaoMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Presenca.objects.all()
     serializer_class = PresencaSerializer
     permission_classes = [permissions.IsAuthenticated, IsStaffOrReadOnly]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-data', '-id')
+    eager_loading = {
+        'membro': ('membro',),
+        'membro.familia_nome': ('membro__familia',),
+        'turma': ('turma',),
+    }
+    eager_loading_actions = {
+        'destroy': (),
+    }
+    exportacao_nome = 'presencas'
+    exportacao_campos = (
+        ('ID', 'id'),
+        ('Data', 'data'),
+        ('Membro ID', 'membro_id'),
+        ('Membro', 'membro__nome'),
+        ('Família', 'membro__familia__nome'),
+        ('Turma', 'turma__nome'),
+        ('Presente', 'presente'),
+    )
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -85,7 +112,7 @@ class PresencaViewSet(viewsets.ModelViewSet):
         ausentes = total_membros - presentes
         
         return Response({
-            'presencas': PresencaSerializer(queryset, many=True).data,
+            'presencas': self.get_serializer(queryset, many=True).data,
             'statistics': {
                 'total_membros': total_membros,
                 'presentes': presentes,
@@ -120,35 +147,81 @@ class PresencaViewSet(viewsets.ModelViewSet):
         
         return Response({
             'message': 'Attendance updated successfully',
-            'data': PresencaSerializer(presenca).data,
+            'data': self.get_serializer(presenca).data,
             'status_code': 200
         })
 
+    @action(detail=False, methods=['post'])
+    def chamada(self, request):
+        """
+        Record the roll call of a whole turma for one date in a single upsert
+        """
+        serializer = ChamadaSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        turma_id = serializer.validated_data.get('turma_id')
+        data = serializer.validated_data['data']
+        marcacoes = serializer.validated_data['presencas']
+
+        if turma_id is None:
+            # Auto-assign by age through the in-process index, one query for the whole roll call
+            sugestoes = indice_turmas().sugerir(
+                Membro.objects.filter(id__in=marcacoes).values_list('id', 'data_nascimento'),
+                data
+            )
+            turmas = {
+                membro_id: turma.pk if turma else None
+                for membro_id, (idade, turma) in sugestoes.items()
+            }
+        else:
+            turmas = dict.fromkeys(marcacoes, turma_id)
+
+        with transaction.atomic():
+            existentes = set(Presenca.objects.filter(
+                data=data,
+                membro_id__in=marcacoes
+            ).values_list('membro_id', flat=True))
+
+            Presenca.objects.bulk_create(
+                [
+                    Presenca(membro_id=membro_id, turma_id=turmas[membro_id], data=data, presente=presente)
+                    for membro_id, presente in marcacoes.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['membro', 'data'],
+                update_fields=['presente', 'turma', 'ativo', 'data_atualizacao']
+            )
+
+            # bulk_create skips the model signals, so refresh the rollup and report version explicitly
+            FrequenciaMensal.objects.recalcular((membro_id, data) for membro_id in marcacoes)
+            VersaoDados.incrementar('presencas')
+
+        total = len(marcacoes)
+        presentes = sum(1 for presente in marcacoes.values() if presente)
+
+        return Response({
+            'turma_id': turma_id,
+            'data': data,
+            'total': total,
+            'criados': total - len(existentes),
+            'atualizados': len(existentes),
+            'presentes': presentes,
+            'ausentes': total - presentes,
+            'percentual_presenca': presentes / total * 100,
+            'status_code': 201
+        }, status=status.HTTP_201_CREATED)
+
     @action(detail=False, methods=['get'])
     def frequencia(self, request):
         """
         Get attendance frequency report
         """
-        current_year = datetime.now().year
-        
-        # Get attendance statistics by month
-        frequencia = Presenca.objects.filter(
-            data__year=current_year
-        ).values(
-            'membro__nome',
-            'membro__familia__nome'
-        ).annotate(
-            total_presencas=Count('id', filter=Q(presente=True)),
-            total_encontros=Count('id'),
-            percentual_presenca=Avg(
-                Case(
-                    When(presente=True, then=1),
-                    When(presente=False, then=0),
-                    output_field=FloatField()
-                )
-            ) * 100
-        ).order_by('-percentual_presenca')
-        
+        current_year = date.today().year
+
+        # Read from the monthly rollup instead of aggregating every presence
+        frequencia = FrequenciaMensal.objects.por_membro(
+            date(current_year, 1, 1), date(current_year, 12, 31)
+        )
+
         return Response(frequencia)
 
     @action(detail=False, methods=['get'])
@@ -164,12 +237,12 @@ class PresencaViewSet(viewsets.ModelViewSet):
                 'status_code': 400
             })
             
-        historico = Presenca.objects.filter(
+        historico = self.get_queryset().filter(
             membro_id=membro_id
         ).order_by('-data')
         
         return Response({
-            'historico': PresencaSerializer(historico, many=True).data,
+            'historico': self.get_serializer(historico, many=True).data,
             'total_presencas': historico.filter(presente=True).count(),
             'total_ausencias': historico.filter(presente=False).count()
         })
@@ -0,0 +1,87 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.models import VersaoDados
+
+# Fontes de dados que cada relatório lê; uma escrita em qualquer uma invalida o relatório
+DEPENDENCIAS = {
+    'frequencia': ('presencas', 'membros', 'familias'),
+    'frequencia_mensal': ('presencas', 'membros', 'familias', 'turmas'),
+    'cestas': ('cestas',),
+    'demografia': ('membros',),
+    'programas': ('familias',),
+    'resumo': ('presencas', 'membros', 'familias', 'cestas'),
+}
+
+
+def chave_relatorio(tipo, versoes, params):
+    """Cache key for a report type, its data versions and its query parameters."""
+    partes = [tipo]
+    partes += [f'{fonte}={versao}' for fonte, versao in sorted(versoes.items())]
+    partes += [f'{nome}={valor}' for nome, valor in sorted(params.items())]
+    return 'relatorios:' + hashlib.sha1('|'.join(partes).encode()).hexdigest()
+
+
+def obter_relatorio(tipo, params, calcular):
+    """
+    Returns (data, etag, last_modified) for a report, computing it only on a cache miss.
+
+    ``calcular`` must return the report payload or None when it should not be cached.
+    """
+    versoes, modificado_em = VersaoDados.obter(*DEPENDENCIAS[tipo])
+    chave = chave_relatorio(tipo, versoes, params)
+    dados = cache.get(chave)
+    if dados is None:
+        dados = calcular()
+        if dados is not None:
+            cache.set(chave, dados, settings.RELATORIOS_CACHE_TIMEOUT)
+    return dados, quote_etag(chave.split(':', 1)[1]), modificado_em
+
+
+def relatorio_em_cache(tipo):
+    """
+    Caches a report action's payload per data version and answers conditional requests.
+
+    Responses carry ETag/Last-Modified, so clients revalidating with
+    If-None-Match/If-Modified-Since get a 304 without a body. CSV/XLSX
+    exports are streamed straight from the database and bypass the cache.
+    """
+    def decorador(metodo):
+        @wraps(metodo)
+        def wrapper(self, request, *args, **kwargs):
+            if getattr(self, 'formato_exportacao', None):
+                return metodo(self, request, *args, **kwargs)
+
+            params = {nome: valor for nome, valor in request.query_params.items() if nome != 'format'}
+            computada = {}
+
+            def calcular():
+                response = metodo(self, request, *args, **kwargs)
+                computada['response'] = response
+                return response.data if response.status_code == status.HTTP_200_OK else None
+
+            dados, etag, modificado_em = obter_relatorio(tipo, params, calcular)
+            if dados is None:
+                return computada['response']
+
+            # Whole seconds, like the HTTP date: a fraction would make every If-Modified-Since look older
+            last_modified = int(modificado_em.timestamp()) if modificado_em else None
+            condicional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if condicional is not None:
+                response = Response(status=condicional.status_code)
+            else:
+                response = Response(dados)
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorador
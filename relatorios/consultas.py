@@ -0,0 +1,221 @@
+"""
+Report aggregates, shared by the report actions and by resumo.
+
+Each function reads the database and returns plain data, so resumo can run
+them side by side with ``em_paralelo``: every component gets its own
+thread and database connection, and the summary takes as long as its
+slowest component instead of the sum of all four. That only pays off with
+a database server and more than one core; on SQLite the components run in
+sequence (RELATORIOS_CONSULTAS_PARALELAS=1). Queries run in the pool are
+not counted by the request metrics.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Avg, Case, Count, FloatField, Q, When
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from cestas.models import EntregaDeCesta
+from familias.models import Familia
+from membros.models import Membro
+from presencas.models import FrequenciaMensal
+
+# Faixas etárias do relatório demográfico: (nome, idade mínima, idade máxima)
+FAIXAS_ETARIAS = (
+    ('0-5', 0, 5),
+    ('6-10', 6, 10),
+    ('11-14', 11, 14),
+    ('15-17', 15, 17),
+    ('18-59', 18, 59),
+    ('60+', 60, None),
+)
+
+_executores = {}
+
+
+def _executor():
+    # One pool per configured size, created on first use
+    paralelas = settings.RELATORIOS_CONSULTAS_PARALELAS
+    if paralelas not in _executores:
+        _executores[paralelas] = ThreadPoolExecutor(max_workers=paralelas, thread_name_prefix='relatorios')
+    return _executores[paralelas]
+
+
+def _em_conexao_propria(funcao, *args):
+    try:
+        return funcao(*args)
+    finally:
+        # Pool threads outlive the request, their connection must not
+        connection.close()
+
+
+def em_paralelo(**consultas):
+    """
+    Runs ``{nome: (funcao, *args)}`` at once and returns ``{nome: resultado}``.
+
+    Inside a transaction the other connections would not see its
+    uncommitted writes, so the functions then run one after another on the
+    caller's connection, as they do with RELATORIOS_CONSULTAS_PARALELAS=1.
+    """
+    if connection.in_atomic_block or settings.RELATORIOS_CONSULTAS_PARALELAS <= 1:
+        return {nome: funcao(*args) for nome, (funcao, *args) in consultas.items()}
+    futuros = {
+        nome: _executor().submit(_em_conexao_propria, funcao, *args)
+        for nome, (funcao, *args) in consultas.items()
+    }
+    return {nome: futuro.result() for nome, futuro in futuros.items()}
+
+
+def frequencia(data_inicio, data_fim, turma_id=None):
+    # Read from the monthly rollup instead of aggregating every presence
+    linhas = FrequenciaMensal.objects.por_membro(data_inicio, data_fim, turma_id=turma_id)
+    total_presencas = sum(f['total_presencas'] for f in linhas)
+    total_encontros = sum(f['total_encontros'] for f in linhas)
+    return linhas, {
+        'total_membros': len(linhas),
+        'total_presencas': total_presencas,
+        'total_encontros': total_encontros,
+        'media_presenca': (total_presencas / total_encontros * 100) if total_encontros > 0 else 0,
+        'periodo': {
+            'inicio': data_inicio,
+            'fim': data_fim
+        }
+    }
+
+
+def cestas_por_mes(data_inicio, data_fim):
+    return EntregaDeCesta.objects.filter(
+        data_entrega__range=[data_inicio, data_fim]
+    ).annotate(
+        mes=ExtractMonth('data_entrega'),
+        ano=ExtractYear('data_entrega')
+    ).values('mes', 'ano').annotate(
+        total_entregas=Count('id'),
+        total_familias=Count('familia', distinct=True)
+    ).order_by('ano', 'mes')
+
+
+def com_media_por_familia(linhas):
+    for linha in linhas:
+        linha['media_por_familia'] = linha['total_entregas'] / linha['total_familias']
+        yield linha
+
+
+def cestas(data_inicio, data_fim):
+    linhas = list(com_media_por_familia(cestas_por_mes(data_inicio, data_fim)))
+    total_entregas = sum(c['total_entregas'] for c in linhas)
+    total_familias = sum(c['total_familias'] for c in linhas)
+    return linhas, {
+        'total_entregas': total_entregas,
+        'total_familias': total_familias,
+        'media_entregas_por_mes': total_entregas / len(linhas) if linhas else 0,
+        'periodo': {
+            'inicio': data_inicio,
+            'fim': data_fim
+        }
+    }
+
+
+def _nascidos_com_idade(hoje, minima, maxima):
+    """Filter for members aged between ``minima`` and ``maxima`` (inclusive) on ``hoje``."""
+    def aniversario(anos):
+        # 29 February turns into 28 February in non-leap years
+        try:
+            return hoje.replace(year=hoje.year - anos)
+        except ValueError:
+            return hoje.replace(year=hoje.year - anos, day=28)
+
+    filtro = Q(data_nascimento__lte=aniversario(minima))
+    if maxima is not None:
+        filtro &= Q(data_nascimento__gt=aniversario(maxima + 1))
+    return filtro
+
+
+def demografia(hoje=None):
+    """Active members by sex, age group and kinship, in one aggregate and two small GROUP BYs."""
+    hoje = hoje or date.today()
+    membros = Membro.objects.filter(ativo=True)
+    totais = membros.aggregate(
+        total=Count('id'),
+        **{
+            f'faixa_{nome}': Count('id', filter=_nascidos_com_idade(hoje, minima, maxima))
+            for nome, minima, maxima in FAIXAS_ETARIAS
+        }
+    )
+    total = totais['total']
+    por_sexo = dict(membros.values_list('sexo').annotate(quantidade=Count('id')).order_by())
+    por_parentesco = dict(membros.values_list('grau_parentesco').annotate(quantidade=Count('id')).order_by())
+
+    def distribuicao(escolhas, contagens):
+        return [
+            {
+                'valor': valor,
+                'rotulo': str(rotulo),
+                'quantidade': contagens.get(valor, 0),
+                'percentual': contagens.get(valor, 0) / total * 100 if total else 0,
+            }
+            for valor, rotulo in escolhas
+        ]
+
+    faixas = [
+        {
+            'faixa': nome,
+            'quantidade': totais[f'faixa_{nome}'],
+            'percentual': totais[f'faixa_{nome}'] / total * 100 if total else 0,
+        }
+        for nome, _, _ in FAIXAS_ETARIAS
+    ]
+    distribuicao_completa = {
+        'sexo': distribuicao(Membro._meta.get_field('sexo').choices, por_sexo),
+        'faixa_etaria': faixas,
+        'grau_parentesco': distribuicao(Membro._meta.get_field('grau_parentesco').choices, por_parentesco),
+    }
+    menores = sum(
+        totais[f'faixa_{nome}'] for nome, _, maxima in FAIXAS_ETARIAS if maxima is not None and maxima < 18
+    )
+    return distribuicao_completa, {
+        'total_membros': total,
+        'total_menores': menores,
+        'percentual_menores': menores / total * 100 if total else 0,
+        'total_familias': membros.values('familia').distinct().count(),
+    }
+
+
+def programas_por_tipo():
+    return Familia.objects.values(
+        'programas_sociais'
+    ).annotate(
+        total_familias=Count('id'),
+        percentual=Avg(
+            Case(
+                When(programas_sociais=True, then=1),
+                When(programas_sociais=False, then=0),
+                output_field=FloatField()
+            )
+        ) * 100
+    ).exclude(programas_sociais__isnull=True)
+
+
+def programas():
+    linhas = list(programas_por_tipo())
+    total_familias = Familia.objects.count()
+    total_com_programas = sum(p['total_familias'] for p in linhas)
+    return linhas, {
+        'total_familias': total_familias,
+        'total_com_programas': total_com_programas,
+        'percentual_com_programas': (total_com_programas / total_familias * 100) if total_familias > 0 else 0,
+        'programas_ativos': len(linhas)
+    }
+
+
+def resumo(data_inicio, data_fim, turma_id=None):
+    """The statistics of the four dashboard reports, computed concurrently."""
+    partes = em_paralelo(
+        frequencia=(frequencia, data_inicio, data_fim, turma_id),
+        cestas=(cestas, data_inicio, data_fim),
+        demografia=(demografia,),
+        programas=(programas,),
+    )
+    return {nome: estatisticas for nome, (_, estatisticas) in partes.items()}
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Relatorio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('FREQUENCIA', 'Relatório de Frequência'), ('CESTA', 'Relatório de Entrega de Cestas'), ('GERAL', 'Relatório Geral')], max_length=20)),
+                ('data_geracao', models.DateTimeField(auto_now_add=True)),
+                ('periodo_inicio', models.DateField()),
+                ('periodo_fim', models.DateField()),
+                ('descricao', models.TextField(blank=True, null=True)),
+                ('arquivo', models.FileField(blank=True, null=True, upload_to='relatorios/')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSANDO', 'Processando'), ('CONCLUIDO', 'Concluído'), ('ERRO', 'Erro')], default='PENDENTE', max_length=20)),
+                ('erro', models.TextField(blank=True, null=True)),
+                ('ativo', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Relatório',
+                'verbose_name_plural': 'Relatórios',
+                'ordering': ['-data_geracao'],
+            },
+        ),
+    ]
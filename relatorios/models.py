@@ -11,6 +11,12 @@ class Relatorio(models.Model):
         ('CESTA', 'Relatório de Entrega de Cestas'),
         ('GERAL', 'Relatório Geral'),
     ]
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('PROCESSANDO', 'Processando'),
+        ('CONCLUIDO', 'Concluído'),
+        ('ERRO', 'Erro'),
+    ]
 
     tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
     data_geracao = models.DateTimeField(auto_now_add=True)
@@ -18,6 +24,9 @@ class Relatorio(models.Model):
     periodo_fim = models.DateField()
     descricao = models.TextField(blank=True, null=True)
     arquivo = models.FileField(upload_to='relatorios/', null=True, blank=True)
+    # Generated in the background by the relatorios.gerar task; clients poll status
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDENTE')
+    erro = models.TextField(blank=True, null=True)
     ativo = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -12,8 +12,17 @@ class RelatorioSerializer(serializers.ModelSerializer):
             'periodo_fim',
             'descricao',
             'arquivo',
+            'status',
+            'erro',
             'ativo',
             'created_at',
             'updated_at'
         ]
-        read_only_fields = ['id', 'data_geracao', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'data_geracao', 'arquivo', 'status', 'erro', 'created_at', 'updated_at']
+
+    def validate(self, data):
+        inicio = data.get('periodo_inicio', getattr(self.instance, 'periodo_inicio', None))
+        fim = data.get('periodo_fim', getattr(self.instance, 'periodo_fim', None))
+        if inicio and fim and inicio > fim:
+            raise serializers.ValidationError({'periodo_fim': 'O fim do período não pode ser anterior ao início.'})
+        return data
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_save, post_delete
+from core.models import VersaoDados
+from cestas.models import EntregaDeCesta
+from familias.models import Familia, Membro as MembroFamilia
+from membros.models import Membro
+from presencas.models import Presenca
+from turmas.models import Turma
+
+# Fonte de dados invalidada por cada modelo
+FONTES = {
+    Presenca: 'presencas',
+    EntregaDeCesta: 'cestas',
+    Familia: 'familias',
+    Membro: 'membros',
+    MembroFamilia: 'membros',
+    Turma: 'turmas',
+}
+
+
+def invalidar_relatorios(sender, raw=False, **kwargs):
+    if raw:
+        return
+    VersaoDados.incrementar(FONTES[sender])
+
+
+for modelo in FONTES:
+    post_save.connect(invalidar_relatorios, sender=modelo, dispatch_uid=f'relatorios_{modelo._meta.label}_save')
+    post_delete.connect(invalidar_relatorios, sender=modelo, dispatch_uid=f'relatorios_{modelo._meta.label}_delete')
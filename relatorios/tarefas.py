@@ -0,0 +1,105 @@
+"""Background generation of Relatorio files, run by ``manage.py processar_tarefas``."""
+import tempfile
+
+from django.core.files import File
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from cestas.models import EntregaDeCesta
+from core.exportacao import gerar_csv
+from core.tarefas import batimento, tarefa
+from familias.models import Familia
+from membros.models import Membro
+from presencas.models import FrequenciaMensal, primeiro_dia_do_mes
+from .models import Relatorio
+
+LOTE = 2000
+
+
+def linhas_frequencia(relatorio):
+    cabecalho = ['Membro ID', 'Membro', 'Família', 'Presenças', 'Encontros', 'Percentual de presença']
+    linhas = (
+        (f['membro_id'], f['membro__nome'], f['membro__familia__nome'],
+         f['total_presencas'], f['total_encontros'], f['percentual_presenca'])
+        for f in FrequenciaMensal.objects.por_membro(relatorio.periodo_inicio, relatorio.periodo_fim)
+    )
+    return cabecalho, linhas
+
+
+def linhas_cesta(relatorio):
+    cabecalho = ['Data da entrega', 'Família ID', 'Família', 'Observações']
+    linhas = EntregaDeCesta.objects.filter(
+        data_entrega__range=[relatorio.periodo_inicio, relatorio.periodo_fim]
+    ).order_by('data_entrega', 'id').values_list(
+        'data_entrega', 'familia_id', 'familia__nome', 'observacoes'
+    ).iterator(chunk_size=LOTE)
+    return cabecalho, linhas
+
+
+def linhas_geral(relatorio):
+    inicio, fim = relatorio.periodo_inicio, relatorio.periodo_fim
+    frequencia = FrequenciaMensal.objects.filter(mes__range=[primeiro_dia_do_mes(inicio), fim])
+    totais = frequencia.aggregate(presencas=Sum('total_presencas'), encontros=Sum('total_encontros'))
+    entregas = EntregaDeCesta.objects.filter(data_entrega__range=[inicio, fim]).aggregate(
+        total=Count('id'), familias=Count('familia', distinct=True)
+    )
+    presencas, encontros = totais['presencas'] or 0, totais['encontros'] or 0
+
+    linhas = [
+        ('Período', 'Início', inicio),
+        ('Período', 'Fim', fim),
+        ('Cadastro', 'Famílias ativas', Familia.objects.filter(ativo=True).count()),
+        ('Cadastro', 'Membros ativos', Membro.objects.filter(ativo=True).count()),
+        ('Frequência', 'Presenças', presencas),
+        ('Frequência', 'Encontros', encontros),
+        ('Frequência', 'Percentual de presença', presencas / encontros * 100 if encontros else 0),
+        ('Cestas', 'Entregas', entregas['total']),
+        ('Cestas', 'Famílias atendidas', entregas['familias']),
+    ]
+    por_turma = frequencia.values('turma__nome').annotate(
+        presencas=Sum('total_presencas'),
+        encontros=Sum('total_encontros'),
+        membros=Count('membro', distinct=True, filter=Q(total_encontros__gt=0))
+    ).order_by('turma__nome')
+    for turma in por_turma:
+        nome = turma['turma__nome'] or 'Sem turma'
+        linhas.append(('Turma', f'{nome} - membros', turma['membros']))
+        linhas.append(('Turma', f'{nome} - percentual de presença',
+                       turma['presencas'] / turma['encontros'] * 100 if turma['encontros'] else 0))
+    return ['Seção', 'Indicador', 'Valor'], linhas
+
+
+GERADORES = {
+    'FREQUENCIA': linhas_frequencia,
+    'CESTA': linhas_cesta,
+    'GERAL': linhas_geral,
+}
+
+
+def marcar_erro(erro, relatorio_id):
+    # updated_at is set by hand: queryset updates skip auto_now, and incremental backups rely on it
+    Relatorio.objects.filter(pk=relatorio_id).update(status='ERRO', erro=erro, updated_at=timezone.now())
+
+
+@tarefa('relatorios.gerar', ao_falhar=marcar_erro)
+def gerar_relatorio(relatorio_id):
+    """Writes the report's rows as CSV into Relatorio.arquivo, streaming through a temp file."""
+    relatorio = Relatorio.objects.get(pk=relatorio_id)
+    Relatorio.objects.filter(pk=relatorio_id).update(status='PROCESSANDO', updated_at=timezone.now())
+
+    cabecalho, linhas = GERADORES[relatorio.tipo](relatorio)
+    with tempfile.TemporaryFile() as temporario:
+        for parte in gerar_csv(cabecalho, linhas):
+            temporario.write(parte)
+            batimento()
+        temporario.seek(0)
+
+        nome = f'{relatorio.tipo.lower()}-{relatorio.periodo_inicio}-{relatorio.periodo_fim}-{relatorio.pk}.csv'
+        antigo = relatorio.arquivo.name if relatorio.arquivo else None
+        relatorio.arquivo.save(nome, File(temporario), save=False)
+
+    relatorio.status = 'CONCLUIDO'
+    relatorio.erro = None
+    relatorio.save(update_fields=['arquivo', 'status', 'erro', 'updated_at'])
+    if antigo and antigo != relatorio.arquivo.name:
+        relatorio.arquivo.storage.delete(antigo)
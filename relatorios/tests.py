@@ -0,0 +1,120 @@
+import threading
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITransactionTestCase
+from cestas.models import EntregaDeCesta
+from core.testing import QueryCountTestCase
+from familias.models import Familia
+from membros.models import Membro
+from . import consultas
+
+
+class DemografiaTest(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        familia = Familia.objects.create(nome='Família Demografia')
+        hoje = date.today()
+        for nome, nascimento, sexo, parentesco in (
+            ('Mãe', date(hoje.year - 35, 1, 1), 'F', 'MAE'),
+            ('Filha', date(hoje.year - 8, 1, 1), 'F', 'FILHO'),
+            # Turns 6 tomorrow, so still in the 0-5 group
+            ('Filho', hoje.replace(year=hoje.year - 6) + timedelta(days=1), 'M', 'FILHO'),
+        ):
+            Membro.objects.create(
+                nome=nome, data_nascimento=nascimento, sexo=sexo, familia=familia, grau_parentesco=parentesco
+            )
+
+    def test_demografia(self):
+        response = self.client.get('/api/relatorios/relatorios/demografia/')
+        self.assertEqual(response.status_code, 200, response.data)
+        distribuicao = response.data['distribuicao']
+        faixas = {faixa['faixa']: faixa['quantidade'] for faixa in distribuicao['faixa_etaria']}
+        self.assertEqual(faixas, {'0-5': 1, '6-10': 1, '11-14': 0, '15-17': 0, '18-59': 1, '60+': 0})
+        self.assertEqual({item['valor']: item['quantidade'] for item in distribuicao['sexo']}, {'M': 1, 'F': 2})
+        self.assertEqual(response.data['statistics']['total_menores'], 2)
+
+    def test_resumo(self):
+        response = self.client.get('/api/relatorios/relatorios/resumo/')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(set(response.data['resumo']), {'frequencia', 'cestas', 'demografia', 'programas'})
+        self.assertEqual(response.data['resumo']['demografia']['total_membros'], 3)
+
+    def test_filtro_invalido(self):
+        for url in ('/api/relatorios/relatorios/resumo/', '/api/relatorios/relatorios/frequencia_mensal/'):
+            response = self.client.get(url, {'turma': 'abc'})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['status_code'], 400)
+        response = self.client.get('/api/relatorios/relatorios/frequencia_mensal/', {'membro': '1.5'})
+        self.assertEqual(response.status_code, 400)
+
+
+    def test_cache_e_revalidacao(self):
+        url = '/api/relatorios/relatorios/demografia/'
+        cache.clear()
+        primeira = self.client.get(url)
+        self.assertEqual(primeira.status_code, 200)
+        etag, last_modified = primeira['ETag'], primeira['Last-Modified']
+        self.assertIn('private', primeira['Cache-Control'])
+        self.assertIn('no-cache', primeira['Cache-Control'])
+
+        # Served from the cache: no aggregate over the members runs
+        with CaptureQueriesContext(connection) as contexto:
+            repetida = self.client.get(url)
+        self.assertEqual(repetida['ETag'], etag)
+        self.assertEqual(repetida.json(), primeira.json())
+        self.assertFalse(any('membros_membro' in consulta['sql'] for consulta in contexto.captured_queries))
+
+        nao_modificada = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(nao_modificada.status_code, 304)
+        self.assertEqual(nao_modificada.content, b'')
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        # A write to a source the report does not read keeps its version
+        familia = Familia.objects.get()
+        EntregaDeCesta.objects.create(familia=familia, data_entrega=date(2026, 1, 5))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Membro.objects.create(
+            nome='Avô', data_nascimento=date(1950, 1, 1), sexo='M', familia=familia, grau_parentesco='OUTRO'
+        )
+        atualizada = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(atualizada.status_code, 200)
+        self.assertNotEqual(atualizada['ETag'], etag)
+        faixas = {faixa['faixa']: faixa['quantidade'] for faixa in atualizada.data['distribuicao']['faixa_etaria']}
+        self.assertEqual(faixas['60+'], 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=atualizada['ETag']).status_code, 304)
+
+
+@override_settings(RELATORIOS_CONSULTAS_PARALELAS=4)
+class ConsultasParalelasTest(APITransactionTestCase):
+    """Runs outside a test transaction, so em_paralelo really uses the pool."""
+
+    def test_executa_ao_mesmo_tempo(self):
+        # Each call only returns once all three are running
+        barreira = threading.Barrier(3, timeout=5)
+
+        def componente(valor):
+            connection.ensure_connection()
+            conexao = id(connection.connection)
+            barreira.wait()
+            return valor, threading.current_thread().name, conexao
+
+        resultados = consultas.em_paralelo(a=(componente, 1), b=(componente, 2), c=(componente, 3))
+        self.assertEqual({nome: valor for nome, (valor, _, _) in resultados.items()}, {'a': 1, 'b': 2, 'c': 3})
+        self.assertTrue(all(thread.startswith('relatorios') for _, thread, _ in resultados.values()))
+        # Each component on its own connection
+        self.assertEqual(len({conexao for _, _, conexao in resultados.values()}), 3)
+
+    def test_resumo_igual_ao_sequencial(self):
+        familia = Familia.objects.create(nome='Família Paralela', programas_sociais='Bolsa Família')
+        Membro.objects.create(
+            nome='Ana', data_nascimento=date(2015, 1, 1), sexo='F', familia=familia, grau_parentesco='FILHO'
+        )
+        inicio, fim = date.today().replace(day=1), date.today()
+        paralelo = consultas.resumo(inicio, fim)
+        with override_settings(RELATORIOS_CONSULTAS_PARALELAS=1):
+            self.assertEqual(paralelo, consultas.resumo(inicio, fim))
+        self.assertEqual(paralelo['demografia']['total_membros'], 1)
@@ -4,70 +4,199 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Relatorio
 from .serializers import RelatorioSerializer
-from familias.models import Familia
-from membros.models import Membro
-from presencas.models import Presenca
-from cestas.models import EntregaDeCesta
+from presencas.models import Presenca, FrequenciaMensal
 from turmas.models import Turma
+from core.mixins import ExportacaoMixin
 from core.permissions import IsStaffOrReadOnly
-from django.db.models import Count, Avg, Q, Case, When, FloatField
-from datetime import datetime, timedelta
-from django.db.models.functions import ExtractMonth, ExtractYear
+from core.tarefas import enfileirar
+from django.db import transaction
+from . import consultas
+from .cache import relatorio_em_cache
+from rest_framework.exceptions import ValidationError
+from django.db.models import Count, Sum, Q
+from django.utils.dateparse import parse_date
+from datetime import date, datetime, timedelta
 
-class RelatorioViewSet(viewsets.ModelViewSet):
+# Column headers of the CSV/XLSX report exports
+ROTULOS_EXPORTACAO = {
+    'membro_id': 'Membro ID',
+    'membro__nome': 'Membro',
+    'membro__familia__nome': 'Família',
+    'turma_id': 'Turma ID',
+    'turma__nome': 'Turma',
+    'mes': 'Mês',
+    'ano': 'Ano',
+    'total_presencas': 'Presenças',
+    'total_encontros': 'Encontros',
+    'total_membros': 'Membros',
+    'percentual_presenca': 'Percentual de presença',
+    'total_entregas': 'Entregas',
+    'total_familias': 'Famílias',
+    'media_por_familia': 'Média por família',
+    'programas_sociais': 'Programas sociais',
+    'percentual': 'Percentual',
+}
+
+class RelatorioViewSet(ExportacaoMixin, viewsets.ModelViewSet):
     queryset = Relatorio.objects.all()
     serializer_class = RelatorioSerializer
     permission_classes = [permissions.IsAuthenticated, IsStaffOrReadOnly]
+    exportacao_acoes = ('frequencia', 'frequencia_mensal', 'cestas', 'programas')
 
-    @action(detail=False, methods=['get'])
-    def frequencia(self, request):
+    def _get_periodo(self, request):
         """
-        Get attendance frequency report with detailed statistics
+        Reads data_inicio/data_fim from the query string, defaulting to the current month
         """
-        from django.db.models import Count, Avg
-        from datetime import datetime
-        
-        # Get date range from parameters
         data_inicio = request.query_params.get('data_inicio')
         data_fim = request.query_params.get('data_fim')
-        
+
         # If no date range provided, use current month
         if not data_inicio or not data_fim:
-            current = datetime.now()
-            data_inicio = current.replace(day=1)
-            data_fim = current.replace(day=current.day)
-        
-        # Get attendance statistics
-        frequencia = Presenca.objects.filter(
-            data__range=[data_inicio, data_fim]
-        ).values(
-            'membro__nome',
-            'membro__familia__nome'
-        ).annotate(
-            total_presencas=Count('id', filter=Q(presente=True)),
-            total_encontros=Count('id'),
-            percentual_presenca=Avg(
-                Case(
-                    When(presente=True, then=1),
-                    When(presente=False, then=0),
-                    output_field=FloatField()
+            hoje = date.today()
+            return hoje.replace(day=1), hoje
+
+        try:
+            inicio, fim = parse_date(data_inicio), parse_date(data_fim)
+        except ValueError:
+            inicio = fim = None
+        if not inicio or not fim:
+            raise ValidationError({
+                'error': 'data_inicio and data_fim must be dates in YYYY-MM-DD format',
+                'status_code': 400
+            })
+        return inicio, fim
+
+    def _get_id(self, request, parametro):
+        """
+        Reads an optional id filter (turma, membro) from the query string
+        """
+        valor = request.query_params.get(parametro)
+        if not valor:
+            return None
+        try:
+            return int(valor)
+        except ValueError:
+            raise ValidationError({
+                'error': f'{parametro} must be an integer id',
+                'status_code': 400
+            })
+
+    def create(self, request, *args, **kwargs):
+        """
+        Queue the generation of the report file; poll the report's status until CONCLUIDO
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            relatorio = serializer.save(status='PENDENTE')
+            enfileirar('relatorios.gerar', relatorio_id=relatorio.id)
+        return Response(self.get_serializer(relatorio).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['post'])
+    def gerar(self, request, pk=None):
+        """
+        Queue the report file to be generated again
+        """
+        relatorio = self.get_object()
+        if relatorio.status in ('PENDENTE', 'PROCESSANDO'):
+            raise ValidationError({
+                'error': 'report generation is already in progress',
+                'status_code': 400
+            })
+        with transaction.atomic():
+            relatorio.status = 'PENDENTE'
+            relatorio.erro = None
+            relatorio.save(update_fields=['status', 'erro', 'updated_at'])
+            enfileirar('relatorios.gerar', relatorio_id=relatorio.id)
+        return Response(self.get_serializer(relatorio).data, status=status.HTTP_202_ACCEPTED)
+
+    def exportar_linhas(self, colunas, linhas, nome):
+        """Streams report rows (dicts) as the requested export format."""
+        return self.exportar(
+            [ROTULOS_EXPORTACAO[coluna] for coluna in colunas],
+            ([linha[coluna] for coluna in colunas] for linha in linhas),
+            nome=nome
+        )
+
+    @action(detail=False, methods=['get'])
+    @relatorio_em_cache('frequencia')
+    def frequencia(self, request):
+        """
+        Get attendance frequency report with detailed statistics
+        """
+        data_inicio, data_fim = self._get_periodo(request)
+        frequencia, estatisticas = consultas.frequencia(
+            data_inicio, data_fim, turma_id=self._get_id(request, 'turma')
+        )
+
+        if self.formato_exportacao:
+            colunas = (
+                'membro_id', 'membro__nome', 'membro__familia__nome',
+                'total_presencas', 'total_encontros', 'percentual_presenca'
+            )
+            return self.exportar_linhas(colunas, frequencia, 'relatorio-frequencia')
+
+        return Response({
+            'frequencia': frequencia,
+            'statistics': estatisticas,
+            'status_code': 200
+        })
+
+    @action(detail=False, methods=['get'])
+    @relatorio_em_cache('frequencia_mensal')
+    def frequencia_mensal(self, request):
+        """
+        Get month-by-month attendance per member, or per turma with agrupar=turma
+        """
+        data_inicio, data_fim = self._get_periodo(request)
+        agrupar = request.query_params.get('agrupar', 'membro')
+        if agrupar not in ('membro', 'turma'):
+            raise ValidationError({
+                'error': 'agrupar must be membro or turma',
+                'status_code': 400
+            })
+
+        queryset = FrequenciaMensal.objects.filter(
+            mes__range=[data_inicio.replace(day=1), data_fim]
+        )
+        turma_id = self._get_id(request, 'turma')
+        membro_id = self._get_id(request, 'membro')
+        if turma_id:
+            queryset = queryset.filter(turma_id=turma_id)
+        if membro_id:
+            queryset = queryset.filter(membro_id=membro_id)
+
+        if agrupar == 'turma':
+            campos = ('mes', 'turma_id', 'turma__nome')
+        else:
+            campos = ('mes', 'membro_id', 'membro__nome', 'membro__familia__nome')
+
+        queryset = queryset.values(*campos).annotate(
+            total_presencas=Sum('total_presencas'),
+            total_encontros=Sum('total_encontros'),
+            total_membros=Count('membro', distinct=True)
+        ).order_by('mes', *campos[1:])
+
+        def com_percentual(linhas):
+            for linha in linhas:
+                linha['percentual_presenca'] = (
+                    linha['total_presencas'] / linha['total_encontros'] * 100
+                    if linha['total_encontros'] else 0
                 )
-            ) * 100
-        ).order_by('-percentual_presenca')
-        
-        # Get global statistics
-        total_membros = frequencia.count()
-        total_presencas = sum([f['total_presencas'] for f in frequencia])
-        total_encontros = sum([f['total_encontros'] for f in frequencia])
-        media_presenca = (total_presencas / total_encontros * 100) if total_encontros > 0 else 0
-        
+                yield linha
+
+        if self.formato_exportacao:
+            return self.exportar_linhas(
+                campos + ('total_presencas', 'total_encontros', 'total_membros', 'percentual_presenca'),
+                com_percentual(queryset.iterator(chunk_size=self.exportacao_lote)),
+                f'relatorio-frequencia-mensal-{agrupar}'
+            )
+
+        meses = list(com_percentual(queryset))
+
         return Response({
-            'frequencia': list(frequencia),
+            'frequencia': meses,
             'statistics': {
-                'total_membros': total_membros,
-                'total_presencas': total_presencas,
-                'total_encontros': total_encontros,
-                'media_presenca': media_presenca,
                 'periodo': {
                     'inicio': data_inicio,
                     'fim': data_fim
@@ -77,163 +206,71 @@ class RelatorioViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=False, methods=['get'])
+    @relatorio_em_cache('cestas')
     def cestas(self, request):
         """
         Get basket delivery report with detailed statistics
         """
-        from django.db.models import Count, Avg
-        from datetime import datetime
-        
-        # Get date range from parameters
-        data_inicio = request.query_params.get('data_inicio')
-        data_fim = request.query_params.get('data_fim')
-        
-        # If no date range provided, use current month
-        if not data_inicio or not data_fim:
-            current = datetime.now()
-            data_inicio = current.replace(day=1)
-            data_fim = current.replace(day=current.day)
-        
-        # Get deliveries by month
-        cestas = EntregaCesta.objects.filter(
-            data_entrega__range=[data_inicio, data_fim]
-        ).annotate(
-            mes=ExtractMonth('data_entrega'),
-            ano=ExtractYear('data_entrega')
-        ).values('mes', 'ano').annotate(
-            total_entregas=Count('id'),
-            total_familias=Count('familia', distinct=True),
-            media_por_familia=Avg(
-                Count('id') / Count('familia', distinct=True)
+        data_inicio, data_fim = self._get_periodo(request)
+
+        if self.formato_exportacao:
+            return self.exportar_linhas(
+                ('ano', 'mes', 'total_entregas', 'total_familias', 'media_por_familia'),
+                consultas.com_media_por_familia(
+                    consultas.cestas_por_mes(data_inicio, data_fim).iterator(chunk_size=self.exportacao_lote)
+                ),
+                'relatorio-cestas'
             )
-        ).order_by('ano', 'mes')
-        
-        # Get global statistics
-        total_entregas = sum([c['total_entregas'] for c in cestas])
-        total_familias = sum([c['total_familias'] for c in cestas])
-        
+
+        cestas, estatisticas = consultas.cestas(data_inicio, data_fim)
         return Response({
-            'cestas': list(cestas),
-            'statistics': {
-                'total_entregas': total_entregas,
-                'total_familias': total_familias,
-                'media_entregas_por_mes': total_entregas / len(cestas) if cestas else 0,
-                'periodo': {
-                    'inicio': data_inicio,
-                    'fim': data_fim
-                }
-            },
+            'cestas': cestas,
+            'statistics': estatisticas,
             'status_code': 200
         })
 
     @action(detail=False, methods=['get'])
-    def tamanhos(self, request):
+    @relatorio_em_cache('demografia')
+    def demografia(self, request):
         """
-        Get size distribution report with detailed statistics
+        Get active members by sex, age group and kinship
         """
-        # Get size distribution
-        tamanhos = Membro.objects.values(
-            'tamanho_calcao', 'tamanho_calca', 'tamanho_blusa'
-        ).annotate(
-            calcao_count=Count('tamanho_calcao'),
-            calca_count=Count('tamanho_calca'),
-            blusa_count=Count('tamanho_blusa')
-        )
-        
-        # Aggregate by size
-        calcoes = tamanhos.values('tamanho_calcao').annotate(
-            quantidade=Count('tamanho_calcao')
-        ).exclude(tamanho_calcao__isnull=True)
-        
-        calcas = tamanhos.values('tamanho_calca').annotate(
-            quantidade=Count('tamanho_calca')
-        ).exclude(tamanho_calca__isnull=True)
-        
-        blusas = tamanhos.values('tamanho_blusa').annotate(
-            quantidade=Count('tamanho_blusa')
-        ).exclude(tamanho_blusa__isnull=True)
-        
-        # Calculate statistics
-        total_membros = Membro.objects.count()
-        total_calcoes = sum([c['quantidade'] for c in calcoes])
-        total_calcas = sum([c['quantidade'] for c in calcas])
-        total_blusas = sum([b['quantidade'] for b in blusas])
-        
+        distribuicao, estatisticas = consultas.demografia()
         return Response({
-            'distribuicao': {
-                'calcoes': list(calcoes),
-                'calcas': list(calcas),
-                'blusas': list(blusas)
-            },
-            'statistics': {
-                'total_membros': total_membros,
-                'total_calcoes': total_calcoes,
-                'total_calcas': total_calcas,
-                'total_blusas': total_blusas,
-                'percentual_calcoes': (total_calcoes / total_membros * 100) if total_membros > 0 else 0,
-                'percentual_calcas': (total_calcas / total_membros * 100) if total_membros > 0 else 0,
-                'percentual_blusas': (total_blusas / total_membros * 100) if total_membros > 0 else 0
-            },
+            'distribuicao': distribuicao,
+            'statistics': estatisticas,
             'status_code': 200
         })
 
     @action(detail=False, methods=['get'])
+    @relatorio_em_cache('programas')
     def programas(self, request):
         """
         Get social programs report with detailed statistics
         """
-        # Get program distribution
-        programas = Familia.objects.values(
-            'programas_sociais'
-        ).annotate(
-            total_familias=Count('id'),
-            percentual=Avg(
-                Case(
-                    When(programas_sociais=True, then=1),
-                    When(programas_sociais=False, then=0),
-                    output_field=FloatField()
-                )
-            ) * 100
-        ).exclude(programas_sociais__isnull=True)
-        
-        # Calculate statistics
-        total_familias = Familia.objects.count()
-        total_com_programas = sum([p['total_familias'] for p in programas])
-        
+        if self.formato_exportacao:
+            return self.exportar_linhas(
+                ('programas_sociais', 'total_familias', 'percentual'),
+                consultas.programas_por_tipo().iterator(chunk_size=self.exportacao_lote),
+                'relatorio-programas'
+            )
+
+        programas, estatisticas = consultas.programas()
         return Response({
-            'programas': list(programas),
-            'statistics': {
-                'total_familias': total_familias,
-                'total_com_programas': total_com_programas,
-                'percentual_com_programas': (total_com_programas / total_familias * 100) if total_familias > 0 else 0,
-                'programas_ativos': len(programas)
-            },
+            'programas': programas,
+            'statistics': estatisticas,
             'status_code': 200
         })
 
     @action(detail=False, methods=['get'])
+    @relatorio_em_cache('resumo')
     def resumo(self, request):
         """
         Get comprehensive summary report
         """
-        # Get attendance statistics
-        frequencia = self.frequencia(request)
-        
-        # Get basket delivery statistics
-        cestas = self.cestas(request)
-        
-        # Get size distribution statistics
-        tamanhos = self.tamanhos(request)
-        
-        # Get program statistics
-        programas = self.programas(request)
-        
+        # The four reports run side by side, each on its own connection
+        data_inicio, data_fim = self._get_periodo(request)
         return Response({
-            'resumo': {
-                'frequencia': frequencia.data['statistics'],
-                'cestas': cestas.data['statistics'],
-                'tamanhos': tamanhos.data['statistics'],
-                'programas': programas.data['statistics']
-            },
+            'resumo': consultas.resumo(data_inicio, data_fim, turma_id=self._get_id(request, 'turma')),
             'status_code': 200
         })
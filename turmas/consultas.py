@@ -0,0 +1,8 @@
+"""Hot turma querysets audited by ``manage.py auditar_indices``."""
+from core.auditoria import consulta_quente
+from .models import Turma
+
+
+@consulta_quente('turmas.ativas')
+def ativas():
+    return Turma.objects.filter(ativo=True).order_by('nome')
@@ -0,0 +1,79 @@
+"""
+In-process interval index mapping ages to active turmas.
+
+The index is rebuilt only when the 'turmas' data version changes, so a
+whole roll call is assigned with one version check instead of one Turma
+query per member.
+"""
+import threading
+from bisect import bisect_right
+from datetime import date
+
+from core.models import VersaoDados
+
+
+def idade_em(nascimento, dia):
+    """Age in full years on ``dia``."""
+    if not nascimento:
+        return None
+    return dia.year - nascimento.year - ((dia.month, dia.day) < (nascimento.month, nascimento.day))
+
+
+class IndiceTurmas:
+    """
+    Splits the age axis into segments with a constant set of covering turmas.
+
+    Each segment keeps the turma that ``Turma.objects.filter(...).first()``
+    would return (the first by nome), so lookups are a single bisect.
+    """
+
+    def __init__(self, turmas):
+        turmas = sorted(turmas, key=lambda turma: (turma.nome, turma.pk))
+        pontos = sorted({turma.idade_minima for turma in turmas} | {turma.idade_maxima + 1 for turma in turmas})
+        self.pontos = pontos
+        self.segmentos = []
+        for inicio in pontos:
+            self.segmentos.append(next(
+                (turma for turma in turmas if turma.idade_minima <= inicio <= turma.idade_maxima),
+                None
+            ))
+
+    def turma_para_idade(self, idade):
+        if idade is None:
+            return None
+        posicao = bisect_right(self.pontos, idade) - 1
+        if posicao < 0:
+            return None
+        return self.segmentos[posicao]
+
+    def sugerir(self, membros, dia=None):
+        """
+        Assigns turmas to a batch of members in one pass.
+
+        ``membros`` is an iterable of (membro_id, data_nascimento); returns
+        {membro_id: (idade, turma or None)}.
+        """
+        dia = dia or date.today()
+        sugestoes = {}
+        for membro_id, nascimento in membros:
+            idade = idade_em(nascimento, dia)
+            sugestoes[membro_id] = (idade, self.turma_para_idade(idade))
+        return sugestoes
+
+
+_lock = threading.Lock()
+_indice = {'versao': None, 'indice': None}
+
+
+def indice_turmas():
+    """Returns the process-wide index, rebuilding it when a Turma has been written."""
+    from turmas.models import Turma
+
+    # The timestamp guards against a version number reused after a rollback
+    versoes, modificado_em = VersaoDados.obter('turmas')
+    versao = (versoes['turmas'], modificado_em)
+    with _lock:
+        if _indice['versao'] != versao:
+            _indice['indice'] = IndiceTurmas(Turma.objects.filter(ativo=True))
+            _indice['versao'] = versao
+        return _indice['indice']
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turmas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='turma',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['nome'], name='turma_ativa_nome_idx'),
+        ),
+    ]
@@ -2,6 +2,18 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 
 
+class TurmaManager(models.Manager):
+    def ativas(self):
+        """Active turmas as a list of dicts, cached until a Turma is written."""
+        from core.cache import em_cache_versionado
+        return em_cache_versionado(
+            'turmas:ativas', ('turmas',),
+            lambda: list(self.filter(ativo=True).order_by('nome').values(
+                'id', 'nome', 'idade_minima', 'idade_maxima'
+            ))
+        )
+
+
 class Turma(models.Model):
     nome = models.CharField(max_length=100, verbose_name=_('nome da turma'))
     idade_minima = models.PositiveSmallIntegerField(verbose_name=_('idade mínima'))
@@ -10,10 +22,15 @@ class Turma(models.Model):
     data_atualizacao = models.DateTimeField(auto_now=True)
     ativo = models.BooleanField(default=True, verbose_name=_('ativo'))
 
+    objects = TurmaManager()
+
     class Meta:
         verbose_name = _('turma')
         verbose_name_plural = _('turmas')
         ordering = ['nome']
+        indexes = [
+            models.Index(fields=['nome'], condition=models.Q(ativo=True), name='turma_ativa_nome_idx'),
+        ]
 
     def __str__(self):
         return self.nome
@@ -1,7 +1,11 @@
 from rest_framework import serializers
 from .models import Turma
+from core.serializers import CamposDinamicosMixin
+
+class TurmaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    created_at = serializers.DateTimeField(source='data_criacao', read_only=True)
+    updated_at = serializers.DateTimeField(source='data_atualizacao', read_only=True)
 
-class TurmaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Turma
         fields = [
@@ -1,3 +1,37 @@
-from django.test import TestCase
+from datetime import date
+from core.testing import QueryCountTestCase
+from familias.models import Familia
+from membros.models import Membro
+from .models import Turma
 
-# Create your tests here.
+
+class SugestoesQueryCountTest(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.familia = Familia.objects.create(nome='Família Teste')
+        self.turma = Turma.objects.create(nome='Turma A', idade_minima=6, idade_maxima=10)
+        Turma.objects.create(nome='Turma B', idade_minima=11, idade_maxima=14)
+
+    def criar_membros(self, quantidade):
+        for _ in range(quantidade):
+            Membro.objects.create(
+                nome='Criança', data_nascimento=date(2016, 3, 1), sexo='F',
+                familia=self.familia, grau_parentesco='FILHO'
+            )
+
+    def test_sugestoes(self):
+        # The first request builds the index for this turmas version
+        self.client.get('/api/turmas/turmas/sugestoes/')
+        self.assertConstantQueries('/api/turmas/turmas/sugestoes/?data=2026-03-01', self.criar_membros)
+
+    def test_sugestoes_por_idade(self):
+        self.criar_membros(1)
+        response = self.client.get('/api/turmas/turmas/sugestoes/?data=2026-02-28')
+        self.assertEqual(response.data['sugestoes'][0]['idade'], 9)
+        self.assertEqual(response.data['sugestoes'][0]['turma_id'], self.turma.id)
+
+        # Writing a turma bumps its data version, so the index is rebuilt
+        self.turma.idade_maxima = 8
+        self.turma.save()
+        response = self.client.get('/api/turmas/turmas/sugestoes/?data=2026-02-28')
+        self.assertIsNone(response.data['sugestoes'][0]['turma_id'])
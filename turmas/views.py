@@ -1,5 +1,11 @@
 from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
+from django.utils.dateparse import parse_date
+from datetime import date
+from membros.models import Membro
+from .indice import indice_turmas
 from .models import Turma
 from .serializers import TurmaSerializer
 
@@ -25,3 +31,58 @@ class TurmaViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def ativas(self, request):
+        """
+        Get the active turmas, served from cache
+        """
+        return Response(Turma.objects.ativas())
+
+    @action(detail=False, methods=['get'])
+    def sugestoes(self, request):
+        """
+        Suggest a turma for every active member on a date (?data=, optional ?membros=1,2,3)
+        """
+        data = request.query_params.get('data')
+        try:
+            data = parse_date(data) if data else date.today()
+        except ValueError:
+            data = None
+        if data is None:
+            raise ValidationError({
+                'error': 'data must be in the format YYYY-MM-DD',
+                'status_code': 400
+            })
+
+        membros = Membro.objects.filter(ativo=True)
+        ids = request.query_params.get('membros')
+        if ids:
+            try:
+                membros = membros.filter(id__in=[int(membro_id) for membro_id in ids.split(',')])
+            except ValueError:
+                raise ValidationError({
+                    'error': 'membros must be a comma separated list of ids',
+                    'status_code': 400
+                })
+
+        linhas = list(membros.order_by('nome').values_list('id', 'nome', 'data_nascimento'))
+        sugestoes = indice_turmas().sugerir(((membro_id, nascimento) for membro_id, _, nascimento in linhas), data)
+
+        resultado = []
+        for membro_id, nome, _ in linhas:
+            idade, turma = sugestoes[membro_id]
+            resultado.append({
+                'membro_id': membro_id,
+                'nome': nome,
+                'idade': idade,
+                'turma_id': turma.pk if turma else None,
+                'turma_nome': turma.nome if turma else None,
+            })
+
+        return Response({
+            'data': data,
+            'total': len(resultado),
+            'sugestoes': resultado,
+            'status_code': 200
+        })